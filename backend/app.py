@@ -3,24 +3,114 @@ import os
 from flask import Flask
 from flask_cors import CORS
 from blueprints.pdf_tool_bp import pdf_tool_bp
+from blueprints.metrics_bp import metrics_bp
+from blueprints.pdf_operations.upload_ingest import IngestRequest
+from blueprints.pdf_operations.output_store import start_janitor
+from blueprints.pdf_operations.html_render_engine import start_html_warm_up
+from blueprints.pdf_operations.soffice_pool import log_soffice_mode
 
 def create_app():
     app = Flask(__name__)
-    CORS(app, resources={r"/api/*": {"origins": "*"}}) # Adjust origins for production
+    app.request_class = IngestRequest # Hash, size and sniff uploads while they stream in
+    CORS(app, resources={r"/api/*": {"origins": "*"}}, # Adjust origins for production
+         expose_headers=['Location', 'Tus-Resumable', 'Upload-Offset', 'Upload-Length', 'Upload-Expires']) # Read by resumable upload clients
 
     # --- Configuration for file paths ---
     # Assuming 'backend' is the root directory of your Flask app
     # and 'uploads' & 'converted_files' are inside 'backend'
     app.config['UPLOAD_FOLDER'] = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
     app.config['CONVERTED_FILES_FOLDER'] = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'converted_files')
+    app.config['JOBS_FOLDER'] = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'jobs') # Async job state files
+    app.config['DOCUMENTS_FOLDER'] = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'documents') # Uploads kept for /api/documents
     
     # Ensure these directories exist
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
     os.makedirs(app.config['CONVERTED_FILES_FOLDER'], exist_ok=True)
+    os.makedirs(app.config['JOBS_FOLDER'], exist_ok=True)
     
     app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # Example: 50MB limit for total request size
+    app.config['UPLOAD_SPOOL_MAX_SIZE'] = 2 * 1024 * 1024 # Uploads up to 2MB stay in memory, larger ones spill to UPLOAD_FOLDER
+
+    # --- Async job pool (submit/poll mode of /api/process_pdf) ---
+    app.config['JOB_POOL_WORKERS'] = os.cpu_count() or 2 # Conversions running at the same time
+    app.config['JOB_MAX_PENDING'] = 500 # Queued + running jobs per Flask process before new submits get a 503
+    app.config['JOB_TTL_SECONDS'] = 24 * 60 * 60 # Job status is kept this long after the job's last update (matches OUTPUT_TTL_SECONDS)
+    app.config['BATCH_MAX_FILES'] = 500 # Files accepted by one /api/process_batch request
+    app.config['CPU_POOL_WORKERS'] = os.cpu_count() or 2 # Processes for page-level work inside a single synchronous request (jobs run it inline)
+
+    # --- LibreOffice instance pool (excel_to_pdf, ppt_to_pdf, pdf_to_ppt) ---
+    # Warm instances need LibreOffice's UNO bindings (python3-uno, not on PyPI); without them each conversion runs a cold soffice
+    app.config['SOFFICE_POOL_SIZE'] = 2 # Most warm soffice instances per web process, started as conversions overlap (job workers keep one)
+    app.config['SOFFICE_MAX_JOBS_PER_INSTANCE'] = 200 # Restart an instance after this many conversions
+    app.config['SOFFICE_PROFILES_FOLDER'] = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'soffice_profiles')
+
+    # --- Stored documents (upload once, refer to them by documentId) ---
+    app.config['DOCUMENT_INDEX_DB'] = os.path.join(app.config['JOBS_FOLDER'], 'documents.sqlite3')
+    app.config['DOCUMENT_TTL_SECONDS'] = 2 * 60 * 60 # Documents unused for this long are deleted
+    app.config['DOCUMENT_READER_CACHE_MAX_BYTES'] = 256 * 1024 * 1024 # Estimated memory of parsed readers kept per process
+
+    # --- Resumable uploads (tus protocol on /api/uploads; each PATCH is still bound by MAX_CONTENT_LENGTH) ---
+    app.config['RESUMABLE_UPLOADS_FOLDER'] = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'resumable_uploads') # Same filesystem as DOCUMENTS_FOLDER, so finished uploads are renamed, not copied
+    app.config['RESUMABLE_UPLOAD_DB'] = os.path.join(app.config['JOBS_FOLDER'], 'resumable_uploads.sqlite3')
+    app.config['RESUMABLE_UPLOAD_TTL_SECONDS'] = 24 * 60 * 60 # Unfinished uploads idle for this long are deleted
+    app.config['RESUMABLE_UPLOAD_MAX_SIZE'] = 10 * 1024 * 1024 * 1024 # 10GB per upload
+
+    # --- pdf_to_excel (tabula-java runs in each worker's own JVM when JPype1 is installed) ---
+    app.config['TABULA_JAVA_OPTIONS'] = ['-Xmx512m'] # Read when a process starts its JVM
+
+    # --- html_to_pdf (a small pool of warm WeasyPrint contexts per process) ---
+    app.config['HTML_RENDER_CONTEXTS'] = 4 # Renders a process runs at once, each on its own context; more requests wait
+    app.config['HTML_WARM_UP'] = True # Load fonts and parse HTML_DEFAULT_STYLESHEETS when a process starts
+    app.config['HTML_DEFAULT_STYLESHEETS'] = [] # Paths or URLs of house stylesheets applied to every document
+    app.config['HTML_STYLESHEET_CACHE_MAX_ENTRIES'] = 64 # Parsed stylesheets kept per context
+    app.config['HTML_IMAGE_CACHE_MAX_ENTRIES'] = 512 # Decoded images kept per context before the cache is cleared
+    app.config['HTML_RESOURCE_CACHE_MAX_BYTES'] = 64 * 1024 * 1024 # Remote images, stylesheets and fonts kept per process
+    app.config['HTML_RESOURCE_CACHE_TTL_SECONDS'] = 60 * 60 # Upper bound on reuse of a remote resource, even without Cache-Control
+    app.config['HTML_CONTEXT_MAX_RENDERS'] = 500 # Documents rendered before the font configuration (and its @font-face fonts) is rebuilt
+
+    # --- OCR of scanned documents (pdf_to_text with ocr=auto|force) ---
+    app.config['OCR_TESSERACT_CMD'] = os.environ.get('TESSERACT_CMD') or 'tesseract'
+    app.config['OCR_DEFAULT_LANGUAGE'] = 'eng'
+    app.config['OCR_PAGE_TIMEOUT'] = 120 # Seconds Tesseract may spend on one page
+    app.config['OCR_CACHE_FOLDER'] = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ocr_cache') # Per-page results keyed by content hash
+    app.config['OCR_CACHE_MAX_BYTES'] = 2 * 1024 * 1024 * 1024 # 2GB; least recently used pages go first beyond this
+
+    # --- Full-text search over stored documents (/api/search) ---
+    app.config['SEARCH_INDEX_ENABLED'] = True
+    app.config['SEARCH_INDEX_FOLDER'] = os.path.join(app.config['JOBS_FOLDER'], 'search_index') # Segment files and their catalog
+    app.config['SEARCH_INDEX_MAX_SEGMENTS'] = 16 # Beyond this, the smallest segments are merged
+    app.config['SEARCH_MAX_RESULTS'] = 100 # Upper bound for the 'limit' parameter
+
+    # --- Result cache (repeat uploads with the same options reuse the existing output) ---
+    app.config['RESULT_CACHE_ENABLED'] = True
+    app.config['RESULT_CACHE_DB'] = os.path.join(app.config['JOBS_FOLDER'], 'result_cache.sqlite3')
+    app.config['RESULT_CACHE_MAX_ENTRIES'] = 10000
+    app.config['RESULT_CACHE_MAX_BYTES'] = 5 * 1024 * 1024 * 1024 # 5GB of referenced outputs
+
+    # --- Retention of CONVERTED_FILES_FOLDER (outputs are sharded into ab/cd/ subdirectories) ---
+    app.config['RETENTION_ENABLED'] = True
+    app.config['OUTPUT_INDEX_DB'] = os.path.join(app.config['JOBS_FOLDER'], 'output_index.sqlite3')
+    app.config['OUTPUT_TTL_SECONDS'] = 24 * 60 * 60 # Outputs are deleted a day after they were created (or last returned as a cache hit)
+    app.config['OUTPUT_MAX_BYTES'] = 20 * 1024 * 1024 * 1024 # 20GB; least recently used outputs go first beyond this
+    app.config['OUTPUT_TOMBSTONE_SECONDS'] = 7 * 24 * 60 * 60 # Downloads of deleted outputs get 410 Gone for this long
+    app.config['RETENTION_SWEEP_INTERVAL'] = 5 * 60 # Seconds between sweeps
+    app.config['RETENTION_DISK_SCAN_INTERVAL'] = 6 * 60 * 60 # Seconds between walks of the folder for unindexed files
+
+    # --- Downloads ---
+    app.config['DOWNLOAD_CACHE_MAX_AGE'] = 60 * 60 # Seconds browsers may reuse a download without asking again
+    # Let the front web server send files: None (Flask streams them), 'x-sendfile' (Apache/lighttpd)
+    # or 'x-accel-redirect' (nginx, with an internal location aliased to CONVERTED_FILES_FOLDER)
+    app.config['DOWNLOAD_OFFLOAD'] = os.environ.get('DOWNLOAD_OFFLOAD') or None
+    app.config['DOWNLOAD_ACCEL_PREFIX'] = '/protected-downloads/' # nginx internal location for X-Accel-Redirect
 
     app.register_blueprint(pdf_tool_bp, url_prefix='/api')
+    # Prometheus metrics. With several worker processes (or async jobs), set PROMETHEUS_MULTIPROC_DIR
+    # before starting the server so every process's values are merged.
+    app.register_blueprint(metrics_bp)
+
+    start_janitor(app)
+    start_html_warm_up(app)
+    log_soffice_mode(app.logger) # Warns when conversions will fall back to a cold soffice per job
 
     return app
 
@@ -0,0 +1,160 @@
+# backend/benchmarks/corpus.py
+import os
+import random
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+from PIL import Image
+
+CORPUS_SEED = 1234 # Same seed -> byte-identical corpus, so runs stay comparable to a baseline
+FIXTURE_PASSWORD = 'bench' # Password of the encrypted fixture (unlock_pdf)
+
+# name -> (pages, images_per_page, fonts). Page counts are multiplied by the --scale option.
+PDF_SPECS = {
+    'text_10p': (10, 0, ['Helvetica']),
+    'text_100p': (100, 0, ['Helvetica']),
+    'text_500p': (500, 0, ['Helvetica']),
+    'fonts_100p': (100, 0, ['Helvetica', 'Times-Roman', 'Courier', 'Helvetica-Bold', 'Times-Italic']),
+    'images_20p': (20, 2, ['Helvetica']),
+    'images_100p': (100, 1, ['Helvetica']),
+}
+
+WORDS = ("lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor incididunt ut labore "
+         "et dolore magna aliqua invoice total quarterly revenue page section table figure summary").split()
+
+
+def _sentence(rng, words=12):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize() + '.'
+
+def _noise_image(rng, width, height):
+    """A photo-like image (smooth gradient plus noise) so JPEG/Flate behave as on real scans."""
+    base = Image.linear_gradient('L').resize((width, height)).convert('RGB')
+    noise = Image.frombytes('L', (width, height), rng.randbytes(width * height)).convert('RGB')
+    return Image.blend(base, noise, 0.35)
+
+def make_pdf(path, pages, images_per_page=0, fonts=('Helvetica',), seed=CORPUS_SEED):
+    rng = random.Random(seed)
+    width, height = A4
+    c = canvas.Canvas(path, pagesize=A4, invariant=1) # invariant: no timestamps or random ids in the output
+    for page_number in range(1, pages + 1):
+        y = height - 60
+        for line in range(40 if not images_per_page else 12):
+            c.setFont(fonts[(page_number + line) % len(fonts)], 10)
+            c.drawString(50, y, _sentence(rng))
+            y -= 14
+        for i in range(images_per_page):
+            # A distinct image per placement: reportlab would store a repeated image only once
+            c.drawImage(ImageReader(_noise_image(rng, 800, 600)), 50 + i * 20, 80 + i * 20, width=400, height=300)
+        c.drawString(width / 2, 30, f"{page_number}")
+        c.showPage()
+    c.save()
+
+def make_encrypted_pdf(source_path, path, password):
+    from pypdf import PdfReader, PdfWriter
+    writer = PdfWriter(clone_from=PdfReader(source_path))
+    writer.encrypt(password) # RC4, which pypdf handles without the cryptography package
+    with open(path, 'wb') as f:
+        writer.write(f)
+
+def make_text(path, lines, seed=CORPUS_SEED):
+    rng = random.Random(seed)
+    with open(path, 'w', encoding='utf-8') as f:
+        for _ in range(lines):
+            f.write(_sentence(rng, rng.randint(4, 18)) + '\n')
+
+def make_html(path, sections, seed=CORPUS_SEED):
+    rng = random.Random(seed)
+    parts = ["<!DOCTYPE html><html><head><meta charset='utf-8'><style>"
+             "body{font-family:sans-serif} table{border-collapse:collapse} td{border:1px solid #999;padding:2px}"
+             "</style></head><body>"]
+    for section in range(1, sections + 1):
+        parts.append(f"<h2>Section {section}</h2><p>{' '.join(_sentence(rng) for _ in range(8))}</p><table>")
+        for _ in range(10):
+            parts.append('<tr>' + ''.join(f'<td>{rng.randint(0, 99999)}</td>' for _ in range(6)) + '</tr>')
+        parts.append('</table>')
+    parts.append('</body></html>')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(''.join(parts))
+
+def make_image(path, width, height, seed=CORPUS_SEED):
+    rng = random.Random(seed)
+    image = _noise_image(rng, width, height)
+    if path.lower().endswith(('.jpg', '.jpeg')):
+        image.save(path, quality=90)
+    else:
+        image.save(path)
+
+def make_xlsx(path, rows, seed=CORPUS_SEED):
+    from openpyxl import Workbook # Optional here: only the excel fixtures need it
+    rng = random.Random(seed)
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Data')
+    sheet.append(['Id', 'Name', 'Quantity', 'Price', 'Total'])
+    for row in range(1, rows + 1):
+        quantity, price = rng.randint(1, 50), round(rng.uniform(1, 500), 2)
+        sheet.append([row, rng.choice(WORDS).title(), quantity, price, round(quantity * price, 2)])
+    workbook.save(path)
+
+def make_pptx(path, slides, seed=CORPUS_SEED):
+    from pptx import Presentation # Optional: python-pptx is only needed to build this fixture
+    rng = random.Random(seed)
+    presentation = Presentation()
+    layout = presentation.slide_layouts[1]
+    for slide_number in range(1, slides + 1):
+        slide = presentation.slides.add_slide(layout)
+        slide.shapes.title.text = f"Slide {slide_number}"
+        slide.placeholders[1].text = '\n'.join(_sentence(rng) for _ in range(4))
+    presentation.save(path)
+
+def make_docx(path, paragraphs, seed=CORPUS_SEED):
+    from docx import Document # Optional: python-docx comes with pdf2docx
+    rng = random.Random(seed)
+    document = Document()
+    for paragraph in range(paragraphs):
+        if paragraph % 20 == 0:
+            document.add_heading(f"Chapter {paragraph // 20 + 1}", level=1)
+        document.add_paragraph(' '.join(_sentence(rng) for _ in range(5)))
+    document.save(path)
+
+
+def build_corpus(corpus_dir, scale=1.0, log=print):
+    """
+    Writes every fixture into corpus_dir (existing files are kept, so a corpus is built once)
+    and returns {fixture_name: {'path': ..., 'pages': ...}}. Fixtures whose optional
+    generator library is missing are skipped with a note.
+    """
+    os.makedirs(corpus_dir, exist_ok=True)
+    fixtures = {}
+
+    def add(name, filename, pages, build):
+        path = os.path.join(corpus_dir, filename)
+        if not os.path.exists(path):
+            try:
+                build(path)
+            except ImportError as e:
+                log(f"Skipping fixture '{name}': {e}")
+                return
+        fixtures[name] = {'path': path, 'pages': pages}
+
+    for name, (pages, images_per_page, fonts) in PDF_SPECS.items():
+        pages = max(1, int(pages * scale))
+        add(name, f"{name}_{pages}.pdf", pages, lambda path, p=pages, i=images_per_page, f=fonts: make_pdf(path, p, i, f))
+
+    if 'text_100p' in fixtures:
+        source = fixtures['text_100p']
+        add('encrypted_100p', f"encrypted_{source['pages']}.pdf", source['pages'],
+            lambda path: make_encrypted_pdf(source['path'], path, FIXTURE_PASSWORD))
+
+    text_lines = max(10, int(5000 * scale))
+    add('text_file', f"text_{text_lines}.txt", None, lambda path: make_text(path, text_lines))
+    html_sections = max(1, int(30 * scale))
+    add('html_file', f"html_{html_sections}.html", None, lambda path: make_html(path, html_sections))
+    add('image_jpg', 'photo.jpg', 1, lambda path: make_image(path, 2400, 1800))
+    add('image_png', 'scan.png', 1, lambda path: make_image(path, 1654, 2339, seed=CORPUS_SEED + 1))
+    xlsx_rows = max(10, int(2000 * scale))
+    add('xlsx_file', f"sheet_{xlsx_rows}.xlsx", None, lambda path: make_xlsx(path, xlsx_rows))
+    pptx_slides = max(1, int(20 * scale))
+    add('pptx_file', f"slides_{pptx_slides}.pptx", pptx_slides, lambda path: make_pptx(path, pptx_slides))
+    docx_paragraphs = max(10, int(200 * scale))
+    add('docx_file', f"doc_{docx_paragraphs}.docx", None, lambda path: make_docx(path, docx_paragraphs))
+    return fixtures
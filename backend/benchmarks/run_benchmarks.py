@@ -0,0 +1,275 @@
+# backend/benchmarks/run_benchmarks.py
+"""
+Throughput benchmark for the handlers in OPERATION_HANDLERS.
+
+Run from the backend directory:
+    python -m benchmarks.run_benchmarks --scale 0.2 --output bench.json
+    python -m benchmarks.run_benchmarks --save-baseline benchmarks/baseline.json
+    python -m benchmarks.run_benchmarks --baseline benchmarks/baseline.json   # exits 1 on regressions
+
+Every case runs in a fresh process so peak RSS belongs to that case alone. Each case is driven
+through the Flask test client (upload parsing, ingest, dispatch) and by calling the handler directly.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import resource
+import statistics
+import tempfile
+import multiprocessing
+from werkzeug.datastructures import FileStorage, MultiDict
+
+from .corpus import build_corpus, FIXTURE_PASSWORD
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CORPUS_DIR = os.path.join(tempfile.gettempdir(), 'pdfmaestro_bench_corpus')
+DEFAULT_TOLERANCE = 0.25 # Slower (or bigger) than baseline by more than this fraction is a regression
+MODES = ('client', 'direct')
+
+
+def _page_span(pages, first, last_share):
+    """'first-last' with last at last_share of the fixture's pages, kept inside the document whatever --scale is."""
+    first = min(first, pages)
+    return f"{first}-{min(pages, max(first, round(pages * last_share)))}"
+
+# (operation, [fixture names], form fields). One case per entry and mode. A form value may be a function
+# of the first fixture's page count, for page ranges that must stay valid at every --scale.
+CASES = [
+    ('merge', ['text_100p', 'images_20p', 'fonts_100p'], {}),
+    ('compress', ['text_500p'], {}),
+    ('compress', ['images_100p'], {}),
+    ('split', ['text_500p'], {'splitMode': 'split_all'}),
+    ('split', ['text_500p'], {'splitMode': 'extract', 'pageRanges': lambda pages: f"{_page_span(pages, 1, 0.05)}, {_page_span(pages, round(pages * 0.1) or 1, 0.15)}"}),
+    ('rotate', ['text_500p'], {'angle': '90'}),
+    ('delete_pages', ['text_500p'], {'pagesToDelete': lambda pages: _page_span(pages, 2, 0.1)}),
+    ('extract_pages', ['text_500p'], {'pagesToExtract': lambda pages: _page_span(pages, 1, 0.1)}),
+    ('add_page_numbers', ['text_500p'], {}),
+    ('add_page_numbers', ['fonts_100p'], {'position': 'top_center', 'startPage': '2'}),
+    ('protect_pdf', ['text_100p'], {'password': 'secret'}),
+    ('unlock_pdf', ['encrypted_100p'], {'password': FIXTURE_PASSWORD}),
+    ('pipeline', ['encrypted_100p'], {'steps': lambda pages: json.dumps([
+        {'operation': 'unlock_pdf', 'password': FIXTURE_PASSWORD}, {'operation': 'delete_pages', 'pagesToDelete': _page_span(pages, 2, 0.1)},
+        {'operation': 'rotate', 'angle': 90}, {'operation': 'add_page_numbers'}, {'operation': 'compress'}])}),
+    ('pdf_to_text', ['text_500p'], {}),
+    ('pdf_to_text', ['text_500p'], {'outputFormat': 'ndjson'}),
+    ('pdf_to_text', ['images_100p'], {}),
+    ('pdf_to_image', ['text_10p'], {'dpi': '150', 'imageFormat': 'png'}),
+    ('pdf_to_image', ['images_20p'], {'dpi': '100', 'imageFormat': 'jpeg'}),
+    ('pdf_to_word', ['text_100p'], {}),
+    ('pdf_to_excel', ['text_10p'], {}),
+    ('pdf_to_ppt', ['text_10p'], {}),
+    ('images_to_pdf', ['image_jpg', 'image_png'], {'pageSize': 'A4'}),
+    ('text_to_pdf', ['text_file'], {}),
+    ('html_to_pdf', ['html_file'], {}),
+    ('word_to_pdf', ['docx_file'], {}),
+    ('excel_to_pdf', ['xlsx_file'], {}),
+    ('ppt_to_pdf', ['pptx_file'], {}),
+]
+
+
+def case_key(result):
+    return f"{result['operation']}|{'+'.join(result['fixtures'])}|{result['options']}|{result['mode']}"
+
+def _peak_rss_mb():
+    # ru_maxrss is KB on Linux and bytes on macOS. Children covers soffice/pdftoppm and pool workers.
+    divisor = 1024 * 1024 if platform.system() == 'Darwin' else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return round(max(own, children) / divisor, 1)
+
+def _make_app(work_dir):
+    sys.path.insert(0, BACKEND_DIR)
+    from app import create_app
+    app = create_app()
+    # Every folder and database under backend/ (uploads, outputs, jobs, documents, indexes, OCR cache...)
+    # moves into the work dir, so no state from earlier runs or from the server leaks into a case
+    for key, value in list(app.config.items()):
+        if isinstance(value, str) and value.startswith(BACKEND_DIR + os.sep):
+            app.config[key] = os.path.join(work_dir, os.path.relpath(value, BACKEND_DIR))
+            os.makedirs(app.config[key] if key.endswith('_FOLDER') else os.path.dirname(app.config[key]), exist_ok=True)
+    app.config['RESULT_CACHE_ENABLED'] = False # Every repeat must do the real work
+    app.config['RETENTION_ENABLED'] = False # The work dir is thrown away after the case anyway
+    return app
+
+def _run_once(app, mode, operation, paths, form):
+    """Returns (status_code, response_data)."""
+    if mode == 'client':
+        data = dict(form, operation=operation)
+        data['files'] = [(open(path, 'rb'), os.path.basename(path)) for path in paths]
+        try:
+            response = app.test_client().post('/api/process_pdf', data=data, content_type='multipart/form-data')
+        finally:
+            for stream, _ in data['files']:
+                stream.close()
+        return response.status_code, response.get_json() or {}
+
+    from blueprints.pdf_tool_bp import OPERATION_HANDLERS
+    request_files = MultiDict()
+    for path in paths:
+        request_files.add('files', FileStorage(stream=open(path, 'rb'), filename=os.path.basename(path), name='files'))
+    try:
+        with app.app_context():
+            response_data, status_code = OPERATION_HANDLERS[operation](request_files, MultiDict(form))
+        return status_code, response_data
+    except Exception as e:
+        return 500, {'success': False, 'error': f'{type(e).__name__}: {e}'}
+    finally:
+        for _, file_storage in request_files.items(multi=True):
+            file_storage.close()
+
+def _measure_case(result_queue, mode, operation, paths, form, repeat):
+    """Runs in a fresh process; puts one result dict on result_queue."""
+    work_dir = tempfile.mkdtemp(prefix='pdfmaestro_bench_')
+    try:
+        app = _make_app(work_dir)
+        timings, status_code, response_data = [], None, {}
+        for _ in range(repeat):
+            shutil.rmtree(app.config['OCR_CACHE_FOLDER'], ignore_errors=True) # Nor may a repeat reuse the previous run's OCR
+            started = time.perf_counter()
+            status_code, response_data = _run_once(app, mode, operation, paths, form)
+            timings.append(time.perf_counter() - started)
+            if status_code != 200:
+                break
+
+        output_size = None
+        if status_code == 200 and response_data.get('filename'):
+            from blueprints.pdf_operations.output_store import locate_output
+            output_path = locate_output(response_data['filename'], app.config['CONVERTED_FILES_FOLDER'])
+            if output_path:
+                output_size = os.path.getsize(output_path)
+        result_queue.put({
+            'status_code': status_code,
+            'error': None if status_code == 200 else response_data.get('error'),
+            'wall_time_s': round(statistics.median(timings), 4),
+            'wall_time_min_s': round(min(timings), 4),
+            'runs': len(timings),
+            'peak_rss_mb': _peak_rss_mb(),
+            'output_bytes': output_size,
+        })
+    except Exception as e:
+        result_queue.put({'status_code': None, 'error': f'{type(e).__name__}: {e}'})
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def run_case(mode, operation, fixtures, form, corpus, repeat, timeout):
+    paths = [corpus[name]['path'] for name in fixtures]
+    pages = sum(corpus[name]['pages'] or 0 for name in fixtures) or None
+    form = {key: value(corpus[fixtures[0]]['pages'] or 1) if callable(value) else value for key, value in form.items()}
+    result = {
+        'operation': operation,
+        'fixtures': fixtures,
+        'options': ','.join(f'{key}={value}' for key, value in sorted(form.items())),
+        'mode': mode,
+        'input_bytes': sum(os.path.getsize(path) for path in paths),
+        'pages': pages,
+    }
+
+    context = multiprocessing.get_context('spawn')
+    result_queue = context.Queue()
+    process = context.Process(target=_measure_case, args=(result_queue, mode, operation, paths, form, repeat))
+    process.start()
+    try:
+        result.update(result_queue.get(timeout=timeout))
+    except Exception: # queue.Empty: the case hung or the process died
+        result.update({'status_code': None, 'error': f'No result within {timeout}s (exit code {process.exitcode})'})
+    process.join(5)
+    if process.is_alive():
+        process.kill()
+
+    if result.get('status_code') == 200 and pages and result.get('wall_time_s'):
+        result['pages_per_s'] = round(pages / result['wall_time_s'], 1)
+    return result
+
+def compare_to_baseline(results, baseline, tolerance):
+    """Returns a list of human readable regression descriptions."""
+    baseline_by_key = {case_key(entry): entry for entry in baseline.get('results', [])}
+    regressions = []
+    for result in results:
+        previous = baseline_by_key.get(case_key(result))
+        if not previous or previous.get('status_code') != 200:
+            continue
+        if result.get('status_code') != 200:
+            regressions.append(f"{case_key(result)}: now fails ({result.get('error')})")
+            continue
+        for metric in ('wall_time_s', 'peak_rss_mb', 'output_bytes'):
+            before, after = previous.get(metric), result.get(metric)
+            if before and after and after > before * (1 + tolerance):
+                regressions.append(f"{case_key(result)}: {metric} {before} -> {after} (+{(after / before - 1) * 100:.0f}%)")
+    return regressions
+
+def print_report(results):
+    header = f"{'operation':<17} {'fixtures':<32} {'mode':<6} {'status':>6} {'wall s':>8} {'pages/s':>8} {'RSS MB':>7} {'out KB':>9}"
+    print(header)
+    print('-' * len(header))
+    for result in results:
+        output_kb = f"{result['output_bytes'] / 1024:.0f}" if result.get('output_bytes') is not None else '-'
+        print(f"{result['operation']:<17} {'+'.join(result['fixtures'])[:32]:<32} {result['mode']:<6} "
+              f"{str(result.get('status_code') or 'ERR'):>6} {result.get('wall_time_s', '-'):>8} "
+              f"{result.get('pages_per_s', '-'):>8} {result.get('peak_rss_mb', '-'):>7} {output_kb:>9}")
+        if result.get('error'):
+            print(f"{'':<17} ! {result['error'][:110]}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--corpus-dir', default=DEFAULT_CORPUS_DIR, help='Where fixtures are generated (reused between runs)')
+    parser.add_argument('--scale', type=float, default=1.0, help='Multiplier for fixture page/row counts')
+    parser.add_argument('--operations', help='Comma separated operations to run (default: all)')
+    parser.add_argument('--mode', choices=MODES + ('both',), default='both')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per case; the median is reported')
+    parser.add_argument('--timeout', type=int, default=900, help='Seconds before a case is abandoned')
+    parser.add_argument('--output', help='Write the results as JSON to this path')
+    parser.add_argument('--baseline', help='Compare against a previously saved results file')
+    parser.add_argument('--save-baseline', help='Write the results to this path for later comparisons')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args(argv)
+
+    corpus = build_corpus(os.path.join(args.corpus_dir, f'scale_{args.scale:g}'), args.scale)
+    selected = set(args.operations.split(',')) if args.operations else None
+    modes = MODES if args.mode == 'both' else (args.mode,)
+
+    results = []
+    for operation, fixtures, form in CASES:
+        if selected and operation not in selected:
+            continue
+        missing = [name for name in fixtures if name not in corpus]
+        if missing:
+            print(f"Skipping {operation}: fixture(s) {', '.join(missing)} unavailable")
+            continue
+        for mode in modes:
+            result = run_case(mode, operation, fixtures, form, corpus, args.repeat, args.timeout)
+            results.append(result)
+            print(f"  {case_key(result)}: {result.get('wall_time_s', '-')}s", flush=True)
+
+    report = {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'cpu_count': os.cpu_count(),
+        'scale': args.scale,
+        'results': results,
+    }
+    print()
+    print_report(results)
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        print()
+        if regressions:
+            print(f"{len(regressions)} regression(s) against {args.baseline}:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"No regressions against {args.baseline} (tolerance {args.tolerance:.0%}).")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,11 @@
+# backend/blueprints/metrics_bp.py
+from flask import Blueprint, Response
+from .pdf_operations.metrics import metrics_payload
+
+metrics_bp = Blueprint('metrics_bp', __name__)
+
+# Served outside /api, where Prometheus scrapers look by default
+@metrics_bp.route('/metrics', methods=['GET'])
+def metrics_route():
+    body, content_type = metrics_payload()
+    return Response(body, content_type=content_type)
@@ -1,19 +1,133 @@
 # backend/blueprints/pdf_operations/add_page_numbers_handler.py
 import os
 import uuid
-import shutil
 from io import BytesIO
-from flask import current_app
 from werkzeug.utils import secure_filename
 from pypdf import PdfReader, PdfWriter
+from pypdf.generic import ArrayObject, DecodedStreamObject, DictionaryObject, FloatObject, NameObject
 from reportlab.pdfgen import canvas
 from reportlab.lib.units import inch
-from reportlab.lib.pagesizes import letter # or other default
-from reportlab.lib.colors import black, gray # Example colors
-from .utils import check_allowed_file, create_temp_folder, save_uploaded_file
+from .utils import check_allowed_file, open_uploaded_file, load_pdf
+from .output_store import output_path
+from .metrics import stage_timer, STAGE_OUTPUT_WRITE
 
 ALLOWED_EXTENSIONS_PDF = {'pdf'}
 
+# Name under which each page's number overlay is registered in its /XObject resources
+PAGE_NUMBER_XOBJECT = NameObject('/PMPageNumber')
+
+def _page_number_position(position, page_width, page_height, text_width, font_size, margin):
+    if position == 'bottom_right':
+        return page_width - margin - text_width, margin
+    elif position == 'bottom_center':
+        return (page_width - text_width) / 2, margin
+    elif position == 'bottom_left':
+        return margin, margin
+    elif position == 'top_right':
+        return page_width - margin - text_width, page_height - margin - font_size # Adjust for font ascent
+    elif position == 'top_center':
+        return (page_width - text_width) / 2, page_height - margin - font_size
+    elif position == 'top_left':
+        return margin, page_height - margin - font_size
+    # Default to bottom_right
+    return page_width - margin - text_width, margin
+
+def build_page_number_overlays(page_boxes, first_numbered_index, number_format, font_name, font_size, margin, position):
+    """
+    Draws the number of every page from first_numbered_index onwards into a single multi-page
+    ReportLab document (one overlay page per numbered page) and parses it once.
+    page_boxes holds (width, height) for every page of the document.
+    """
+    num_total_pages = len(page_boxes)
+    packet = BytesIO()
+    can = canvas.Canvas(packet)
+    for i in range(first_numbered_index, num_total_pages):
+        page_width, page_height = page_boxes[i]
+        can.setPageSize((page_width, page_height))
+        can.setFont(font_name, font_size)
+        # Format the page number string
+        current_page_display = i + 1 # Or could be (i + 1) - start_page + 1 if numbering should reset
+        page_number_text = number_format.replace('{current_page}', str(current_page_display)).replace('{total_pages}', str(num_total_pages))
+        text_width = can.stringWidth(page_number_text, font_name, font_size)
+        x, y = _page_number_position(position, page_width, page_height, text_width, font_size, margin)
+        can.drawString(x, y, page_number_text)
+        can.showPage()
+    can.save()
+    packet.seek(0)
+    return PdfReader(packet)
+
+def _shared_stream(writer, data):
+    stream = DecodedStreamObject()
+    stream.set_data(data)
+    return writer._add_object(stream)
+
+def parse_page_number_options(request_form):
+    """Keyword arguments for add_page_numbers_to_writer from the form fields. Shared with the pipeline operation."""
+    margin_str = request_form.get('margin', '0.5') # Margin from edge in inches
+    try:
+        margin = float(margin_str) * inch
+    except ValueError:
+        raise ValueError("Invalid margin value. Must be a number.")
+    return {
+        'position': request_form.get('position', 'bottom_right'), # e.g., bottom_center, top_left
+        'start_page': int(request_form.get('startPage', 1)), # 1-based page to start numbering from
+        'number_format': request_form.get('numberFormat', '{current_page} of {total_pages}'), # e.g., Page {current_page}
+        'font_name': request_form.get('fontName', 'Helvetica'),
+        'font_size': int(request_form.get('fontSize', 10)),
+        'margin': margin
+    }
+
+def add_page_numbers_to_writer(writer, start_page, number_format, font_name, font_size, margin, position):
+    """
+    Stamps page numbers onto writer's pages (start_page is 1-based).
+    Each overlay page becomes a Form XObject. The page's original content streams are wrapped in
+    shared q/Q streams and a shared 'draw /PMPageNumber' stream is appended, so only the small
+    XObject differs per page and the original content is never parsed or rewritten.
+    """
+    pages = list(writer.pages) # Materialise once; indexing the lazy page list re-walks the page tree
+    if start_page < 1 or start_page > len(pages):
+        raise ValueError(f"Start page ({start_page}) is out of range (1-{len(pages)}).")
+    page_boxes = [(float(page.mediabox.width), float(page.mediabox.height)) for page in pages]
+    overlays = build_page_number_overlays(page_boxes, start_page - 1, number_format, font_name, font_size, margin, position)
+
+    push_ref = _shared_stream(writer, b"q\n")
+    pop_ref = _shared_stream(writer, b"Q\n")
+    draw_ref = _shared_stream(writer, b"q " + PAGE_NUMBER_XOBJECT.encode() + b" Do Q\n")
+
+    for overlay_page, page in zip(list(overlays.pages), pages[start_page - 1:]):
+        media_box = page.mediabox
+        form = DecodedStreamObject()
+        form.set_data(overlay_page.get_contents().get_data())
+        form.update({
+            NameObject('/Type'): NameObject('/XObject'),
+            NameObject('/Subtype'): NameObject('/Form'),
+            NameObject('/BBox'): ArrayObject([FloatObject(0), FloatObject(0), FloatObject(media_box.width), FloatObject(media_box.height)]),
+            NameObject('/Matrix'): ArrayObject([FloatObject(v) for v in (1, 0, 0, 1, media_box.left, media_box.bottom)]),
+            # Cloning is memoised per source object, so the overlay font is written only once
+            NameObject('/Resources'): overlay_page['/Resources'].clone(writer),
+        })
+        form_ref = writer._add_object(form)
+
+        # Copy the (often shared) resource dictionaries before adding this page's overlay to them
+        resources = page['/Resources'] if '/Resources' in page else DictionaryObject()
+        new_resources = DictionaryObject(resources.items())
+        xobjects = resources['/XObject'] if '/XObject' in resources else DictionaryObject()
+        new_xobjects = DictionaryObject(xobjects.items())
+        new_xobjects[PAGE_NUMBER_XOBJECT] = form_ref
+        new_resources[NameObject('/XObject')] = new_xobjects
+        page[NameObject('/Resources')] = new_resources
+
+        new_contents = ArrayObject([push_ref])
+        if '/Contents' in page:
+            raw_contents = page.raw_get('/Contents')
+            resolved_contents = raw_contents.get_object()
+            if isinstance(resolved_contents, ArrayObject):
+                new_contents.extend(resolved_contents)
+            else:
+                new_contents.append(raw_contents)
+        new_contents.extend([pop_ref, draw_ref])
+        page[NameObject('/Contents')] = new_contents
+
 def handle_add_page_numbers(request_files, request_form):
     if 'files' not in request_files:
         return {'success': False, 'error': 'No file part in the request'}, 400
@@ -27,107 +141,40 @@ def handle_add_page_numbers(request_files, request_form):
         raise ValueError(f"Invalid file type: {original_filename}. Only PDF files are allowed.")
 
     # Options from frontend (examples)
-    position = request_form.get('position', 'bottom_right') # e.g., bottom_center, top_left
-    start_page = int(request_form.get('startPage', 1)) # 1-based page to start numbering from
-    number_format = request_form.get('numberFormat', '{current_page} of {total_pages}') # e.g., Page {current_page}
-    font_name = request_form.get('fontName', 'Helvetica')
-    font_size = int(request_form.get('fontSize', 10))
-    margin_str = request_form.get('margin', '0.5') # Margin from edge in inches
-    try:
-        margin = float(margin_str) * inch
-    except ValueError:
-        raise ValueError("Invalid margin value. Must be a number.")
+    page_number_options = parse_page_number_options(request_form)
 
 
     original_filename_secure = secure_filename(original_filename)
-    request_temp_folder = create_temp_folder("add_numbers_temp")
     
-    try:
-        temp_input_filepath = save_uploaded_file(file_stream, request_temp_folder)
-        
-        reader = PdfReader(temp_input_filepath)
-        writer = PdfWriter()
-        num_total_pages = len(reader.pages)
-
-        if num_total_pages == 0:
-            raise ValueError("The PDF file appears to be empty or corrupted.")
-        
-        if start_page < 1 or start_page > num_total_pages:
-            raise ValueError(f"Start page ({start_page}) is out of range (1-{num_total_pages}).")
-
-        for i in range(num_total_pages):
-            page = reader.pages[i]
-            
-            # Only add number if current page is >= start_page
-            if (i + 1) >= start_page:
-                packet = BytesIO()
-                # Create a new PDF with Reportlab
-                media_box = page.mediabox
-                can = canvas.Canvas(packet, pagesize=(media_box.width, media_box.height))
-                
-                # Format the page number string
-                current_page_display = i + 1 # Or could be (i + 1) - start_page + 1 if numbering should reset
-                page_number_text = number_format.replace('{current_page}', str(current_page_display)).replace('{total_pages}', str(num_total_pages))
-                
-                can.setFont(font_name, font_size)
-                # can.setFillColor(gray) # Example color
-
-                text_width = can.stringWidth(page_number_text, font_name, font_size)
-                
-                # Position calculation
-                x, y = 0, 0
-                if position == 'bottom_right':
-                    x = media_box.width - margin - text_width
-                    y = margin
-                elif position == 'bottom_center':
-                    x = (media_box.width - text_width) / 2
-                    y = margin
-                elif position == 'bottom_left':
-                    x = margin
-                    y = margin
-                elif position == 'top_right':
-                    x = media_box.width - margin - text_width
-                    y = media_box.height - margin - font_size # Adjust for font ascent
-                elif position == 'top_center':
-                    x = (media_box.width - text_width) / 2
-                    y = media_box.height - margin - font_size
-                elif position == 'top_left':
-                    x = margin
-                    y = media_box.height - margin - font_size
-                else: # Default to bottom_right
-                    x = media_box.width - margin - text_width
-                    y = margin
-
-                can.drawString(x, y, page_number_text)
-                can.save()
-
-                # Move to the beginning of the StringIO buffer
-                packet.seek(0)
-                new_pdf_page = PdfReader(packet).pages[0]
-                
-                # Merge the new page (with number) onto the original page
-                page.merge_page(new_pdf_page)
-            
-            writer.add_page(page)
-
-        output_filename_base = os.path.splitext(original_filename_secure)[0]
-        output_pdf_filename = f"{output_filename_base}_numbered_{uuid.uuid4().hex[:6]}.pdf"
-        output_pdf_filepath = os.path.join(current_app.config['CONVERTED_FILES_FOLDER'], output_pdf_filename)
-        
-        with open(output_pdf_filepath, "wb") as f_out:
-            writer.write(f_out)
-
-        response_data = {
-            'success': True, 
-            'message': f"Successfully added page numbers to the PDF.",
-            'download_url': f'/api/download/{output_pdf_filename}', 
-            'filename': output_pdf_filename,
-            'totalPages': num_total_pages
-        }
-        return response_data, 200
-    finally:
-        if request_temp_folder and os.path.exists(request_temp_folder):
-            try:
-                shutil.rmtree(request_temp_folder)
-            except OSError as e_clean:
-                current_app.logger.error(f"Error cleaning temp folder {request_temp_folder} for add_page_numbers: {e_clean}")
\ No newline at end of file
+    reader = load_pdf(open_uploaded_file(file_stream))
+    writer = PdfWriter()
+    num_total_pages = len(reader.pages)
+
+    if num_total_pages == 0:
+        raise ValueError("The PDF file appears to be empty or corrupted.")
+    
+    start_page = page_number_options['start_page']
+    if start_page < 1 or start_page > num_total_pages:
+        raise ValueError(f"Start page ({start_page}) is out of range (1-{num_total_pages}).")
+
+    for page in reader.pages:
+        writer.add_page(page)
+
+    # All overlays are built as one ReportLab document and stamped without re-parsing page content
+    add_page_numbers_to_writer(writer, **page_number_options)
+
+    output_filename_base = os.path.splitext(original_filename_secure)[0]
+    output_pdf_filename = f"{output_filename_base}_numbered_{uuid.uuid4().hex[:6]}.pdf"
+    output_pdf_filepath = output_path(output_pdf_filename)
+    
+    with stage_timer(STAGE_OUTPUT_WRITE), open(output_pdf_filepath, "wb") as f_out:
+        writer.write(f_out)
+
+    response_data = {
+        'success': True, 
+        'message': f"Successfully added page numbers to the PDF.",
+        'download_url': f'/api/download/{output_pdf_filename}', 
+        'filename': output_pdf_filename,
+        'totalPages': num_total_pages
+    }
+    return response_data, 200
\ No newline at end of file
@@ -0,0 +1,105 @@
+# backend/blueprints/pdf_operations/batch_runner.py
+import os
+import json
+import uuid
+import shutil
+import zipfile
+from flask import current_app
+from werkzeug.utils import secure_filename
+from .utils import create_temp_folder
+from .output_store import output_path, locate_output, get_output_store
+from .job_manager import snapshot_upload, submit_operation
+
+# Operations that combine several uploads into one output cannot be applied file by file
+BATCH_EXCLUDED_OPERATIONS = {'merge'}
+BATCH_RESULTS_ARCNAME = 'batch_results.json' # Per-file outcome, also inside the archive
+
+
+def _archive_name(filename, used_names):
+    # Repeated uploads can be answered from the result cache with the same output name
+    arcname, counter = filename, 1
+    while arcname in used_names:
+        counter += 1
+        arcname = f"{counter}_{filename}"
+    used_names.add(arcname)
+    return arcname
+
+def run_batch(operation, handler, request_files, request_form):
+    """
+    Applies one operation to every file uploaded under 'files', each as its own request on the job
+    pool, and packs the outputs into one ZIP. A file that fails gets an error entry in 'results'
+    instead of failing the batch. Returns (response_data, status_code) like a handler.
+    """
+    if operation in BATCH_EXCLUDED_OPERATIONS:
+        raise ValueError(f"'{operation}' combines its files and cannot be run as a batch.")
+    files = [file_stream for file_stream in request_files.getlist('files') if file_stream and file_stream.filename]
+    if not files:
+        raise ValueError('No files selected for batch processing.')
+    max_files = current_app.config['BATCH_MAX_FILES']
+    if len(files) > max_files:
+        raise ValueError(f"Too many files for one batch ({len(files)}). The maximum is {max_files}.")
+
+    form_items = [(key, value) for key, value in request_form.items(multi=True) if key != 'async']
+    input_folder = create_temp_folder("batch_input")
+    try:
+        # Inputs are copied to disk first so pool workers can open them; a rejected upload only fails its own entry
+        pending = []
+        for index, file_stream in enumerate(files):
+            try:
+                file_spec = snapshot_upload(index, 'files', file_stream, input_folder)
+                pending.append((file_stream.filename, submit_operation(operation, handler, [file_spec], form_items)))
+            except ValueError as ve:
+                pending.append((file_stream.filename, ({'success': False, 'error': str(ve)}, 400)))
+
+        results = []
+        for original_filename, outcome in pending:
+            if isinstance(outcome, tuple):
+                response_data, status_code = outcome
+            else:
+                try:
+                    response_data, status_code = outcome.result()
+                except Exception as e: # The worker died; the other files are unaffected
+                    current_app.logger.error(f"Batch '{operation}' worker failed on '{original_filename}': {str(e)}")
+                    response_data, status_code = {'success': False, 'error': f'The conversion worker failed: {str(e) or type(e).__name__}'}, 500
+            results.append((original_filename, response_data, status_code))
+    finally:
+        shutil.rmtree(input_folder, ignore_errors=True)
+
+    archive_filename = f"batch_{operation}_{uuid.uuid4().hex[:6]}.zip"
+    archive_filepath = output_path(archive_filename)
+    file_results, used_names = [], {BATCH_RESULTS_ARCNAME}
+    with zipfile.ZipFile(archive_filepath, 'w', zipfile.ZIP_DEFLATED) as zipf:
+        for original_filename, response_data, status_code in results:
+            entry = {'file': original_filename, 'success': status_code == 200 and bool(response_data.get('success'))}
+            item_path = locate_output(secure_filename(response_data.get('filename') or '')) if entry['success'] else None
+            if item_path is not None:
+                entry['output'] = _archive_name(os.path.basename(item_path), used_names)
+                if response_data.get('cached'):
+                    entry['cached'] = True
+                zipf.write(item_path, arcname=entry['output'])
+            else:
+                entry['success'] = False
+                entry['status_code'] = status_code if status_code != 200 else 500
+                entry['error'] = response_data.get('error') or 'No output was produced.'
+            file_results.append(entry)
+        zipf.writestr(BATCH_RESULTS_ARCNAME, json.dumps(file_results, indent=2))
+
+    succeeded = sum(1 for entry in file_results if entry['success'])
+    current_app.logger.info(f"Batch '{operation}': {succeeded} of {len(file_results)} file(s) succeeded")
+    if not succeeded:
+        os.remove(archive_filepath)
+        return {'success': False, 'error': f'None of the {len(file_results)} file(s) could be processed.', 'results': file_results}, 400
+
+    output_store = get_output_store()
+    if output_store is not None:
+        output_store.register(archive_filename)
+    response_data = {
+        'success': True,
+        'message': f"Processed {succeeded} of {len(file_results)} file(s) with {operation.replace('_', ' ')}.",
+        'download_url': f'/api/download/{archive_filename}',
+        'filename': archive_filename,
+        'succeeded': succeeded,
+        'failed': len(file_results) - succeeded,
+        'results': file_results
+    }
+    return response_data, 200
@@ -0,0 +1,215 @@
+# backend/blueprints/pdf_operations/compress_engine.py
+import zlib
+from io import BytesIO
+from PIL import Image
+from pypdf.generic import ContentStream, DecodedStreamObject, EncodedStreamObject, NameObject, NumberObject
+from .cpu_pool import run_sharded, get_worker_reader
+
+# level -> (highest effective DPI kept, JPEG quality). Images are never upsampled.
+COMPRESSION_LEVELS = {
+    'low': (300, 85),
+    'medium': (150, 72),
+    'high': (96, 55),
+}
+DEFAULT_COMPRESSION_LEVEL = 'medium'
+
+IMAGE_SHARD_SIZE = 4 # Images per worker task; scans have one large image per page
+IMAGE_PARALLEL_MIN_IMAGES = 8
+DOWNSAMPLE_SLACK = 1.1 # Leave images alone unless they are more than 10% above the target DPI
+MIN_SAVING_RATIO = 0.9 # A re-encoded image is only used if it is at least 10% smaller
+MIN_IMAGE_PIXELS = 64 * 64 # Icons and logos are not worth the generation loss
+
+RAW_COLOUR_SPACES = {'/DeviceRGB': 'RGB', '/DeviceGray': 'L'}
+
+# Pillow modes that survive a round trip through JPEG without changing what is displayed
+JPEG_MODES = {'L': 'L', 'RGB': 'RGB', 'P': 'RGB', 'RGBA': 'RGB', 'LA': 'L'}
+
+
+def _multiply(m1, m2):
+    a1, b1, c1, d1, e1, f1 = m1
+    a2, b2, c2, d2, e2, f2 = m2
+    return (a1 * a2 + b1 * c2, a1 * b2 + b1 * d2,
+            c1 * a2 + d1 * c2, c1 * b2 + d1 * d2,
+            e1 * a2 + f1 * c2 + e2, e1 * b2 + f1 * d2 + f2)
+
+def _image_display_sizes(page, reader, image_names):
+    """
+    Returns {xobject_name: (width_pt, height_pt)}: the largest size each image is painted at on the page,
+    found by following q/Q/cm in the content stream. Images drawn inside form XObjects are not found
+    here; the caller then assumes they may cover the whole page.
+    """
+    contents = page.get_contents()
+    if contents is None:
+        return {}
+    if not isinstance(contents, ContentStream):
+        contents = ContentStream(contents, reader)
+    sizes = {}
+    ctm, stack = (1, 0, 0, 1, 0, 0), []
+    for operands, operator in contents.operations:
+        if operator == b'q':
+            stack.append(ctm)
+        elif operator == b'Q':
+            ctm = stack.pop() if stack else (1, 0, 0, 1, 0, 0)
+        elif operator == b'cm' and len(operands) == 6:
+            ctm = _multiply(tuple(float(value) for value in operands), ctm)
+        elif operator == b'Do' and operands and operands[0] in image_names:
+            a, b, c, d = ctm[:4]
+            width, height = (a * a + b * b) ** 0.5, (c * c + d * d) ** 0.5
+            previous = sizes.get(operands[0], (0, 0))
+            sizes[operands[0]] = (max(previous[0], width), max(previous[1], height))
+    return sizes
+
+def collect_images(reader, max_dpi):
+    """
+    Finds the raster images of every page and the pixel size each should be reduced to.
+    Returns [(object_number, target_width, target_height), ...], one entry per image object.
+    """
+    targets = {}
+    for page in reader.pages:
+        xobjects = page.get('/Resources', {}).get('/XObject')
+        if not xobjects:
+            continue
+        xobjects = xobjects.get_object()
+        images = {}
+        for name, reference in xobjects.items():
+            if not hasattr(reference, 'idnum'):
+                continue # Inline (direct) streams cannot be shared, nothing to gain
+            xobject = reference.get_object()
+            if xobject.get('/Subtype') != '/Image' or xobject.get('/ImageMask') or xobject.get('/BitsPerComponent', 8) != 8:
+                continue # Masks and bilevel scans compress far better as they are than as JPEG
+            if isinstance(xobject.get('/Mask'), list):
+                continue # Colour-key masking needs exact pixel values, which JPEG does not keep
+            colour_space = xobject['/ColorSpace'] if '/ColorSpace' in xobject else None
+            if '/Decode' in xobject or not isinstance(colour_space, str) or colour_space not in RAW_COLOUR_SPACES:
+                # The replacement is plain DeviceRGB/DeviceGray: ICC profiles, spot colours, palettes and
+                # inverted or remapped samples would all come out in different colours
+                continue
+            if int(xobject.get('/Width', 0)) * int(xobject.get('/Height', 0)) < MIN_IMAGE_PIXELS:
+                continue
+            images[name] = (reference.idnum, int(xobject['/Width']), int(xobject['/Height']))
+        if not images:
+            continue
+
+        page_width, page_height = float(page.mediabox.width), float(page.mediabox.height)
+        display_sizes = _image_display_sizes(page, reader, images)
+        for name, (object_number, width, height) in images.items():
+            shown_width, shown_height = display_sizes.get(name, (page_width, page_height))
+            # Resolution along the less dense axis, so neither direction ends up below max_dpi
+            effective_dpi = min(width * 72 / max(shown_width, 1), height * 72 / max(shown_height, 1))
+            scale = max_dpi / effective_dpi if effective_dpi > max_dpi * DOWNSAMPLE_SLACK else 1.0
+            target_width, target_height = max(1, round(width * scale)), max(1, round(height * scale))
+            previous = targets.get(object_number)
+            if previous: # Shared image: keep enough pixels for its largest placement
+                target_width, target_height = max(previous[0], target_width), max(previous[1], target_height)
+            targets[object_number] = (target_width, target_height)
+    return [(object_number, width, height) for object_number, (width, height) in targets.items()]
+
+def _decode_image(xobject):
+    """
+    Pillow image of an image XObject. JPEGs and plain RGB/gray pixel data are read directly; anything
+    else goes through pypdf's decode_as_image, which is slower as it also builds a PNG of the image.
+    """
+    filters = xobject.get('/Filter')
+    if filters in ('/DCTDecode', ['/DCTDecode']):
+        return Image.open(BytesIO(xobject._data))
+    mode = RAW_COLOUR_SPACES.get(xobject['/ColorSpace'])
+    if mode:
+        width, height = int(xobject['/Width']), int(xobject['/Height'])
+        data = xobject.get_data() # Filters and PNG predictors undone
+        if len(data) >= width * height * len(mode):
+            return Image.frombytes(mode, (width, height), data[:width * height * len(mode)])
+    return xobject.decode_as_image()
+
+def _recompress_image_objects(document, images, jpeg_quality):
+    """
+    Decodes, downsamples and JPEG-encodes the given image objects of document (a reader or writer).
+    Returns [(object_number, jpeg_bytes, width, height, colour_components), ...] for the images
+    that got meaningfully smaller; the others are left out.
+    """
+    results = []
+    for object_number, target_width, target_height in images:
+        xobject = document.get_object(object_number)
+        original_length = len(xobject._data) if isinstance(xobject, EncodedStreamObject) else len(xobject.get_data())
+        try:
+            image = _decode_image(xobject)
+        except Exception: # Unsupported colour space or filter: leave the image untouched
+            continue
+        if image is None or image.mode not in JPEG_MODES:
+            continue # CMYK and 1-bit images would change appearance as JPEG
+        image = image.convert(JPEG_MODES[image.mode])
+        if (target_width, target_height) != image.size:
+            image = image.resize((target_width, target_height), Image.LANCZOS)
+        buffer = BytesIO()
+        image.save(buffer, format='JPEG', quality=jpeg_quality, optimize=True)
+        if buffer.tell() < original_length * MIN_SAVING_RATIO:
+            results.append((object_number, buffer.getvalue(), image.width, image.height, 1 if image.mode == 'L' else 3))
+    return results
+
+def _recompress_image_shard(input_path, images, jpeg_quality):
+    """Worker task: _recompress_image_objects on the worker's own parse of input_path."""
+    return _recompress_image_objects(get_worker_reader(input_path), images, jpeg_quality)
+
+def _replace_image(xobject, jpeg_bytes, width, height, colour_components):
+    for key in ('/DecodeParms', '/Intent'):
+        xobject.pop(key, None)
+    xobject[NameObject('/Filter')] = NameObject('/DCTDecode')
+    xobject[NameObject('/Width')] = NumberObject(width)
+    xobject[NameObject('/Height')] = NumberObject(height)
+    xobject[NameObject('/BitsPerComponent')] = NumberObject(8)
+    xobject[NameObject('/ColorSpace')] = NameObject('/DeviceGray' if colour_components == 1 else '/DeviceRGB')
+    xobject._data = jpeg_bytes # Already encoded; pypdf writes _data verbatim
+    xobject.decoded_self = None
+
+def recompress_images(document, input_path, level):
+    """
+    Downsamples and re-encodes the images of document in place (the parsed objects are changed, so pages
+    added to a writer afterwards carry the smaller images). Decoding and encoding run on the CPU pool,
+    whose workers parse input_path themselves; pass input_path=None when document no longer matches a
+    file on disk (a decrypted reader, or a writer built in memory) and the work then runs in this process.
+    Returns the number of images replaced.
+    """
+    max_dpi, jpeg_quality = COMPRESSION_LEVELS[level]
+    images = collect_images(document, max_dpi)
+    if input_path is None:
+        shard_results = [_recompress_image_objects(document, images, jpeg_quality)]
+    else:
+        shards = [(input_path, images[start:start + IMAGE_SHARD_SIZE], jpeg_quality)
+                  for start in range(0, len(images), IMAGE_SHARD_SIZE)]
+        shard_results = run_sharded(_recompress_image_shard, shards, parallel=len(images) >= IMAGE_PARALLEL_MIN_IMAGES)
+    replaced = 0
+    for results in shard_results:
+        for object_number, jpeg_bytes, width, height, colour_components in results:
+            xobject = document.get_object(object_number)
+            if isinstance(xobject, EncodedStreamObject):
+                _replace_image(xobject, jpeg_bytes, width, height, colour_components)
+                replaced += 1
+    return replaced
+
+def recompress_flate_streams(writer):
+    """
+    Re-deflates every Flate (or unfiltered) stream of the writer at level 9, keeping the result only
+    when it is smaller. Streams with other filters (JPEG, CCITT, JBIG2...) are left alone.
+    """
+    for index, obj in enumerate(writer._objects):
+        if isinstance(obj, EncodedStreamObject) and obj.get('/Filter') in ('/FlateDecode', ['/FlateDecode']):
+            try:
+                data = obj.get_data() # Decoded, with any PNG predictor already undone
+            except Exception:
+                continue
+            recompressed = zlib.compress(data, 9)
+            if len(recompressed) < len(obj._data):
+                obj.pop('/DecodeParms', None)
+                obj[NameObject('/Filter')] = NameObject('/FlateDecode')
+                obj._data = recompressed
+                obj.decoded_self = None
+        elif isinstance(obj, DecodedStreamObject) and '/Filter' not in obj:
+            data = obj.get_data()
+            if len(data) > 64:
+                encoded = obj.flate_encode(level=9)
+                if len(encoded._data) < len(data):
+                    writer._objects[index] = encoded
+
+def compress_writer_streams(writer):
+    """Final lossless pass: merges identical objects, drops unreferenced ones and re-deflates streams."""
+    writer.compress_identical_objects(remove_identicals=True, remove_orphans=True)
+    recompress_flate_streams(writer)
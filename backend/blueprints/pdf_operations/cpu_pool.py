@@ -0,0 +1,81 @@
+# backend/blueprints/pdf_operations/cpu_pool.py
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from flask import current_app
+from pypdf import PdfReader
+
+# One pool per process for CPU-bound page work (splitting, rendering, extraction...).
+# Unlike the job pool it runs pieces of a single request, not whole requests.
+_pool = None
+_pool_lock = threading.Lock()
+
+# Each worker process keeps the reader of the last input it saw, so all shards it handles
+# share a single read and parse of the document.
+_worker_reader = (None, None)
+
+
+def _get_pool(reset=False):
+    global _pool
+    with _pool_lock:
+        if reset and _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=current_app.config['CPU_POOL_WORKERS'],
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _pool
+
+def get_worker_reader(input_path):
+    """PdfReader for input_path, reused across the shards a worker process runs for the same file."""
+    global _worker_reader
+    cached_path, reader = _worker_reader
+    if cached_path != input_path:
+        reader = PdfReader(input_path)
+        _worker_reader = (input_path, reader)
+    return reader
+
+def cpu_pool_size():
+    return current_app.config.get('CPU_POOL_WORKERS', 1)
+
+def shard_ranges(total, shard_size):
+    """Splits range(total) into consecutive (start, stop) pairs of at most shard_size items."""
+    shard_size = max(1, shard_size)
+    return [(start, min(start + shard_size, total)) for start in range(0, total, shard_size)]
+
+def run_sharded(fn, shard_args, parallel=True, max_in_flight=None):
+    """
+    Calls fn(*args) for every entry of shard_args and yields the results in input order.
+    At most max_in_flight shards are queued at once (default: twice the pool size) so the
+    caller can consume results as they come without every shard's output sitting in memory.
+    Runs inline when parallel is False or the pool is configured with a single worker.
+    """
+    shard_args = list(shard_args)
+    if not parallel or cpu_pool_size() <= 1 or len(shard_args) <= 1:
+        for args in shard_args:
+            yield fn(*args)
+        return
+
+    max_in_flight = max_in_flight or cpu_pool_size() * 2
+    try:
+        pool = _get_pool()
+        pool.submit(int).result() # Surfaces a broken pool before any real work is queued
+    except BrokenProcessPool:
+        current_app.logger.warning("CPU pool was broken (a worker died). Recreating it.")
+        pool = _get_pool(reset=True)
+
+    pending = deque()
+    next_index = 0
+    try:
+        while next_index < len(shard_args) or pending:
+            while next_index < len(shard_args) and len(pending) < max_in_flight:
+                pending.append(pool.submit(fn, *shard_args[next_index]))
+                next_index += 1
+            yield pending.popleft().result()
+    finally:
+        for future in pending: # Consumer stopped early or a shard failed
+            future.cancel()
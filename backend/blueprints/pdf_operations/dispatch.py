@@ -0,0 +1,97 @@
+# backend/blueprints/pdf_operations/dispatch.py
+import os
+import subprocess
+from flask import current_app
+from werkzeug.utils import secure_filename
+from .result_cache import get_result_cache, compute_cache_key
+from .upload_ingest import get_upload_size
+from .metrics import OperationMetrics
+from .output_store import get_output_store, locate_output
+from .document_store import DocumentStream
+from .search_index import get_search_index
+
+INDEXING_OPERATIONS = {'pdf_to_text'} # Operations that add the stored documents they read to the search index
+
+
+def get_filename_for_logging(request_files):
+    """Returns the secure name of the first uploaded file, used to give log lines some context."""
+    if 'files' in request_files:
+        files_list = request_files.getlist('files')
+        if files_list and files_list[0] and files_list[0].filename:
+            return secure_filename(files_list[0].filename)
+    return "unknown_file"
+
+def _needs_indexing(operation, request_files):
+    """True when running the handler would index a stored document that is not in the search index yet."""
+    if operation not in INDEXING_OPERATIONS:
+        return False
+    search_index = get_search_index()
+    if search_index is None:
+        return False
+    return any(isinstance(file_stream.stream, DocumentStream) and not search_index.is_indexed(file_stream.stream.document_id)
+               for file_stream in request_files.getlist('files') if file_stream)
+
+def _output_size(response_data):
+    output_path = locate_output(secure_filename(response_data.get('filename') or ''))
+    return os.path.getsize(output_path) if output_path else 0
+
+def dispatch_operation(operation, handler, request_files, request_form, filename_for_logging=None):
+    """
+    Runs an operation handler and turns the exceptions it raises into the same
+    (response_data, status_code) tuple the handlers return on success.
+    Shared by the synchronous route and the background job workers.
+    Successful results are remembered in the result cache, so a repeat of the same
+    upload with the same options returns the existing output without running the handler.
+    Timings, sizes and page counts are recorded in the Prometheus metrics.
+    """
+    with OperationMetrics(operation) as operation_metrics:
+        operation_metrics.bytes_in = sum(
+            get_upload_size(file_stream) for _, file_stream in request_files.items(multi=True)
+            if file_stream and file_stream.filename
+        )
+        response_data, status_code = _run_operation(operation, handler, request_files, request_form, filename_for_logging)
+        if status_code == 200:
+            operation_metrics.bytes_out = _output_size(response_data)
+            output_store = get_output_store()
+            if output_store is not None and response_data.get('filename'):
+                if response_data.get('cached'):
+                    output_store.renew(response_data['filename']) # The same file again: keep its size and content hash
+                else:
+                    output_store.register(response_data['filename'])
+        operation_metrics.finish(response_data, status_code)
+    return response_data, status_code
+
+def _run_operation(operation, handler, request_files, request_form, filename_for_logging):
+    if filename_for_logging is None:
+        filename_for_logging = get_filename_for_logging(request_files)
+
+    result_cache = get_result_cache()
+    cache_key = None
+    if result_cache is not None:
+        cache_key = compute_cache_key(operation, request_files, request_form)
+        # A hit would skip the handler, and with it the indexing of a stored document
+        cached_response = None if _needs_indexing(operation, request_files) else result_cache.get(cache_key)
+        if cached_response is not None:
+            current_app.logger.info(f"Result cache hit for '{operation}' on file '{filename_for_logging}'")
+            return dict(cached_response, cached=True), 200
+
+    try:
+        # The handler is responsible for its own temp file management and specific logic
+        response_data, status_code = handler(request_files, request_form)
+        if cache_key is not None and status_code == 200 and response_data.get('success'):
+            result_cache.put(cache_key, operation, response_data)
+        return response_data, status_code
+
+    except ValueError as ve: # Catch validation errors raised by handlers
+        current_app.logger.warning(f"Validation Error during '{operation}' for file '{filename_for_logging}': {str(ve)}")
+        # Pass totalPages if the ValueError instance has it (set by parse_page_ranges for example)
+        return {'success': False, 'error': str(ve), 'totalPages': getattr(ve, 'totalPages', 0)}, 400
+    except FileNotFoundError as fnfe: # Catch if a required tool (like soffice) is not found
+        current_app.logger.error(f"Tool Not Found Error during '{operation}' for file '{filename_for_logging}': {str(fnfe)}")
+        return {'success': False, 'error': str(fnfe)}, 500 # Let handler's message be used
+    except subprocess.TimeoutExpired:
+        current_app.logger.error(f"Process timed out during '{operation}' for file '{filename_for_logging}'")
+        return {'success': False, 'error': f'{operation.replace("_", " ").title()} conversion timed out. File might be too large/complex.'}, 500
+    except Exception as e: # Catch all other unexpected errors from handlers
+        current_app.logger.error(f"Unexpected Error during '{operation}' for file '{filename_for_logging}': {str(e)}", exc_info=True)
+        return {'success': False, 'error': f'An unexpected error occurred in {operation}: {str(e)}'}, 500
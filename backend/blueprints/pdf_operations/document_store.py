@@ -0,0 +1,241 @@
+# backend/blueprints/pdf_operations/document_store.py
+import io
+import os
+import re
+import time
+import uuid
+import shutil
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from flask import current_app
+from pypdf import PdfReader
+from werkzeug.datastructures import FileStorage
+from .upload_ingest import verify_upload, get_upload_sha256, get_upload_size
+from .search_index import get_search_index
+
+DOCUMENT_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+DOCUMENT_SWEEP_INTERVAL = 60 # Seconds between opportunistic sweeps of idle documents, per process
+READER_MEMORY_FACTOR = 3 # A parsed reader holds the file's bytes plus the objects resolved from them
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+# Per-process LRU of parsed readers: document_id -> (reader, estimated_bytes)
+_readers = OrderedDict()
+_readers_bytes = 0
+_readers_lock = threading.Lock()
+
+
+class DocumentStream(io.FileIO):
+    """
+    Read-only stream over a stored document, used as the stream of the FileStorage handlers receive.
+    load_pdf takes the document's parsed reader from the LRU instead of parsing the stream; the reader
+    goes back to the LRU when the stream is closed.
+    """
+
+    def __init__(self, path, document_id, sha256, reader_cache_max_bytes):
+        super().__init__(path, 'rb')
+        self.document_id = document_id
+        self.sha256 = sha256 # Lets the result cache skip hashing the file again
+        self.reader_cache_max_bytes = reader_cache_max_bytes
+        self.reader = None
+
+    def close(self):
+        if self.reader is not None:
+            _release_reader(self.document_id, self.reader, os.fstat(self.fileno()).st_size, self.reader_cache_max_bytes)
+            self.reader = None
+        super().close()
+
+
+def checkout_reader(stream):
+    """
+    Parsed reader of a stored document, for the exclusive use of the caller until stream is closed.
+    A request that finds the cached reader already checked out parses its own copy.
+    """
+    global _readers_bytes
+    with _readers_lock:
+        entry = _readers.pop(stream.document_id, None)
+        if entry is not None:
+            _readers_bytes -= entry[1]
+    reader = entry[0] if entry is not None else PdfReader(stream.name) # pypdf reads the whole file into memory
+    stream.reader = reader
+    return reader
+
+def _release_reader(document_id, reader, size_bytes, max_bytes):
+    global _readers_bytes
+    if reader.is_encrypted:
+        return # Possibly decrypted with a password by the last request; the next one must supply its own
+    weight = size_bytes * READER_MEMORY_FACTOR
+    if weight > max_bytes:
+        return
+    with _readers_lock:
+        if document_id in _readers:
+            return # Another request's copy went back first
+        _readers[document_id] = (reader, weight)
+        _readers_bytes += weight
+        while _readers_bytes > max_bytes:
+            _, (_, evicted_weight) = _readers.popitem(last=False)
+            _readers_bytes -= evicted_weight
+
+def forget_reader(document_id):
+    global _readers_bytes
+    with _readers_lock:
+        entry = _readers.pop(document_id, None)
+        if entry is not None:
+            _readers_bytes -= entry[1]
+
+
+class DocumentStore:
+    """
+    Uploaded files kept under an id so later requests can refer to them instead of uploading the
+    bytes again. Files live in DOCUMENTS_FOLDER; the SQLite index is shared by all Flask processes.
+    Documents not used for ttl_seconds are deleted.
+    """
+
+    def __init__(self, db_path, documents_folder, ttl_seconds):
+        self.db_path = db_path
+        self.documents_folder = documents_folder
+        self.ttl_seconds = ttl_seconds
+        self._last_sweep = 0
+        os.makedirs(documents_folder, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS documents ("
+                " document_id TEXT PRIMARY KEY, filename TEXT, content_type TEXT, size_bytes INTEGER,"
+                " sha256 TEXT, created_at REAL, last_access REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_documents_last_access ON documents(last_access)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def _path(self, document_id):
+        return os.path.join(self.documents_folder, document_id)
+
+    def add(self, file_stream):
+        """Stores an upload and returns its metadata, including the new document_id."""
+        verify_upload(file_stream)
+        self.sweep()
+        document_id = uuid.uuid4().hex
+        file_stream.seek(0)
+        file_stream.save(self._path(document_id))
+        return self._insert(document_id, file_stream.filename, file_stream.content_type,
+                            get_upload_size(file_stream), get_upload_sha256(file_stream))
+
+    def add_file(self, path, filename, content_type, size_bytes, sha256):
+        """Stores a file already on disk (e.g. an assembled resumable upload) by moving it in."""
+        self.sweep()
+        document_id = uuid.uuid4().hex
+        shutil.move(path, self._path(document_id))
+        return self._insert(document_id, filename, content_type, size_bytes, sha256)
+
+    def _insert(self, document_id, filename, content_type, size_bytes, sha256):
+        now = time.time()
+        document = {
+            'document_id': document_id,
+            'filename': filename,
+            'content_type': content_type,
+            'size_bytes': size_bytes,
+            'sha256': sha256,
+            'created_at': now,
+            'last_access': now
+        }
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO documents (document_id, filename, content_type, size_bytes, sha256, created_at, last_access)"
+                " VALUES (:document_id, :filename, :content_type, :size_bytes, :sha256, :created_at, :last_access)", document)
+        return document
+
+    def get(self, document_id):
+        """Metadata of a live document (refreshing its access time), or None."""
+        if not DOCUMENT_ID_PATTERN.match(document_id or ''):
+            return None
+        with self._connect() as conn:
+            conn.execute("UPDATE documents SET last_access = ? WHERE document_id = ?", (time.time(), document_id))
+            row = conn.execute("SELECT * FROM documents WHERE document_id = ?", (document_id,)).fetchone()
+        if row is None or not os.path.isfile(self._path(document_id)):
+            return None
+        return dict(row)
+
+    def open(self, document_id, reader_cache_max_bytes, field_name='files'):
+        """FileStorage over a stored document, as if it had just been uploaded. None for unknown ids."""
+        document = self.get(document_id)
+        if document is None:
+            return None
+        stream = DocumentStream(self._path(document_id), document_id, document['sha256'], reader_cache_max_bytes)
+        return FileStorage(stream=stream, filename=document['filename'], name=field_name, content_type=document['content_type'])
+
+    def delete(self, document_id):
+        if not DOCUMENT_ID_PATTERN.match(document_id or ''):
+            return False
+        with self._connect() as conn:
+            deleted = conn.execute("DELETE FROM documents WHERE document_id = ?", (document_id,)).rowcount
+        self._remove_file(document_id)
+        return deleted == 1
+
+    def _remove_file(self, document_id):
+        forget_reader(document_id)
+        search_index = get_search_index()
+        if search_index is not None:
+            search_index.remove_document(document_id)
+        try:
+            os.remove(self._path(document_id))
+        except FileNotFoundError:
+            pass
+
+    def sweep(self):
+        """Deletes documents idle for longer than ttl_seconds. Runs at most every DOCUMENT_SWEEP_INTERVAL."""
+        now = time.time()
+        if now - self._last_sweep < DOCUMENT_SWEEP_INTERVAL:
+            return 0
+        self._last_sweep = now
+        with self._connect() as conn:
+            expired = [row[0] for row in conn.execute(
+                "SELECT document_id FROM documents WHERE last_access < ?", (now - self.ttl_seconds,))]
+            conn.executemany("DELETE FROM documents WHERE document_id = ?", [(document_id,) for document_id in expired])
+        for document_id in expired:
+            self._remove_file(document_id)
+        return len(expired)
+
+
+def get_document_store():
+    config = current_app.config
+    db_path = config['DOCUMENT_INDEX_DB']
+    with _stores_lock:
+        if db_path not in _stores:
+            _stores[db_path] = DocumentStore(db_path, config['DOCUMENTS_FOLDER'], config['DOCUMENT_TTL_SECONDS'])
+        return _stores[db_path]
+
+def resolve_documents(request_files, request_form):
+    """
+    The uploaded files followed by the stored documents named in the 'documentId' form field(s),
+    all under 'files'. Raises LookupError for an unknown or expired id.
+    The caller must close the returned files (see close_documents) so cached readers are released.
+    """
+    document_ids = request_form.getlist('documentId')
+    if not document_ids:
+        return request_files
+    document_store = get_document_store()
+    max_bytes = current_app.config['DOCUMENT_READER_CACHE_MAX_BYTES']
+    resolved = request_files.copy()
+    for document_id in document_ids:
+        file_storage = document_store.open(document_id, max_bytes)
+        if file_storage is None:
+            close_documents(resolved)
+            raise LookupError(f"Document '{document_id}' was not found or has expired. Please upload the file again.")
+        resolved.add('files', file_storage)
+    return resolved
+
+def close_documents(request_files):
+    for _, file_storage in request_files.items(multi=True):
+        if isinstance(file_storage.stream, DocumentStream):
+            file_storage.close()
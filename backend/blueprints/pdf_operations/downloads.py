@@ -0,0 +1,88 @@
+# backend/blueprints/pdf_operations/downloads.py
+import os
+import hashlib
+import mimetypes
+import threading
+from collections import OrderedDict
+from urllib.parse import quote
+from flask import Response, current_app, request, send_file
+
+OFFLOAD_X_SENDFILE = 'x-sendfile' # Apache mod_xsendfile, lighttpd
+OFFLOAD_X_ACCEL_REDIRECT = 'x-accel-redirect' # nginx internal location
+HASH_CHUNK_SIZE = 1024 * 1024
+MEMORY_HASH_CACHE_SIZE = 4096 # Used when there is no output index to remember hashes in
+
+_memory_hashes = OrderedDict()
+_memory_hashes_lock = threading.Lock()
+
+
+def _hash_file(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def content_etag(filename, file_path, output_store=None):
+    """
+    Strong ETag for an output: the SHA-256 of its content, computed on the first download and remembered
+    in the output index until the output is registered again (or in memory, keyed by size and mtime).
+    """
+    if output_store is not None:
+        sha256 = output_store.get_sha256(filename)
+        if sha256 is None:
+            sha256 = _hash_file(file_path)
+            output_store.set_sha256(filename, sha256)
+        return sha256
+
+    stat = os.stat(file_path)
+    key = (file_path, stat.st_size, stat.st_mtime_ns)
+    with _memory_hashes_lock:
+        if key in _memory_hashes:
+            _memory_hashes.move_to_end(key)
+            return _memory_hashes[key]
+    sha256 = _hash_file(file_path)
+    with _memory_hashes_lock:
+        _memory_hashes[key] = sha256
+        while len(_memory_hashes) > MEMORY_HASH_CACHE_SIZE:
+            _memory_hashes.popitem(last=False)
+    return sha256
+
+def _set_cache_headers(response):
+    # Outputs are per user: private. Not immutable, since nothing stops a name from being written twice;
+    # after max-age the browser revalidates against the content ETag.
+    response.cache_control.no_cache = None
+    response.cache_control.public = None
+    response.cache_control.private = True
+    response.cache_control.max_age = current_app.config['DOWNLOAD_CACHE_MAX_AGE']
+
+def _offloaded_response(file_path, download_name, etag, offload):
+    """Headers-only response; the front web server sends the body and handles Range requests itself."""
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(mimetype=mimetypes.guess_type(download_name)[0] or 'application/octet-stream')
+        response.headers.set('Content-Disposition', 'attachment', filename=download_name)
+        if offload == OFFLOAD_X_ACCEL_REDIRECT:
+            relative_path = os.path.relpath(file_path, current_app.config['CONVERTED_FILES_FOLDER'])
+            response.headers['X-Accel-Redirect'] = current_app.config['DOWNLOAD_ACCEL_PREFIX'].rstrip('/') + '/' + quote(relative_path.replace(os.sep, '/'))
+        else:
+            response.headers['X-Sendfile'] = os.path.abspath(file_path)
+    response.set_etag(etag)
+    _set_cache_headers(response)
+    return response
+
+def build_download_response(filename, file_path, output_store=None):
+    """
+    Response for a finished output: strong content ETag, conditional GET (If-None-Match / If-Range)
+    and byte ranges so interrupted downloads resume. With DOWNLOAD_OFFLOAD set, only headers are
+    produced and the front web server streams the file instead of this worker.
+    """
+    etag = content_etag(filename, file_path, output_store)
+    offload = (current_app.config.get('DOWNLOAD_OFFLOAD') or '').lower()
+    if offload in (OFFLOAD_X_SENDFILE, OFFLOAD_X_ACCEL_REDIRECT):
+        return _offloaded_response(file_path, filename, etag, offload)
+
+    response = send_file(file_path, as_attachment=True, download_name=filename, etag=etag, conditional=True)
+    _set_cache_headers(response)
+    return response
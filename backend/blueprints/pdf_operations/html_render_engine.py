@@ -0,0 +1,257 @@
+# backend/blueprints/pdf_operations/html_render_engine.py
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from flask import current_app
+from weasyprint import HTML, CSS # Using WeasyPrint
+from weasyprint.text.fonts import FontConfiguration
+from weasyprint.urls import URLFetcher, URLFetcherResponse
+
+WARM_UP_HTML = "<html><body><h1>Warm-up</h1><p>The quick brown fox jumps over the lazy dog.</p></body></html>"
+CACHED_URL_SCHEMES = ('http:', 'https:') # Local files are cheap to read and belong to one request
+MAX_ENTRY_SHARE = 8 # One remote resource may take at most this fraction (1/n) of the resource cache
+
+# A small pool of contexts per process. Pango and Fontconfig objects are not safe to share between
+# threads, so a context (its font configuration and parsed stylesheets) serves one render at a time;
+# concurrent requests each check out their own, up to HTML_RENDER_CONTEXTS, and wait beyond that.
+_pool = None
+_pool_lock = threading.Lock()
+
+
+class CachingURLFetcher(URLFetcher):
+    """
+    URLFetcher that keeps the bodies of successful remote responses (images, linked stylesheets, fonts)
+    in memory, so reports sharing a logo or a web font download it once per process. Entries follow the
+    response's Cache-Control (no-store, no-cache and max-age) and live at most max_age seconds; least
+    recently used bodies go first beyond max_bytes.
+    """
+
+    def __init__(self, max_bytes, max_age, **kwargs):
+        super().__init__(**kwargs)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.max_entry_bytes = max_bytes // MAX_ENTRY_SHARE
+        self._entries = OrderedDict() # url -> (expires_at, final_url, headers, body, status)
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def fetch(self, url, headers=None):
+        if not url.lower().startswith(CACHED_URL_SCHEMES):
+            return super().fetch(url, headers)
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is not None and entry[0] <= time.monotonic():
+                self._remove(url)
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(url)
+        if entry is None:
+            response = super().fetch(url, headers)
+            try:
+                body = response.read()
+            finally:
+                response.close()
+            response_headers = list(response.headers.items())
+            entry = (time.monotonic() + self._lifetime(response.headers), response.url, response_headers, body, response.status)
+            if 200 <= (response.status or 0) < 300 and entry[0] > time.monotonic():
+                self._store(url, entry)
+        _, final_url, response_headers, body, status = entry
+        return URLFetcherResponse(final_url, body, dict(response_headers), status)
+
+    def _lifetime(self, response_headers):
+        """Seconds the response may be reused: 0 for no-store/no-cache, else max-age capped at max_age."""
+        lifetime = self.max_age
+        for directive in (response_headers.get('Cache-Control') or '').lower().split(','):
+            name, _, value = directive.strip().partition('=')
+            if name in ('no-store', 'no-cache'):
+                return 0
+            if name == 'max-age':
+                try:
+                    lifetime = min(lifetime, max(0, int(value.strip().strip('"'))))
+                except ValueError:
+                    return 0
+        return lifetime
+
+    def _remove(self, url):
+        removed = self._entries.pop(url, None)
+        if removed is not None:
+            self._size -= len(removed[3])
+
+    def _store(self, url, entry):
+        size = len(entry[3])
+        if size > self.max_entry_bytes:
+            return
+        with self._lock:
+            self._remove(url)
+            self._entries[url] = entry
+            self._size += size
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted[3])
+
+
+class HtmlRenderContext:
+    """
+    State WeasyPrint would otherwise rebuild for every document: the Fontconfig font configuration,
+    parsed stylesheets (keyed by URL, or by content hash for uploaded CSS), decoded images and fetched
+    remote resources. Every @font-face of every upload is added to the font configuration, so it is
+    rebuilt, with the stylesheets and images that refer to it, after max_renders documents.
+    """
+
+    def __init__(self, url_fetcher, default_stylesheets, max_stylesheets, max_images, max_renders):
+        self.url_fetcher = url_fetcher
+        self.default_stylesheets = list(default_stylesheets)
+        self.max_stylesheets = max_stylesheets
+        self.max_images = max_images
+        self.max_renders = max_renders
+        self._reset()
+
+    def _reset(self):
+        self.font_config = FontConfiguration()
+        self.image_cache = {} # WeasyPrint's own cache of decoded images, keyed by URL
+        self._stylesheets = OrderedDict()
+        self.renders = 0
+
+    def reset_if_worn(self):
+        """
+        Rebuilds the font configuration after max_renders documents. Called only when the context is
+        checked out, never between the stylesheets of a request and its documents.
+        """
+        if self.renders >= self.max_renders:
+            self._reset()
+
+    def _cached_stylesheet(self, key, build):
+        stylesheet = self._stylesheets.get(key)
+        if stylesheet is None:
+            stylesheet = build()
+            self._stylesheets[key] = stylesheet
+            while len(self._stylesheets) > self.max_stylesheets:
+                self._stylesheets.popitem(last=False)
+        else:
+            self._stylesheets.move_to_end(key)
+        return stylesheet
+
+    def stylesheet_from_source(self, source):
+        """Parsed CSS for a configured stylesheet: a URL, or a local path (re-parsed when the file changes)."""
+        if '://' in source:
+            return self._cached_stylesheet(('url', source), lambda: CSS(url=source, font_config=self.font_config, url_fetcher=self.url_fetcher))
+        key = ('file', os.path.abspath(source), os.path.getmtime(source))
+        return self._cached_stylesheet(key, lambda: CSS(filename=source, font_config=self.font_config, url_fetcher=self.url_fetcher))
+
+    def stylesheet_from_string(self, css_text, base_url=None):
+        """Parsed CSS for uploaded stylesheet text, shared by every upload with the same content."""
+        key = ('sha256', hashlib.sha256(css_text.encode('utf-8')).hexdigest())
+        return self._cached_stylesheet(key, lambda: CSS(string=css_text, base_url=base_url, font_config=self.font_config, url_fetcher=self.url_fetcher))
+
+    def _render_options(self, extra_stylesheets):
+        if len(self.image_cache) > self.max_images:
+            self.image_cache.clear()
+        stylesheets = [self.stylesheet_from_source(source) for source in self.default_stylesheets] + list(extra_stylesheets)
+        return {'font_config': self.font_config, 'stylesheets': stylesheets, 'cache': self.image_cache}
+
+    def render(self, html_path, base_url=None, extra_stylesheets=()):
+        """Lays out one HTML file into a WeasyPrint Document (call within a pool session)."""
+        html_doc = HTML(filename=html_path, base_url=base_url, url_fetcher=self.url_fetcher)
+        document = html_doc.render(**self._render_options(extra_stylesheets))
+        self.renders += 1
+        return document
+
+    def write_pdf(self, html_path, output_filepath, base_url=None, extra_stylesheets=()):
+        """Renders one HTML file straight to output_filepath; returns its page count (call within a pool session)."""
+        document = self.render(html_path, base_url, extra_stylesheets)
+        document.write_pdf(output_filepath)
+        return len(document.pages)
+
+    def warm_up(self):
+        """Renders a small document so fonts are loaded and the configured stylesheets parsed before the first request."""
+        document = HTML(string=WARM_UP_HTML, url_fetcher=self.url_fetcher).render(**self._render_options(()))
+        document.write_pdf()
+
+
+class HtmlRenderPool:
+    """
+    Up to size HtmlRenderContexts, created as concurrent renders need them. session() checks one out
+    for the caller's thread alone and returns it afterwards. The remote resource cache is shared, so a
+    logo is still fetched once per process whichever context renders it.
+    """
+
+    def __init__(self, size, max_resource_bytes, max_resource_age, **context_options):
+        self.size = max(1, size)
+        self.url_fetcher = CachingURLFetcher(max_resource_bytes, max_resource_age)
+        self.context_options = context_options
+        self._idle = [] # Contexts not checked out, most recently returned last
+        self._created = 0
+        self._condition = threading.Condition()
+
+    def _checkout(self):
+        with self._condition:
+            while not self._idle and self._created >= self.size:
+                self._condition.wait()
+            if self._idle:
+                return self._idle.pop()
+            self._created += 1
+        try:
+            return HtmlRenderContext(self.url_fetcher, **self.context_options)
+        except Exception:
+            with self._condition:
+                self._created -= 1
+                self._condition.notify()
+            raise
+
+    def _release(self, context):
+        with self._condition:
+            self._idle.append(context)
+            self._condition.notify()
+
+    @contextmanager
+    def session(self):
+        """A context of its own for a series of stylesheet and render calls, waiting while all are busy."""
+        context = self._checkout()
+        try:
+            context.reset_if_worn()
+            yield context
+        finally:
+            self._release(context)
+
+    def warm_up(self):
+        """Warms one context; fonts Fontconfig has loaded are then cached for the others too."""
+        with self.session() as context:
+            context.warm_up()
+
+
+def get_html_render_pool():
+    """Returns this process's pool of rendering contexts, creating it from the app config on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            config = current_app.config
+            _pool = HtmlRenderPool(
+                size=config['HTML_RENDER_CONTEXTS'],
+                max_resource_bytes=config['HTML_RESOURCE_CACHE_MAX_BYTES'],
+                max_resource_age=config['HTML_RESOURCE_CACHE_TTL_SECONDS'],
+                default_stylesheets=config['HTML_DEFAULT_STYLESHEETS'],
+                max_stylesheets=config['HTML_STYLESHEET_CACHE_MAX_ENTRIES'],
+                max_images=config['HTML_IMAGE_CACHE_MAX_ENTRIES'],
+                max_renders=config['HTML_CONTEXT_MAX_RENDERS']
+            )
+        return _pool
+
+def warm_up_html_renderer():
+    """Creates and warms this process's contexts when HTML_WARM_UP is on. Failures are logged, not raised."""
+    if not current_app.config.get('HTML_WARM_UP'):
+        return
+    try:
+        get_html_render_pool().warm_up()
+    except Exception as e:
+        current_app.logger.warning(f"WeasyPrint warm-up failed: {str(e)}")
+
+def start_html_warm_up(app):
+    """Warms this process's contexts on a background thread, so app start-up is not held up by font loading."""
+    def run():
+        with app.app_context():
+            warm_up_html_renderer()
+    if app.config.get('HTML_WARM_UP'):
+        threading.Thread(target=run, name='html-warm-up', daemon=True).start()
@@ -1,60 +1,114 @@
 # backend/blueprints/pdf_operations/html_to_pdf_handler.py
 import os
+import io
 import uuid
 import shutil
+import zipfile
 from flask import current_app
 from werkzeug.utils import secure_filename
-from weasyprint import HTML, CSS # Using WeasyPrint
-# from weasyprint.fonts import FontConfiguration # If you need custom font configs
 from .utils import check_allowed_file, create_temp_folder, save_uploaded_file
+from .output_store import output_path
+from .metrics import stage_timer, STAGE_OUTPUT_WRITE
+from .html_render_engine import get_html_render_pool
 
 ALLOWED_EXTENSIONS_HTML = {'html', 'htm'}
+ALLOWED_EXTENSIONS_CSS = {'css'}
+BATCH_OUTPUTS = ('zip', 'combined') # One PDF per HTML file in a ZIP, or all of them in one PDF
+
+def _archive_name(filename, used_names):
+    arcname, counter = filename, 1
+    while arcname in used_names:
+        counter += 1
+        arcname = f"{counter}_{filename}"
+    used_names.add(arcname)
+    return arcname
 
 def handle_html_to_pdf(request_files, request_form):
     if 'files' not in request_files:
         return {'success': False, 'error': 'No file part in the request'}, 400
-    
-    file_stream = request_files.getlist('files')[0]
-    if not file_stream or not file_stream.filename:
+
+    # Several HTML files in one request are rendered one after the other against the same warm context;
+    # uploaded .css files are applied to every one of them.
+    html_files, css_files = [], []
+    for file_stream in request_files.getlist('files'):
+        if not file_stream or not file_stream.filename:
+            continue
+        if check_allowed_file(file_stream.filename, ALLOWED_EXTENSIONS_HTML):
+            html_files.append(file_stream)
+        elif check_allowed_file(file_stream.filename, ALLOWED_EXTENSIONS_CSS):
+            css_files.append(file_stream)
+        else:
+            raise ValueError(f"Invalid file type: {file_stream.filename}. Supported: {', '.join(ALLOWED_EXTENSIONS_HTML | ALLOWED_EXTENSIONS_CSS)}")
+    if not html_files:
         raise ValueError('No file selected for HTML to PDF.')
-    
-    original_filename = file_stream.filename
-    if not check_allowed_file(original_filename, ALLOWED_EXTENSIONS_HTML):
-        raise ValueError(f"Invalid file type: {original_filename}. Supported: {', '.join(ALLOWED_EXTENSIONS_HTML)}")
+    max_files = current_app.config['BATCH_MAX_FILES']
+    if len(html_files) > max_files:
+        raise ValueError(f"Too many HTML files for one request ({len(html_files)}). The maximum is {max_files}.")
+    batch_output = request_form.get('batchOutput', 'zip').lower()
+    if batch_output not in BATCH_OUTPUTS:
+        raise ValueError(f"Invalid batch output: {batch_output}. Choose one of {', '.join(BATCH_OUTPUTS)}.")
 
-    original_filename_secure = secure_filename(original_filename)
+    original_filename_secure = secure_filename(html_files[0].filename)
     request_temp_folder = create_temp_folder("html2pdf_temp")
-    
+    output_filepath = None
+
     try:
-        temp_input_filepath = save_uploaded_file(file_stream, request_temp_folder)
-        
-        # WeasyPrint can take a filepath directly
-        # For more complex scenarios with linked CSS/images within the HTML,
-        # you might need to provide a base_url or handle them.
-        # For a single HTML file upload, this should generally work.
-        
-        # Optional: Add a default stylesheet or allow user CSS
-        # default_css = CSS(string='@page { size: A4; margin: 1in; } body { font-family: sans-serif; }')
-        # html = HTML(filename=temp_input_filepath, base_url=request_temp_folder) # base_url can help resolve relative paths in HTML
-        
-        html_doc = HTML(filename=temp_input_filepath)
+        # Each file gets its own folder so uploads sharing a name do not overwrite each other
+        html_paths = []
+        for index, file_stream in enumerate(html_files):
+            file_folder = os.path.join(request_temp_folder, str(index))
+            os.makedirs(file_folder)
+            html_paths.append(save_uploaded_file(file_stream, file_folder))
+        css_texts = []
+        for file_stream in css_files:
+            file_stream.stream.seek(0)
+            css_texts.append(file_stream.stream.read().decode('utf-8', errors='replace'))
 
-        output_filename_base = os.path.splitext(original_filename_secure)[0]
-        output_pdf_filename = f"{output_filename_base}_{uuid.uuid4().hex[:6]}.pdf"
-        output_pdf_filepath = os.path.join(current_app.config['CONVERTED_FILES_FOLDER'], output_pdf_filename)
-        
-        # html_doc.write_pdf(output_pdf_filepath, stylesheets=[default_css])
-        html_doc.write_pdf(output_pdf_filepath)
+        with get_html_render_pool().session() as context:
+            stylesheets = [context.stylesheet_from_string(css_text) for css_text in css_texts]
 
+            if len(html_paths) == 1:
+                output_filename_base = os.path.splitext(original_filename_secure)[0]
+                output_filename = f"{output_filename_base}_{uuid.uuid4().hex[:6]}.pdf"
+                output_filepath = output_path(output_filename)
+                with stage_timer(STAGE_OUTPUT_WRITE):
+                    page_count = context.write_pdf(html_paths[0], output_filepath, extra_stylesheets=stylesheets)
+            elif batch_output == 'combined':
+                # One PDF: fonts are embedded and subset once for all documents
+                documents = [context.render(html_path, extra_stylesheets=stylesheets) for html_path in html_paths]
+                all_pages = [page for document in documents for page in document.pages]
+                output_filename = f"html_combined_{uuid.uuid4().hex[:8]}.pdf"
+                output_filepath = output_path(output_filename)
+                with stage_timer(STAGE_OUTPUT_WRITE):
+                    documents[0].copy(all_pages).write_pdf(output_filepath)
+                page_count = len(all_pages)
+            else:
+                output_filename = f"html_converted_{uuid.uuid4().hex[:8]}.zip"
+                output_filepath = output_path(output_filename)
+                page_count, used_names = 0, set()
+                with zipfile.ZipFile(output_filepath, 'w', zipfile.ZIP_DEFLATED) as zipf:
+                    for html_path in html_paths:
+                        document = context.render(html_path, extra_stylesheets=stylesheets)
+                        with stage_timer(STAGE_OUTPUT_WRITE):
+                            buffer = io.BytesIO()
+                            document.write_pdf(buffer)
+                            arcname = _archive_name(f"{os.path.splitext(os.path.basename(html_path))[0]}.pdf", used_names)
+                            zipf.writestr(arcname, buffer.getvalue())
+                        page_count += len(document.pages)
 
         response_data = {
-            'success': True, 
-            'message': f"Successfully converted '{original_filename_secure}' to PDF.",
-            'download_url': f'/api/download/{output_pdf_filename}', 
-            'filename': output_pdf_filename
+            'success': True,
+            'message': f"Successfully converted '{original_filename_secure}' to PDF." if len(html_paths) == 1
+                       else f"Successfully converted {len(html_paths)} HTML files to PDF.",
+            'download_url': f'/api/download/{output_filename}',
+            'filename': output_filename,
+            'documentCount': len(html_paths),
+            'pageCount': page_count
         }
         return response_data, 200
     except Exception as e:
+        if output_filepath and os.path.exists(output_filepath):
+            os.remove(output_filepath)
         # WeasyPrint can raise various errors
         current_app.logger.error(f"WeasyPrint conversion error for {original_filename_secure}: {str(e)}")
         raise Exception(f"HTML to PDF conversion failed. Error: {str(e)}") from e
@@ -63,4 +117,4 @@ def handle_html_to_pdf(request_files, request_form):
             try:
                 shutil.rmtree(request_temp_folder)
             except OSError as e_clean:
-                current_app.logger.error(f"Error cleaning temp folder {request_temp_folder} for html_to_pdf: {e_clean}")
\ No newline at end of file
+                current_app.logger.error(f"Error cleaning temp folder {request_temp_folder} for html_to_pdf: {e_clean}")
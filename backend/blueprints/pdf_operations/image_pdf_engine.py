@@ -0,0 +1,132 @@
+# backend/blueprints/pdf_operations/image_pdf_engine.py
+import zlib
+from PIL import Image
+from pypdf.generic import ArrayObject, DictionaryObject, FloatObject, NameObject, NumberObject
+from .pdf_stream_writer import StreamingPdfWriter
+from .cpu_pool import run_sharded
+from .utils import PAGE_SIZES
+
+IMAGE_PARALLEL_MIN_IMAGES = 2 # Images that need decoding before the CPU pool is used
+FLATE_LEVEL = 6
+
+# JPEG colour modes a PDF viewer can decode as they are stored (DCTDecode)
+JPEG_PASSTHROUGH_COLORSPACES = {'L': '/DeviceGray', 'RGB': '/DeviceRGB', 'CMYK': '/DeviceCMYK'}
+
+
+def sniff_image(stream):
+    """
+    Reads only the image header: (format, mode, (width, height), info). Nothing is decoded.
+    Raises for data PIL cannot identify.
+    """
+    stream.seek(0)
+    with Image.open(stream) as img:
+        return img.format, img.mode, img.size, dict(img.info)
+
+def is_jpeg_passthrough(image_format, mode):
+    return image_format == 'JPEG' and mode in JPEG_PASSTHROUGH_COLORSPACES
+
+def decode_image(path):
+    """
+    Decodes a non-JPEG image into what a PDF image XObject needs: Flate-compressed samples, with
+    transparency kept as a soft mask instead of being flattened. Only the first frame of animated or
+    multi-page files is used. Returns None when the file cannot be decoded. Runs in pool workers.
+    """
+    try:
+        with Image.open(path) as img:
+            alpha = None
+            if img.mode in ('RGBA', 'LA', 'PA') or 'transparency' in img.info:
+                img = img.convert('LA' if img.mode in ('L', 'LA') else 'RGBA')
+                alpha = img.getchannel('A')
+                img = img.convert('L' if img.mode == 'LA' else 'RGB')
+            elif img.mode not in ('1', 'L', 'RGB', 'CMYK'):
+                img = img.convert('RGB') # Palette, 16-bit and YCbCr/LAB data
+            colorspace = {'1': '/DeviceGray', 'L': '/DeviceGray', 'RGB': '/DeviceRGB', 'CMYK': '/DeviceCMYK'}[img.mode]
+            return {
+                'width': img.width,
+                'height': img.height,
+                'colorspace': colorspace,
+                'bits': 1 if img.mode == '1' else 8, # Bilevel scans stay one bit per pixel
+                'data': zlib.compress(img.tobytes(), FLATE_LEVEL),
+                'alpha': zlib.compress(alpha.tobytes(), FLATE_LEVEL) if alpha is not None else None,
+            }
+    except Exception:
+        return None
+
+def page_placement(img_w, img_h, page_size_key, page_orientation):
+    """
+    (page_width, page_height, cm) for one image. The image keeps its pixels; the cm matrix scales (and,
+    for AUTO pages that must change orientation, turns) it onto the page. Fixed page sizes fit and centre
+    the image like before; AUTO pages are as large as the image at 72 DPI.
+    """
+    if page_size_key == 'AUTO':
+        is_landscape = img_w > img_h
+        if (page_orientation == 'landscape') != is_landscape:
+            # Turned 90 degrees counter-clockwise, as PIL's rotate(90, expand=True) did
+            return img_h, img_w, (0, img_w, -img_h, 0, img_h, 0)
+        return img_w, img_h, (img_w, 0, 0, img_h, 0, 0)
+
+    page_width_pt, page_height_pt = PAGE_SIZES.get(page_size_key, PAGE_SIZES['A4'])
+    if page_orientation == 'landscape':
+        page_width_pt, page_height_pt = page_height_pt, page_width_pt
+    scale = min(page_width_pt / img_w, page_height_pt / img_h)
+    new_w, new_h = img_w * scale, img_h * scale
+    return page_width_pt, page_height_pt, (new_w, 0, 0, new_h, (page_width_pt - new_w) / 2, (page_height_pt - new_h) / 2)
+
+def _image_entries(width, height, colorspace, bits):
+    return {
+        '/Type': NameObject('/XObject'),
+        '/Subtype': NameObject('/Image'),
+        '/Width': NumberObject(width),
+        '/Height': NumberObject(height),
+        '/ColorSpace': NameObject(colorspace),
+        '/BitsPerComponent': NumberObject(bits),
+    }
+
+def _add_image_page(writer, image_id, img_w, img_h, page_size_key, page_orientation):
+    page_width, page_height, matrix = page_placement(img_w, img_h, page_size_key, page_orientation)
+    content = f"q {' '.join(f'{value:.4f}' for value in matrix)} cm /Im0 Do Q".encode('ascii')
+    content_id = writer.write_stream({}, content)
+    writer.add_page({
+        '/MediaBox': ArrayObject([NumberObject(0), NumberObject(0), FloatObject(page_width), FloatObject(page_height)]),
+        '/Resources': DictionaryObject({NameObject('/XObject'): DictionaryObject({NameObject('/Im0'): writer.reference(image_id)})}),
+        '/Contents': writer.reference(content_id),
+    })
+
+def write_images_pdf(output_file, items, page_size_key, page_orientation, on_skipped=None):
+    """
+    Writes one page per item to output_file, in order, holding at most one image in memory (plus the
+    decodes in flight on the CPU pool). items are ('jpeg', stream, (mode, (width, height), info)) for
+    JPEGs, whose bytes are copied into the PDF unchanged, or ('decode', path, filename) for everything
+    else. on_skipped(filename) is called for images that could not be decoded. Returns the page count.
+    """
+    decode_paths = [(item[1],) for item in items if item[0] == 'decode']
+    decoded = run_sharded(decode_image, decode_paths, parallel=len(decode_paths) >= IMAGE_PARALLEL_MIN_IMAGES)
+    writer = StreamingPdfWriter(output_file)
+    for kind, source, details in items:
+        if kind == 'jpeg':
+            mode, (img_w, img_h), info = details
+            entries = _image_entries(img_w, img_h, JPEG_PASSTHROUGH_COLORSPACES[mode], 8)
+            entries['/Filter'] = NameObject('/DCTDecode')
+            if mode == 'CMYK' and 'adobe' in info: # Photoshop stores CMYK JPEGs inverted
+                entries['/Decode'] = ArrayObject([NumberObject(v) for v in (1, 0, 1, 0, 1, 0, 1, 0)])
+            source.seek(0, 2)
+            length = source.tell()
+            source.seek(0)
+            image_id = writer.write_stream(entries, source=source, length=length)
+        else:
+            image = next(decoded)
+            if image is None:
+                if on_skipped is not None:
+                    on_skipped(details)
+                continue
+            img_w, img_h = image['width'], image['height']
+            entries = _image_entries(img_w, img_h, image['colorspace'], image['bits'])
+            entries['/Filter'] = NameObject('/FlateDecode')
+            if image['alpha'] is not None:
+                mask_entries = _image_entries(img_w, img_h, '/DeviceGray', 8)
+                mask_entries['/Filter'] = NameObject('/FlateDecode')
+                entries['/SMask'] = writer.reference(writer.write_stream(mask_entries, image['alpha']))
+            image_id = writer.write_stream(entries, image['data'])
+        _add_image_page(writer, image_id, img_w, img_h, page_size_key, page_orientation)
+    writer.finish()
+    return len(writer.page_ids)
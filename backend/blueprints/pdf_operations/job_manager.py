@@ -0,0 +1,291 @@
+# backend/blueprints/pdf_operations/job_manager.py
+import os
+import re
+import json
+import time
+import uuid
+import shutil
+import threading
+import contextvars
+import multiprocessing
+from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from flask import Flask, current_app
+from werkzeug.datastructures import FileStorage, MultiDict
+from werkzeug.utils import secure_filename
+from .dispatch import dispatch_operation
+from .utils import create_temp_folder
+from .upload_ingest import verify_upload
+from .html_render_engine import warm_up_html_renderer
+
+JOB_STATUS_QUEUED = 'queued'
+JOB_STATUS_RUNNING = 'running'
+JOB_STATUS_DONE = 'done'
+JOB_STATUS_FAILED = 'failed'
+
+JOB_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+PROGRESS_WRITE_INTERVAL = 1.0 # Seconds between progress updates written to a job's state file
+JOB_SWEEP_INTERVAL = 60 # Seconds between sweeps of expired job state files, per process
+
+# Pool state lives per Flask process. Job state is kept on disk (JOBS_FOLDER) so that
+# any Flask worker process can answer status/result polls, not only the one that accepted the job.
+_executor = None
+_executor_lock = threading.Lock()
+_pending_jobs = 0
+_pending_lock = threading.Lock()
+_last_job_sweep = 0
+
+# Set inside each pool process by _init_worker
+_worker_app = None
+
+# (jobs_folder, job_id, last_write) of the job running in this context, for report_progress
+_current_job = contextvars.ContextVar('current_job', default=None)
+
+
+def _init_worker(config):
+    """Pool initializer: gives the worker process a minimal app so handlers can use current_app."""
+    global _worker_app
+    _worker_app = Flask('pdf_job_worker')
+    _worker_app.config.update(config)
+    # The job pool already keeps JOB_POOL_WORKERS cores busy with whole requests; a CPU pool in each
+    # of them would start up to JOB_POOL_WORKERS * CPU_POOL_WORKERS processes. Page work runs inline here.
+    _worker_app.config['CPU_POOL_WORKERS'] = 1
+    # Likewise a worker converts one document at a time, so one warm soffice instance is all it can use
+    _worker_app.config['SOFFICE_POOL_SIZE'] = 1
+    with _worker_app.app_context():
+        warm_up_html_renderer() # Jobs, including /process_batch files, start on a warm WeasyPrint context
+
+def _is_plain_value(value):
+    if isinstance(value, (list, tuple)):
+        return all(_is_plain_value(item) for item in value)
+    return isinstance(value, (str, int, float, bool, type(None)))
+
+def _picklable_config(app):
+    return {key: value for key, value in app.config.items() if _is_plain_value(value)}
+
+def _get_executor(reset=False):
+    global _executor
+    with _executor_lock:
+        if reset and _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=False)
+            _executor = None
+        if _executor is None:
+            app = current_app._get_current_object()
+            # 'spawn' keeps the workers independent of the Flask process's threads and open sockets
+            _executor = ProcessPoolExecutor(
+                max_workers=app.config['JOB_POOL_WORKERS'],
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(_picklable_config(app),)
+            )
+        return _executor
+
+def _job_state_path(jobs_folder, job_id):
+    return os.path.join(jobs_folder, f"{job_id}.json")
+
+def _read_job_state(jobs_folder, job_id):
+    try:
+        with open(_job_state_path(jobs_folder, job_id), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+def _write_job_state(jobs_folder, job_id, **fields):
+    state = _read_job_state(jobs_folder, job_id) or {'job_id': job_id}
+    state.update(fields)
+    state_path = _job_state_path(jobs_folder, job_id)
+    tmp_path = f"{state_path}.{uuid.uuid4().hex[:6]}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, state_path) # Atomic, so pollers never see a half-written file
+    return state
+
+def sweep_job_states(jobs_folder, ttl_seconds):
+    """
+    Deletes job state files (and leftover temporary ones) not written for ttl_seconds. Every state
+    change rewrites the file, so this is the time since the job finished, or since a job that never
+    finished last reported anything. Runs at most every JOB_SWEEP_INTERVAL per process.
+    """
+    global _last_job_sweep
+    now = time.time()
+    if now - _last_job_sweep < JOB_SWEEP_INTERVAL:
+        return 0
+    _last_job_sweep = now
+    removed = 0
+    for entry in os.scandir(jobs_folder):
+        job_id = entry.name.split('.', 1)[0]
+        if not entry.is_file() or not JOB_ID_PATTERN.match(job_id) or not entry.name.endswith(('.json', '.tmp')):
+            continue # The SQLite indexes and the search index share the folder
+        try:
+            if entry.stat().st_mtime < now - ttl_seconds:
+                os.remove(entry.path)
+                removed += 1
+        except FileNotFoundError:
+            pass # Removed by another process's sweep
+    return removed
+
+def report_progress(stage, done, total):
+    """
+    Records how far the running async job has got (e.g. stage 'parse', 12 of 400 pages) in its state
+    file, at most once per PROGRESS_WRITE_INTERVAL and always when a stage completes. No-op outside a job.
+    """
+    current = _current_job.get()
+    if current is None:
+        return
+    now = time.monotonic()
+    if done < total and now - current[2] < PROGRESS_WRITE_INTERVAL:
+        return
+    current[2] = now
+    _write_job_state(current[0], current[1], progress={'stage': stage, 'done': done, 'total': total})
+
+def snapshot_upload(index, field_name, file_stream, input_folder):
+    """Copies one uploaded file to disk and returns its (field, filename, path, content_type) spec."""
+    if not file_stream or not file_stream.filename:
+        # Keep empty parts so handlers report the same validation errors as in sync mode
+        return (field_name, '', None, None)
+    verify_upload(file_stream) # Bodies rejected while streaming were never kept, so fail now
+    saved_path = os.path.join(input_folder, f"{index}_{secure_filename(file_stream.filename) or 'upload'}")
+    file_stream.seek(0)
+    file_stream.save(saved_path)
+    return (field_name, file_stream.filename, saved_path, file_stream.content_type)
+
+def _snapshot_uploads(request_files, input_folder):
+    """Copies every uploaded file to disk so the job can outlive the HTTP request."""
+    return [snapshot_upload(i, field_name, file_stream, input_folder)
+            for i, (field_name, file_stream) in enumerate(request_files.items(multi=True))]
+
+def _open_file_specs(file_specs):
+    request_files = MultiDict()
+    for field_name, filename, path, content_type in file_specs:
+        stream = open(path, 'rb') if path else BytesIO()
+        request_files.add(field_name, FileStorage(stream=stream, filename=filename, name=field_name, content_type=content_type))
+    return request_files
+
+def _dispatch_file_specs(operation, handler, file_specs, form_items):
+    """Executed inside a pool process (within its app context): runs one operation on saved inputs."""
+    request_files = _open_file_specs(file_specs)
+    try:
+        return dispatch_operation(operation, handler, request_files, MultiDict(form_items))
+    finally:
+        for _, file_storage in request_files.items(multi=True):
+            file_storage.close()
+
+def _run_operation(operation, handler, file_specs, form_items):
+    """Executed inside a pool process."""
+    with _worker_app.app_context():
+        return _dispatch_file_specs(operation, handler, file_specs, form_items)
+
+def _run_job(jobs_folder, job_id, operation, handler, file_specs, form_items, input_folder):
+    """Executed inside a pool process."""
+    with _worker_app.app_context():
+        _write_job_state(jobs_folder, job_id, status=JOB_STATUS_RUNNING, started_at=time.time())
+        token = _current_job.set([jobs_folder, job_id, 0.0])
+        try:
+            response_data, status_code = _dispatch_file_specs(operation, handler, file_specs, form_items)
+        finally:
+            _current_job.reset(token)
+            shutil.rmtree(input_folder, ignore_errors=True)
+
+        _write_job_state(
+            jobs_folder, job_id,
+            status=JOB_STATUS_DONE if status_code < 400 else JOB_STATUS_FAILED,
+            finished_at=time.time(),
+            status_code=status_code,
+            result=response_data
+        )
+        return status_code
+
+def _on_job_finished(future, jobs_folder, job_id, input_folder):
+    global _pending_jobs
+    with _pending_lock:
+        _pending_jobs -= 1
+    error = future.exception()
+    if error is not None:
+        # The worker died or the pool broke before the job could record its own outcome
+        shutil.rmtree(input_folder, ignore_errors=True)
+        _write_job_state(
+            jobs_folder, job_id,
+            status=JOB_STATUS_FAILED,
+            finished_at=time.time(),
+            status_code=500,
+            result={'success': False, 'error': f'The conversion worker failed: {str(error) or type(error).__name__}'}
+        )
+
+def _submit(fn, *args):
+    try:
+        return _get_executor().submit(fn, *args)
+    except BrokenProcessPool:
+        current_app.logger.warning("Job pool was broken (a worker died). Recreating it.")
+        return _get_executor(reset=True).submit(fn, *args)
+
+def submit_operation(operation, handler, file_specs, form_items):
+    """
+    Runs an operation on inputs saved with snapshot_upload in the job pool, without any job state.
+    Returns a Future of (response_data, status_code). Used by batch requests.
+    """
+    return _submit(_run_operation, operation, handler, file_specs, form_items)
+
+def submit_job(operation, handler, request_files, request_form):
+    """Queues an operation on the process pool. Returns (response_data, status_code) like a handler."""
+    global _pending_jobs
+    with _pending_lock:
+        if _pending_jobs >= current_app.config['JOB_MAX_PENDING']:
+            return {'success': False, 'error': 'The server is busy. Please try again shortly.'}, 503
+        _pending_jobs += 1
+
+    jobs_folder = current_app.config['JOBS_FOLDER']
+    sweep_job_states(jobs_folder, current_app.config['JOB_TTL_SECONDS'])
+    job_id = uuid.uuid4().hex
+    input_folder = create_temp_folder("job_input")
+    try:
+        file_specs = _snapshot_uploads(request_files, input_folder)
+        _write_job_state(jobs_folder, job_id, status=JOB_STATUS_QUEUED, operation=operation, created_at=time.time())
+
+        future = _submit(_run_job, jobs_folder, job_id, operation, handler, file_specs,
+                         list(request_form.items(multi=True)), input_folder)
+    except Exception as e:
+        with _pending_lock:
+            _pending_jobs -= 1
+        shutil.rmtree(input_folder, ignore_errors=True)
+        if isinstance(e, ValueError):
+            return {'success': False, 'error': str(e)}, 400
+        raise
+
+    future.add_done_callback(lambda f: _on_job_finished(f, jobs_folder, job_id, input_folder))
+
+    response_data = {
+        'success': True,
+        'message': f"{operation.replace('_', ' ').title()} job queued.",
+        'job_id': job_id,
+        'status': JOB_STATUS_QUEUED,
+        'status_url': f'/api/jobs/{job_id}',
+        'result_url': f'/api/jobs/{job_id}/result'
+    }
+    return response_data, 202
+
+def get_job(job_id):
+    """Returns the stored job state, or None for unknown/malformed ids."""
+    if not JOB_ID_PATTERN.match(job_id or ''):
+        return None
+    return _read_job_state(current_app.config['JOBS_FOLDER'], job_id)
+
+def job_status_response(job):
+    response_data = {
+        'success': True,
+        'job_id': job['job_id'],
+        'status': job.get('status'),
+        'operation': job.get('operation'),
+        'created_at': job.get('created_at'),
+        'started_at': job.get('started_at'),
+        'finished_at': job.get('finished_at')
+    }
+    if job.get('progress') and job.get('status') == JOB_STATUS_RUNNING:
+        response_data['progress'] = job['progress']
+    result = job.get('result') or {}
+    if job.get('status') == JOB_STATUS_DONE:
+        response_data['download_url'] = result.get('download_url')
+        response_data['filename'] = result.get('filename')
+    elif job.get('status') == JOB_STATUS_FAILED:
+        response_data['error'] = result.get('error')
+    return response_data
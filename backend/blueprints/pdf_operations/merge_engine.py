@@ -0,0 +1,277 @@
+# backend/blueprints/pdf_operations/merge_engine.py
+import hashlib
+from io import BytesIO
+from pypdf.generic import (
+    ArrayObject, DictionaryObject, IndirectObject, NameObject, NumberObject, StreamObject, TextStringObject
+)
+from .pdf_stream_writer import StreamingPdfWriter
+
+# Keys never followed while copying: the page tree is rebuilt, and stream lengths are rewritten
+PAGE_SKIPPED_KEYS = {'/Parent'}
+STREAM_SKIPPED_KEYS = {'/Length'}
+# Document-wide form settings, kept from the first input that has them
+ACROFORM_KEYS = ('/DA', '/Q', '/NeedAppearances', '/SigFlags')
+
+
+class StreamingMerger(StreamingPdfWriter):
+    """
+    Writes a merged PDF to output_file one input at a time. Every object reachable from an input's
+    pages (and its outline) is written out as soon as the objects it refers to have been, so only
+    the input being added is held in memory. An object whose serialized form, with references
+    renumbered, matches one already written (the same font program or logo in every statement) is
+    not written again: later references point at the first copy.
+    """
+
+    def __init__(self, output_file):
+        super().__init__(output_file)
+        self.written = {} # SHA-256 of a serialized object -> its object number
+        self.outline_items = [] # (item_id, title, first_id, last_id, count), one per input with bookmarks
+        self.form_fields = [] # Output references of every input's top-level form fields
+        self.form_entries = {} # /DA, /NeedAppearances, ... of the merged /AcroForm
+        self.form_resources = {} # /DR category (/Font, ...) -> {resource name: value}
+        self.named_dests = {} # Name (bytes) -> (key object, remapped destination), first input wins
+        self.legacy_dests = {} # Catalog /Dests: name -> remapped destination
+        self.objects_deduplicated = 0
+        self.bytes_deduplicated = 0
+
+    def _references(self, value, skipped_keys=()):
+        """Indirect references inside value, looking through direct dictionaries and arrays."""
+        if isinstance(value, IndirectObject):
+            yield value
+        elif isinstance(value, DictionaryObject):
+            for key, item in value.items():
+                if key not in skipped_keys:
+                    yield from self._references(item)
+        elif isinstance(value, ArrayObject):
+            for item in value:
+                yield from self._references(item)
+
+    def _skipped_keys(self, obj):
+        if isinstance(obj, StreamObject):
+            return STREAM_SKIPPED_KEYS
+        if isinstance(obj, DictionaryObject) and obj.get('/Type') == '/Page':
+            return PAGE_SKIPPED_KEYS
+        return ()
+
+    def _remap(self, value, memo):
+        if isinstance(value, IndirectObject):
+            return IndirectObject(memo[value.idnum], 0, None)
+        if isinstance(value, DictionaryObject):
+            remapped = DictionaryObject()
+            for key, item in value.items():
+                remapped[key] = self._remap(item, memo)
+            return remapped
+        if isinstance(value, ArrayObject):
+            return ArrayObject(self._remap(item, memo) for item in value)
+        return value
+
+    def _serialize(self, obj, memo):
+        skipped_keys = self._skipped_keys(obj)
+        if isinstance(obj, DictionaryObject):
+            remapped = DictionaryObject()
+            for key, item in obj.items():
+                if key not in skipped_keys:
+                    remapped[key] = self._remap(item, memo)
+        else:
+            remapped = self._remap(obj, memo)
+        if skipped_keys is PAGE_SKIPPED_KEYS:
+            remapped[NameObject('/Parent')] = IndirectObject(self.pages_root_id, 0, None)
+        buffer = BytesIO()
+        if isinstance(obj, StreamObject):
+            data = obj._data # As stored in the input, filters and all
+            remapped[NameObject('/Length')] = NumberObject(len(data))
+            remapped.write_to_stream(buffer)
+            buffer.write(b"\nstream\n")
+            buffer.write(data)
+            buffer.write(b"\nendstream")
+        else:
+            remapped.write_to_stream(buffer)
+        return buffer.getvalue()
+
+    def _copy(self, root_idnum, root_obj, memo, preallocated):
+        """
+        Writes root_obj and everything it refers to, children first (an explicit stack, so long
+        outline chains do not hit the recursion limit). memo maps input object numbers to output
+        ones. A reference back to an object still being copied (a cycle) gets its output number
+        reserved up front; such objects, like pages, are written under that number and never shared.
+        """
+        in_progress = {root_idnum}
+        stack = [(root_idnum, root_obj, self._references(root_obj, self._skipped_keys(root_obj)))]
+        while stack:
+            idnum, obj, references = stack[-1]
+            for reference in references:
+                child_idnum = reference.idnum
+                if child_idnum in memo:
+                    continue
+                if child_idnum in in_progress:
+                    memo[child_idnum] = self.allocate()
+                    preallocated.add(child_idnum)
+                    continue
+                child = reference.get_object()
+                if isinstance(child, DictionaryObject) and child.get('/Type') in ('/Pages', '/Catalog'):
+                    # Only the rebuilt page tree and catalog exist in the output
+                    memo[child_idnum] = self.pages_root_id if child.get('/Type') == '/Pages' else self.catalog_id
+                    continue
+                in_progress.add(child_idnum)
+                stack.append((child_idnum, child, self._references(child, self._skipped_keys(child))))
+                break
+            else:
+                stack.pop()
+                in_progress.discard(idnum)
+                body = self._serialize(obj, memo)
+                if idnum in preallocated:
+                    self.write_object(memo[idnum], body)
+                    continue
+                digest = hashlib.sha256(body).digest()
+                existing_id = self.written.get(digest)
+                if existing_id is not None:
+                    memo[idnum] = existing_id
+                    self.objects_deduplicated += 1
+                    self.bytes_deduplicated += len(body)
+                else:
+                    memo[idnum] = self.allocate()
+                    self.written[digest] = memo[idnum]
+                    self.write_object(memo[idnum], body)
+
+    def _copy_value(self, value, memo, preallocated):
+        """value with every object it refers to copied, and its references renumbered."""
+        for reference in self._references(value):
+            if reference.idnum not in memo:
+                self._copy(reference.idnum, reference.get_object(), memo, preallocated)
+        return self._remap(value, memo)
+
+    def _name_tree_items(self, node, seen):
+        """(key, raw value) pairs of a name tree, leaves and intermediate /Kids alike."""
+        if id(node) in seen: # Guards against /Kids cycles in broken inputs
+            return
+        seen.add(id(node))
+        if '/Names' in node:
+            names = node['/Names']
+            for index in range(0, len(names) - 1, 2):
+                yield names[index], names[index + 1]
+        for kid in (node['/Kids'] if '/Kids' in node else ()):
+            yield from self._name_tree_items(kid.get_object(), seen)
+
+    def _add_form(self, catalog, memo, preallocated):
+        acroform = catalog['/AcroForm'] if '/AcroForm' in catalog else None
+        if not isinstance(acroform, DictionaryObject):
+            return
+        for field in (acroform['/Fields'] if '/Fields' in acroform else ()): # Widgets came along with the pages, so mostly memo hits
+            if isinstance(field, IndirectObject):
+                self.form_fields.append(self._copy_value(field, memo, preallocated))
+        for key in ACROFORM_KEYS:
+            if key in acroform and key not in self.form_entries:
+                self.form_entries[key] = self._copy_value(acroform.raw_get(key), memo, preallocated)
+        resources = acroform['/DR'] if '/DR' in acroform else None
+        if isinstance(resources, DictionaryObject):
+            # Merged per resource, so fields of every input find the fonts their /DA names
+            for category, entries in resources.items():
+                entries = entries.get_object()
+                if not isinstance(entries, DictionaryObject):
+                    continue
+                merged = self.form_resources.setdefault(category, {})
+                for name in entries:
+                    if name not in merged:
+                        merged[name] = self._copy_value(entries.raw_get(name), memo, preallocated)
+
+    def _add_named_destinations(self, catalog, memo, preallocated):
+        names = catalog['/Names'] if '/Names' in catalog else None
+        dests = names['/Dests'] if isinstance(names, DictionaryObject) and '/Dests' in names else None
+        if isinstance(dests, DictionaryObject):
+            for key, destination in self._name_tree_items(dests, set()):
+                name = key.get_original_bytes() if hasattr(key, 'get_original_bytes') else bytes(key)
+                if name not in self.named_dests:
+                    self.named_dests[name] = (key, self._copy_value(destination, memo, preallocated))
+        legacy = catalog['/Dests'] if '/Dests' in catalog else None # PDF 1.1 style: a plain dictionary of names
+        if isinstance(legacy, DictionaryObject):
+            for name in legacy:
+                if name not in self.legacy_dests:
+                    self.legacy_dests[name] = self._copy_value(legacy.raw_get(name), memo, preallocated)
+
+    def add_document(self, reader, title):
+        """
+        Appends every page of reader, its bookmarks grouped under title, its form fields and its named
+        destinations. The reader is not kept.
+        """
+        memo, preallocated = {}, set()
+        pages = list(reader.pages)
+        for page in pages: # Numbered first so links and annotations can refer to any page of the input
+            memo[page.indirect_reference.idnum] = self.allocate()
+            preallocated.add(page.indirect_reference.idnum)
+        for page in pages:
+            self._copy(page.indirect_reference.idnum, page, memo, preallocated)
+            self.page_ids.append(memo[page.indirect_reference.idnum])
+
+        catalog = reader.trailer['/Root'].get_object()
+        outlines_reference = catalog.raw_get('/Outlines') if '/Outlines' in catalog else None
+        if isinstance(outlines_reference, IndirectObject):
+            outlines = outlines_reference.get_object()
+            first = outlines.raw_get('/First') if '/First' in outlines else None
+            last = outlines.raw_get('/Last') if '/Last' in outlines else None
+            if isinstance(first, IndirectObject) and isinstance(last, IndirectObject):
+                # The input's outline root becomes a bookmark of its own; its items keep pointing at it as /Parent
+                item_id = self.allocate()
+                memo[outlines_reference.idnum] = item_id
+                preallocated.add(outlines_reference.idnum)
+                for reference in (first, last):
+                    if reference.idnum not in memo:
+                        self._copy(reference.idnum, reference.get_object(), memo, preallocated)
+                self.outline_items.append((item_id, title, memo[first.idnum], memo[last.idnum], int(outlines.get('/Count', 0))))
+
+        self._add_form(catalog, memo, preallocated)
+        self._add_named_destinations(catalog, memo, preallocated)
+        return len(pages)
+
+    def catalog_entries(self):
+        """
+        Writes the bookmarks (one item per input that had an outline, its own items nested below), the
+        merged /AcroForm and the named destinations.
+        """
+        entries = {}
+        if self.outline_items:
+            entries['/Outlines'] = self._write_outlines()
+        if self.form_fields:
+            form_id = self.allocate()
+            form = dict(self.form_entries, **{'/Fields': ArrayObject(self.form_fields)})
+            if self.form_resources:
+                form['/DR'] = DictionaryObject({
+                    category: DictionaryObject(resources) for category, resources in self.form_resources.items()
+                })
+            self.write_dictionary(form_id, form)
+            entries['/AcroForm'] = self.reference(form_id)
+        if self.named_dests:
+            # A single leaf holding every name, sorted by bytes as name trees require
+            leaf = ArrayObject()
+            for name in sorted(self.named_dests):
+                leaf.extend(self.named_dests[name])
+            dests_id = self.allocate()
+            self.write_dictionary(dests_id, {'/Names': leaf})
+            entries['/Names'] = DictionaryObject({NameObject('/Dests'): self.reference(dests_id)})
+        if self.legacy_dests:
+            dests_id = self.allocate()
+            self.write_dictionary(dests_id, self.legacy_dests)
+            entries['/Dests'] = self.reference(dests_id)
+        return entries
+
+    def _write_outlines(self):
+        outlines_id = self.allocate()
+        for index, (item_id, title, first_id, last_id, count) in enumerate(self.outline_items):
+            item = {
+                '/Title': TextStringObject(title),
+                '/Parent': self.reference(outlines_id),
+                '/First': self.reference(first_id),
+                '/Last': self.reference(last_id),
+                '/Count': NumberObject(-abs(count) if count else 0), # Collapsed
+            }
+            if index > 0:
+                item['/Prev'] = self.reference(self.outline_items[index - 1][0])
+            if index < len(self.outline_items) - 1:
+                item['/Next'] = self.reference(self.outline_items[index + 1][0])
+            self.write_dictionary(item_id, item)
+        self.write_dictionary(outlines_id, {
+            '/Type': NameObject('/Outlines'),
+            '/First': self.reference(self.outline_items[0][0]),
+            '/Last': self.reference(self.outline_items[-1][0]),
+            '/Count': NumberObject(len(self.outline_items)),
+        })
+        return self.reference(outlines_id)
@@ -1,11 +1,12 @@
 # backend/blueprints/pdf_operations/merge_handler.py
 import os
 import uuid
-import shutil
 from flask import current_app
-from werkzeug.utils import secure_filename
-from pypdf import PdfWriter
-from .utils import check_allowed_file, create_temp_folder # Assuming create_temp_folder is in utils
+from .utils import check_allowed_file, format_file_size_py, open_uploaded_file, load_pdf
+from .output_store import output_path
+from .metrics import stage_timer, STAGE_OUTPUT_WRITE
+from .upload_ingest import get_upload_size
+from .merge_engine import StreamingMerger
 
 ALLOWED_EXTENSIONS_PDF = {'pdf'}
 
@@ -17,44 +18,51 @@ def handle_merge(request_files, request_form):
     if not files or len(files) < 2:
         return {'success': False, 'error': 'Please select at least two PDF files to merge'}, 400
 
-    merger = PdfWriter()
-    uploaded_file_paths_in_temp = [] # Store paths of files saved in temp_dir
-    request_temp_folder = create_temp_folder("merge_temp")
+    output_filename = f"merged_{uuid.uuid4().hex[:8]}.pdf"
+    output_filepath = output_path(output_filename)
+    total_input_bytes, peak_input_bytes, total_pages = 0, 0, 0
 
     try:
-        for i, file_stream in enumerate(files):
-            if file_stream and check_allowed_file(file_stream.filename, ALLOWED_EXTENSIONS_PDF):
-                original_filename = file_stream.filename
-                # Save files into the request_temp_folder
-                safe_filename = f"{i}_{secure_filename(original_filename)}"
-                filepath = os.path.join(request_temp_folder, safe_filename)
-                file_stream.save(filepath)
-                uploaded_file_paths_in_temp.append(filepath)
-            elif file_stream and file_stream.filename:
-                raise ValueError(f"Invalid file type for merge: {file_stream.filename}. Only PDF files allowed.")
-            else:
-                raise ValueError("Empty or invalid file stream encountered during merge.")
-        
-        for pdf_path in uploaded_file_paths_in_temp:
-            merger.append(pdf_path)
-
-        output_filename = f"merged_{uuid.uuid4().hex[:8]}.pdf"
-        output_filepath = os.path.join(current_app.config['CONVERTED_FILES_FOLDER'], output_filename)
-        
+        # Inputs are read straight from their upload streams and written out one at a time; only the
+        # document being appended is parsed in memory, never all of them together with the output.
         with open(output_filepath, "wb") as f_out:
-            merger.write(f_out)
-        merger.close()
+            merger = StreamingMerger(f_out)
+            for file_stream in files:
+                if not file_stream or not file_stream.filename:
+                    raise ValueError("Empty or invalid file stream encountered during merge.")
+                if not check_allowed_file(file_stream.filename, ALLOWED_EXTENSIONS_PDF):
+                    raise ValueError(f"Invalid file type for merge: {file_stream.filename}. Only PDF files allowed.")
+                reader = load_pdf(open_uploaded_file(file_stream)) # Content must really be a PDF, not just named like one
+                if reader.is_encrypted:
+                    raise ValueError(f"'{file_stream.filename}' is password protected. Please unlock it before merging.")
+                total_pages += merger.add_document(reader, os.path.splitext(file_stream.filename)[0])
+                input_bytes = get_upload_size(file_stream)
+                total_input_bytes += input_bytes
+                peak_input_bytes = max(peak_input_bytes, input_bytes)
+                del reader
+            with stage_timer(STAGE_OUTPUT_WRITE):
+                merger.finish()
+    except Exception:
+        if os.path.exists(output_filepath):
+            os.remove(output_filepath) # Never leave a truncated merge behind
+        raise
 
-        response_data = {
-            'success': True, 
-            'message':'Files merged successfully!',
-            'download_url': f'/api/download/{output_filename}', 
-            'filename': output_filename
-        }
-        return response_data, 200
-    finally:
-        if request_temp_folder and os.path.exists(request_temp_folder):
-            try:
-                shutil.rmtree(request_temp_folder)
-            except OSError as e_clean:
-                current_app.logger.error(f"Error cleaning temp folder {request_temp_folder} for merge: {e_clean}")
\ No newline at end of file
+    output_bytes = os.path.getsize(output_filepath)
+    current_app.logger.info(
+        f"Merged {len(files)} files ({total_pages} pages): {merger.objects_deduplicated} duplicate objects "
+        f"({merger.bytes_deduplicated} bytes) shared instead of written again")
+    response_data = {
+        'success': True, 
+        'message': (f"Files merged successfully! {merger.objects_deduplicated} duplicate fonts, images and other objects "
+                    f"were shared, saving {format_file_size_py(merger.bytes_deduplicated)}."),
+        'download_url': f'/api/download/{output_filename}', 
+        'filename': output_filename,
+        'totalPages': total_pages,
+        'input_size_bytes': total_input_bytes,
+        'output_size_bytes': output_bytes,
+        'objects_deduplicated': merger.objects_deduplicated,
+        'bytes_saved_by_deduplication': merger.bytes_deduplicated,
+        # Largest input held in memory at once, where the whole set used to be
+        'peak_input_bytes_in_memory': peak_input_bytes
+    }
+    return response_data, 200
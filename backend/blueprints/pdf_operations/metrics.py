@@ -0,0 +1,117 @@
+# backend/blueprints/pdf_operations/metrics.py
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from prometheus_client import Counter, Histogram, CollectorRegistry, generate_latest, CONTENT_TYPE_LATEST
+from prometheus_client import multiprocess
+
+# Stages a request is split into. 'transform' is whatever dispatch time is not spent in another stage.
+STAGE_UPLOAD_SAVE = 'upload_save'
+STAGE_PARSE = 'parse'
+STAGE_TRANSFORM = 'transform'
+STAGE_OUTPUT_WRITE = 'output_write'
+STAGE_SUBPROCESS_WAIT = 'subprocess_wait'
+
+OUTCOME_SUCCESS = 'success'
+OUTCOME_CACHED = 'cached'
+OUTCOME_CLIENT_ERROR = 'client_error'
+OUTCOME_SERVER_ERROR = 'server_error'
+
+# Conversions range from milliseconds (rotate) to minutes (large office documents)
+DURATION_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+REQUEST_SECONDS = Histogram(
+    'pdfmaestro_request_duration_seconds', 'Time spent dispatching an operation.',
+    ['operation', 'outcome'], buckets=DURATION_BUCKETS)
+STAGE_SECONDS = Histogram(
+    'pdfmaestro_stage_duration_seconds', 'Time spent in each stage of an operation.',
+    ['operation', 'stage', 'outcome'], buckets=DURATION_BUCKETS)
+REQUESTS_TOTAL = Counter(
+    'pdfmaestro_requests_total', 'Operations dispatched.', ['operation', 'outcome'])
+BYTES_IN_TOTAL = Counter(
+    'pdfmaestro_input_bytes_total', 'Bytes of uploaded files.', ['operation', 'outcome'])
+BYTES_OUT_TOTAL = Counter(
+    'pdfmaestro_output_bytes_total', 'Bytes of produced output files.', ['operation', 'outcome'])
+PAGES_TOTAL = Counter(
+    'pdfmaestro_pages_total', 'Pages of parsed input PDFs.', ['operation', 'outcome'])
+
+# Metrics of the operation running in the current thread (None outside dispatch_operation).
+# Helpers called from worker threads or the CPU pool see None and record nothing.
+_current = ContextVar('pdfmaestro_operation_metrics', default=None)
+
+
+class OperationMetrics:
+    """Collects the stage timings and counts of one dispatch; they are observed once the outcome is known."""
+
+    def __init__(self, operation):
+        self.operation = operation
+        self.stage_seconds = {}
+        self.pages = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self._started = None
+        self._token = None
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _current.reset(self._token)
+        return False
+
+    def add_stage_time(self, stage, seconds):
+        self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + seconds
+
+    def finish(self, response_data, status_code):
+        total_seconds = time.perf_counter() - self._started
+        outcome = outcome_for(response_data, status_code)
+        labels = {'operation': self.operation, 'outcome': outcome}
+
+        REQUESTS_TOTAL.labels(**labels).inc()
+        REQUEST_SECONDS.labels(**labels).observe(total_seconds)
+        if outcome != OUTCOME_CACHED: # A cache hit has no stages, only the lookup
+            stage_seconds = dict(self.stage_seconds)
+            stage_seconds[STAGE_TRANSFORM] = max(0.0, total_seconds - sum(stage_seconds.values()))
+            for stage, seconds in stage_seconds.items():
+                STAGE_SECONDS.labels(operation=self.operation, stage=stage, outcome=outcome).observe(seconds)
+        BYTES_IN_TOTAL.labels(**labels).inc(self.bytes_in)
+        BYTES_OUT_TOTAL.labels(**labels).inc(self.bytes_out)
+        PAGES_TOTAL.labels(**labels).inc(self.pages)
+
+
+def outcome_for(response_data, status_code):
+    if status_code >= 500:
+        return OUTCOME_SERVER_ERROR
+    if status_code >= 400:
+        return OUTCOME_CLIENT_ERROR
+    return OUTCOME_CACHED if response_data.get('cached') else OUTCOME_SUCCESS
+
+@contextmanager
+def stage_timer(stage):
+    """Adds the time spent in the block to the current operation's stage (no-op outside an operation)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.add_stage_time(stage, time.perf_counter() - started)
+
+def record_pages(count):
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.pages += count
+
+def metrics_payload():
+    """
+    Returns (body, content_type) in the Prometheus text format. When PROMETHEUS_MULTIPROC_DIR is set
+    (several Flask worker processes, or the async job pool), the values of all processes are merged.
+    """
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,229 @@
+# backend/blueprints/pdf_operations/ocr_engine.py
+import os
+import re
+import time
+import shutil
+import hashlib
+import tempfile
+import subprocess
+from flask import current_app
+from pypdf import PdfReader, PdfWriter, Transformation
+from pypdf.generic import ArrayObject, DictionaryObject, IndirectObject, StreamObject
+from .cpu_pool import run_sharded
+from .render_engine import render_page_run
+from .metrics import stage_timer, STAGE_SUBPROCESS_WAIT
+
+OCR_CACHE_VERSION = b'ocr-1' # Bump when rendering or engine options change what a page's OCR produces
+OCR_LANGUAGE_PATTERN = re.compile(r'^[A-Za-z_]{3,}(\+[A-Za-z_]{3,})*$') # eng, deu+eng, chi_sim
+OCR_MIN_DPI, OCR_MAX_DPI = 150, 600
+OCR_CACHE_TRIM_INTERVAL = 10 * 60 # Seconds between size checks of the OCR cache, per process
+TESSERACT_NOT_FOUND_MESSAGE = "Tesseract OCR engine not found. Please install Tesseract and add it to PATH (or set OCR_TESSERACT_CMD)."
+
+# Page entries that decide how a page renders; /Parent and /Annots would pull in the rest of the document
+PAGE_CONTENT_KEYS = ('/Contents', '/Resources', '/MediaBox', '/CropBox', '/Rotate', '/UserUnit')
+
+_last_cache_trim = 0
+
+
+def ocr_available():
+    return shutil.which(current_app.config['OCR_TESSERACT_CMD']) is not None
+
+def parse_ocr_options(request_form):
+    """(language, dpi) from the ocrLanguage/ocrDpi form fields."""
+    language = request_form.get('ocrLanguage', current_app.config['OCR_DEFAULT_LANGUAGE']).strip()
+    if not OCR_LANGUAGE_PATTERN.match(language):
+        raise ValueError(f"Invalid OCR language: {language}. Use Tesseract language codes such as 'eng' or 'deu+eng'.")
+    try:
+        dpi = int(request_form.get('ocrDpi', 300))
+    except ValueError:
+        raise ValueError("OCR DPI must be a whole number.")
+    if not OCR_MIN_DPI <= dpi <= OCR_MAX_DPI:
+        raise ValueError(f"OCR DPI must be between {OCR_MIN_DPI} and {OCR_MAX_DPI}.")
+    return language, dpi
+
+def _hash_object(value, digest, seen):
+    if isinstance(value, IndirectObject):
+        if value.idnum in seen: # Numbered by first visit, so the same page in another file hashes the same
+            digest.update(f"R{seen[value.idnum]}".encode('ascii'))
+            return
+        seen[value.idnum] = len(seen)
+        value = value.get_object()
+    if isinstance(value, DictionaryObject):
+        digest.update(b'<<')
+        for key in sorted(value.keys()):
+            if isinstance(value, StreamObject) and key == '/Length':
+                continue
+            digest.update(key.encode('utf-8'))
+            _hash_object(value.raw_get(key), digest, seen)
+        digest.update(b'>>')
+        if isinstance(value, StreamObject):
+            digest.update(b'stream')
+            digest.update(value._data) # Still encoded: hashing does not decompress the scan
+    elif isinstance(value, ArrayObject):
+        digest.update(b'[')
+        for item in value:
+            _hash_object(item, digest, seen)
+        digest.update(b']')
+    else:
+        digest.update(repr(value).encode('utf-8'))
+
+def page_content_key(page, language, dpi):
+    """
+    Cache key of a page's OCR result: a hash of everything that decides how the page renders (content
+    streams, fonts and images, page boxes, rotation) plus the OCR options. The same scan uploaded again,
+    or appearing in another document, gets the same key.
+    """
+    digest = hashlib.sha256(OCR_CACHE_VERSION)
+    digest.update(f"|{language}|{dpi}|".encode('ascii'))
+    seen = {}
+    for key in PAGE_CONTENT_KEYS:
+        if key in page:
+            digest.update(key.encode('ascii'))
+            _hash_object(page.raw_get(key), digest, seen)
+    return digest.hexdigest()
+
+def _cache_paths(cache_folder, key):
+    shard_folder = os.path.join(cache_folder, key[:2])
+    return os.path.join(shard_folder, f"{key}.txt"), os.path.join(shard_folder, f"{key}.pdf")
+
+def _pin_layer(layer_path, pinned_path):
+    """
+    Gives the request its own name for a text layer: a hard link where the filesystem allows it, a
+    copy otherwise. Trimming the cache then only removes the cache's name, never the request's file.
+    """
+    try:
+        os.link(layer_path, pinned_path)
+    except FileNotFoundError:
+        raise
+    except OSError:
+        shutil.copyfile(layer_path, pinned_path)
+    return pinned_path
+
+def _cached_result(cache_folder, key, pinned_layer_path):
+    """(text, layer_path) from the cache, or None. The layer is wanted (and pinned) when pinned_layer_path is given."""
+    text_path, layer_path = _cache_paths(cache_folder, key)
+    try:
+        with open(text_path, encoding='utf-8') as f_in:
+            text = f_in.read()
+        os.utime(text_path) # Recently used entries survive trimming
+        if pinned_layer_path is None:
+            return text, None
+        os.utime(layer_path)
+        return text, _pin_layer(layer_path, pinned_layer_path)
+    except FileNotFoundError: # Never cached, or trimmed meanwhile: recognised again
+        return None
+
+def _ocr_page_task(input_path, page_number, key, language, dpi, pinned_layer_path, cache_folder, tesseract_cmd, timeout):
+    """
+    Worker task: renders one page, runs Tesseract on it and stores the text (and, when pinned_layer_path
+    is given, the invisible-text PDF layer, pinned there for the request) in the cache. Returns
+    (text, pinned_layer_path, error_message).
+    """
+    searchable = pinned_layer_path is not None
+    text_path, layer_path = _cache_paths(cache_folder, key)
+    os.makedirs(os.path.dirname(text_path), exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=cache_folder, prefix='.render_') as render_folder:
+        [(_, image_path)] = render_page_run(input_path, render_folder, page_number, page_number, dpi, 'png')
+        output_base = os.path.join(render_folder, 'ocr')
+        command = [tesseract_cmd, image_path, output_base, '-l', language, '--dpi', str(dpi)]
+        command += ['-c', 'textonly_pdf=1', 'txt', 'pdf'] if searchable else ['txt']
+        try:
+            subprocess.run(command, check=True, capture_output=True, timeout=timeout)
+        except FileNotFoundError:
+            raise FileNotFoundError(TESSERACT_NOT_FOUND_MESSAGE)
+        except subprocess.CalledProcessError as e:
+            return f"[Error running OCR on page {page_number}]", None, e.stderr.decode('utf-8', 'replace').strip() or str(e)
+        with open(f"{output_base}.txt", encoding='utf-8') as f_in:
+            text = f_in.read()
+        # Renamed into place, so a concurrent reader never sees a partial entry; the layer goes first
+        if searchable:
+            _pin_layer(f"{output_base}.pdf", pinned_layer_path)
+            os.replace(f"{output_base}.pdf", layer_path)
+        os.replace(f"{output_base}.txt", text_path)
+    return text, pinned_layer_path, None
+
+def iter_ocr_pages(reader, input_path, num_pages, language, dpi, layer_folder=None):
+    """
+    Yields (page_index, text, error_message, layer_path) in page order. Pages already in the OCR cache
+    are answered from it; the others are rendered and recognised on the CPU pool, one page per task.
+    With layer_folder (searchable output), each page's text layer is linked or copied into it and the
+    yielded layer_path is that copy, which a cache trim in any process leaves alone.
+    """
+    config = current_app.config
+    cache_folder = config['OCR_CACHE_FOLDER']
+    os.makedirs(cache_folder, exist_ok=True)
+    keys = [page_content_key(reader.pages[page_index], language, dpi) for page_index in range(num_pages)]
+    pinned_paths = [os.path.join(layer_folder, f"ocr_layer_{page_index + 1}.pdf") if layer_folder else None
+                    for page_index in range(num_pages)]
+    cached = [_cached_result(cache_folder, key, pinned_path) for key, pinned_path in zip(keys, pinned_paths)]
+    misses = [
+        (input_path, page_index + 1, keys[page_index], language, dpi, pinned_paths[page_index], cache_folder,
+         config['OCR_TESSERACT_CMD'], config['OCR_PAGE_TIMEOUT'])
+        for page_index in range(num_pages) if cached[page_index] is None
+    ]
+    current_app.logger.info(f"OCR: {num_pages - len(misses)} of {num_pages} page(s) served from the cache")
+
+    miss_results = run_sharded(_ocr_page_task, misses, parallel=True)
+    for page_index in range(num_pages):
+        if cached[page_index] is not None:
+            text, layer_path = cached[page_index]
+            yield page_index, text, None, layer_path
+        else:
+            with stage_timer(STAGE_SUBPROCESS_WAIT):
+                text, layer_path, error_message = next(miss_results)
+            yield page_index, text, error_message, layer_path
+
+def add_text_layers(reader, layer_paths):
+    """
+    Copies the reader's pages into a new writer with each page's OCR text layer (invisible text, as
+    Tesseract writes it with textonly_pdf) laid over it. The page images are left as they were.
+    """
+    writer = PdfWriter()
+    for page, layer_path in zip(reader.pages, layer_paths):
+        added_page = writer.add_page(page)
+        if layer_path is None:
+            continue
+        layer = PdfReader(layer_path).pages[0]
+        rotation = added_page.rotation % 360
+        if rotation:
+            # The page was rendered as displayed; turn the layer back into the page's unrotated space
+            layer.rotate((360 - rotation) % 360)
+            layer.transfer_rotation_to_content()
+        page_box, layer_box = added_page.mediabox, layer.mediabox # pdftoppm renders the media box
+        transformation = (Transformation()
+                          .translate(-float(layer_box.left), -float(layer_box.bottom))
+                          .scale(float(page_box.width) / float(layer_box.width), float(page_box.height) / float(layer_box.height))
+                          .translate(float(page_box.left), float(page_box.bottom)))
+        added_page.merge_transformed_page(layer, transformation)
+    return writer
+
+def trim_ocr_cache():
+    """Keeps the OCR cache within OCR_CACHE_MAX_BYTES. Call once the output is written: layers in use are pinned, not cached."""
+    _trim_cache(current_app.config['OCR_CACHE_FOLDER'], current_app.config['OCR_CACHE_MAX_BYTES'])
+
+def _trim_cache(cache_folder, max_bytes):
+    """Deletes the least recently used entries once the cache outgrows max_bytes. Runs at most every OCR_CACHE_TRIM_INTERVAL."""
+    global _last_cache_trim
+    now = time.time()
+    if now - _last_cache_trim < OCR_CACHE_TRIM_INTERVAL:
+        return
+    _last_cache_trim = now
+    entries, total_bytes = [], 0
+    for folder, subfolders, filenames in os.walk(cache_folder):
+        subfolders[:] = [name for name in subfolders if not name.startswith('.render_')] # Pages being recognised right now
+        for filename in filenames:
+            path = os.path.join(folder, filename)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total_bytes += stat.st_size
+    for _, size, path in sorted(entries):
+        if total_bytes <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total_bytes -= size
@@ -0,0 +1,246 @@
+# backend/blueprints/pdf_operations/output_store.py
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from contextlib import contextmanager
+from flask import current_app
+
+SHARD_LEVELS = 2 # converted_files/ab/cd/<filename>: 65536 directories, so none holds more than a few hundred files
+SWEEP_LEASE_SECONDS = 600 # A sweep that crashed releases its lock after this long
+
+_stores = {}
+_stores_lock = threading.Lock()
+_janitor_started = set()
+
+
+def _shard_dir(filename, output_folder):
+    digest = hashlib.sha1(filename.encode('utf-8')).hexdigest()
+    return os.path.join(output_folder, *(digest[2 * level:2 * level + 2] for level in range(SHARD_LEVELS)))
+
+def output_path(filename, output_folder=None):
+    """Where a handler should write the output called filename. The shard directory is created on demand."""
+    shard_dir = _shard_dir(filename, output_folder or current_app.config['CONVERTED_FILES_FOLDER'])
+    os.makedirs(shard_dir, exist_ok=True)
+    return os.path.join(shard_dir, filename)
+
+def locate_output(filename, output_folder=None):
+    """Path of an existing output, or None. Files written before sharding are still found at the top level."""
+    output_folder = output_folder or current_app.config['CONVERTED_FILES_FOLDER']
+    if not filename:
+        return None
+    for candidate in (os.path.join(_shard_dir(filename, output_folder), filename), os.path.join(output_folder, filename)):
+        if os.path.isfile(candidate):
+            return candidate
+    return None
+
+
+class OutputStore:
+    """
+    Index of the files in CONVERTED_FILES_FOLDER with their size, creation and last access times.
+    A sweep deletes outputs older than ttl_seconds, then the least recently used ones until the
+    folder fits in max_bytes. Deleted outputs are kept as tombstones for tombstone_seconds so a late
+    download gets 410 Gone instead of 404. Backed by SQLite, shared by all Flask and job processes.
+    """
+
+    def __init__(self, db_path, output_folder, ttl_seconds, max_bytes, tombstone_seconds):
+        self.db_path = db_path
+        self.output_folder = output_folder
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.tombstone_seconds = tombstone_seconds
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS outputs ("
+                " filename TEXT PRIMARY KEY, size_bytes INTEGER, created_at REAL, last_access REAL,"
+                " deleted_at REAL, deleted_reason TEXT, sha256 TEXT)"
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(outputs)")}
+            if 'sha256' not in columns: # Index created before download ETags existed
+                conn.execute("ALTER TABLE outputs ADD COLUMN sha256 TEXT")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_outputs_created_at ON outputs(created_at) WHERE deleted_at IS NULL")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_outputs_last_access ON outputs(last_access) WHERE deleted_at IS NULL")
+            conn.execute("CREATE TABLE IF NOT EXISTS sweep_lock (id INTEGER PRIMARY KEY CHECK (id = 1), locked_until REAL)")
+            conn.execute("INSERT OR IGNORE INTO sweep_lock (id, locked_until) VALUES (1, 0)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def register(self, filename):
+        """
+        Records a newly written output. A row left under the same name (a tombstone, or a file that was
+        overwritten) is reset, so its old size and content hash (the download ETag) are not reused.
+        """
+        path = locate_output(filename, self.output_folder)
+        if path is None:
+            return
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO outputs (filename, size_bytes, created_at, last_access) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT(filename) DO UPDATE SET size_bytes = excluded.size_bytes, created_at = excluded.created_at,"
+                " last_access = excluded.last_access, deleted_at = NULL, deleted_reason = NULL, sha256 = NULL",
+                (filename, os.path.getsize(path), now, now)
+            )
+
+    def renew(self, filename):
+        """
+        Restarts the TTL of an output handed out again (a result cache hit), so the download_url in that
+        response stays valid for the full OUTPUT_TTL_SECONDS rather than until the first request's expiry.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("UPDATE outputs SET created_at = ?, last_access = ? WHERE filename = ? AND deleted_at IS NULL", (now, now, filename))
+
+    def touch(self, filename):
+        with self._connect() as conn:
+            conn.execute("UPDATE outputs SET last_access = ? WHERE filename = ? AND deleted_at IS NULL", (time.time(), filename))
+
+    def get_sha256(self, filename):
+        with self._connect() as conn:
+            row = conn.execute("SELECT sha256 FROM outputs WHERE filename = ? AND deleted_at IS NULL", (filename,)).fetchone()
+        return row[0] if row else None
+
+    def set_sha256(self, filename, sha256):
+        with self._connect() as conn:
+            conn.execute("UPDATE outputs SET sha256 = ? WHERE filename = ?", (sha256, filename))
+
+    def is_expired(self, filename):
+        with self._connect() as conn:
+            row = conn.execute("SELECT deleted_at FROM outputs WHERE filename = ?", (filename,)).fetchone()
+        return row is not None and row[0] is not None
+
+    def _acquire_sweep(self, conn, now):
+        cursor = conn.execute(
+            "UPDATE sweep_lock SET locked_until = ? WHERE id = 1 AND locked_until < ?", (now + SWEEP_LEASE_SECONDS, now))
+        return cursor.rowcount == 1
+
+    def _release_sweep(self, conn):
+        conn.execute("UPDATE sweep_lock SET locked_until = 0 WHERE id = 1")
+
+    def _delete(self, conn, filenames, reason, now):
+        freed = 0
+        for filename in filenames:
+            path = locate_output(filename, self.output_folder)
+            if path is not None:
+                try:
+                    freed += os.path.getsize(path)
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+        conn.executemany(
+            "UPDATE outputs SET deleted_at = ?, deleted_reason = ? WHERE filename = ?",
+            [(now, reason, filename) for filename in filenames]
+        )
+        return freed
+
+    def adopt_unindexed(self, conn):
+        """Indexes files that are on disk but not in the index (written before it existed, or by a crashed worker)."""
+        known = {row[0] for row in conn.execute("SELECT filename FROM outputs WHERE deleted_at IS NULL")}
+        adopted = []
+        for root, _, files in os.walk(self.output_folder):
+            for filename in files:
+                if filename in known:
+                    continue
+                stat = os.stat(os.path.join(root, filename))
+                adopted.append((filename, stat.st_size, stat.st_mtime, stat.st_mtime))
+        conn.executemany(
+            "INSERT OR REPLACE INTO outputs (filename, size_bytes, created_at, last_access) VALUES (?, ?, ?, ?)", adopted)
+        return len(adopted)
+
+    def sweep(self, scan_disk=False):
+        """
+        Runs one retention pass unless another process is already running one.
+        Returns a summary dict, or None when the sweep was skipped.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            if not self._acquire_sweep(conn, now):
+                return None
+            try:
+                adopted = self.adopt_unindexed(conn) if scan_disk else 0
+
+                expired = [row[0] for row in conn.execute(
+                    "SELECT filename FROM outputs WHERE deleted_at IS NULL AND created_at < ?", (now - self.ttl_seconds,))]
+                freed = self._delete(conn, expired, 'expired', now)
+
+                total_bytes = conn.execute(
+                    "SELECT COALESCE(SUM(size_bytes), 0) FROM outputs WHERE deleted_at IS NULL").fetchone()[0]
+                evicted = []
+                if total_bytes > self.max_bytes:
+                    for filename, size_bytes in conn.execute(
+                            "SELECT filename, size_bytes FROM outputs WHERE deleted_at IS NULL ORDER BY last_access"):
+                        if total_bytes <= self.max_bytes:
+                            break
+                        evicted.append(filename)
+                        total_bytes -= size_bytes
+                freed += self._delete(conn, evicted, 'evicted', now)
+
+                conn.execute("DELETE FROM outputs WHERE deleted_at IS NOT NULL AND deleted_at < ?", (now - self.tombstone_seconds,))
+            finally:
+                self._release_sweep(conn)
+        return {'adopted': adopted, 'expired': len(expired), 'evicted': len(evicted), 'freed_bytes': freed}
+
+    def stats(self):
+        with self._connect() as conn:
+            live_count, live_bytes = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM outputs WHERE deleted_at IS NULL").fetchone()
+            tombstones = conn.execute("SELECT COUNT(*) FROM outputs WHERE deleted_at IS NOT NULL").fetchone()[0]
+        return {
+            'files': live_count,
+            'total_bytes': live_bytes,
+            'max_bytes': self.max_bytes,
+            'ttl_seconds': self.ttl_seconds,
+            'tombstones': tombstones
+        }
+
+
+def get_output_store():
+    """Returns the output index of the current app, or None when retention is disabled."""
+    config = current_app.config
+    if not config.get('RETENTION_ENABLED'):
+        return None
+    db_path = config['OUTPUT_INDEX_DB']
+    with _stores_lock:
+        if db_path not in _stores:
+            _stores[db_path] = OutputStore(
+                db_path,
+                config['CONVERTED_FILES_FOLDER'],
+                ttl_seconds=config['OUTPUT_TTL_SECONDS'],
+                max_bytes=config['OUTPUT_MAX_BYTES'],
+                tombstone_seconds=config['OUTPUT_TOMBSTONE_SECONDS']
+            )
+        return _stores[db_path]
+
+def _janitor_loop(app):
+    interval = app.config['RETENTION_SWEEP_INTERVAL']
+    scan_every = max(1, app.config['RETENTION_DISK_SCAN_INTERVAL'] // interval)
+    sweeps = 0
+    while True:
+        with app.app_context():
+            try:
+                # The first sweep (and every scan_every-th after it) also indexes files the index does not know about
+                output_store = get_output_store() # None if retention was switched off after startup
+                summary = output_store.sweep(scan_disk=(sweeps % scan_every == 0)) if output_store else None
+                if summary and (summary['expired'] or summary['evicted'] or summary['adopted']):
+                    app.logger.info(
+                        f"Retention sweep: {summary['expired']} expired, {summary['evicted']} evicted, "
+                        f"{summary['adopted']} adopted, {summary['freed_bytes']} bytes freed")
+            except Exception as e: # The janitor must keep running whatever happens
+                app.logger.error(f"Retention sweep failed: {str(e)}", exc_info=True)
+        sweeps += 1
+        time.sleep(interval)
+
+def start_janitor(app):
+    """Starts the background retention thread for this process (once per app)."""
+    if not app.config.get('RETENTION_ENABLED') or id(app) in _janitor_started:
+        return
+    _janitor_started.add(id(app))
+    threading.Thread(target=_janitor_loop, args=(app,), name='output-janitor', daemon=True).start()
@@ -0,0 +1,99 @@
+# backend/blueprints/pdf_operations/pdf_stream_writer.py
+from io import BytesIO
+from pypdf.generic import ArrayObject, DictionaryObject, IndirectObject, NameObject, NumberObject
+
+PDF_HEADER = b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n"
+STREAM_COPY_CHUNK = 1024 * 1024
+
+
+class StreamingPdfWriter:
+    """
+    Writes a PDF object by object straight to output_file; only the byte offsets of the objects are
+    kept for the cross-reference table. Pages are appended with add_page, and finish() writes the page
+    tree, the catalog (plus whatever catalog_entries adds) and the trailer.
+    """
+
+    def __init__(self, output_file):
+        self.output = output_file
+        self.offsets = {}
+        self.next_id = 1
+        self.pages_root_id = self.allocate()
+        self.catalog_id = self.allocate()
+        self.page_ids = []
+        self.output.write(PDF_HEADER)
+
+    def allocate(self):
+        object_id = self.next_id
+        self.next_id += 1
+        return object_id
+
+    def reference(self, object_id):
+        return IndirectObject(object_id, 0, None)
+
+    def write_object(self, object_id, body):
+        self.offsets[object_id] = self.output.tell()
+        self.output.write(f"{object_id} 0 obj\n".encode('ascii'))
+        self.output.write(body)
+        self.output.write(b"\nendobj\n")
+
+    def write_dictionary(self, object_id, entries):
+        buffer = BytesIO()
+        DictionaryObject({NameObject(key): value for key, value in entries.items()}).write_to_stream(buffer)
+        self.write_object(object_id, buffer.getvalue())
+
+    def write_stream(self, entries, data=None, source=None, length=None):
+        """
+        Writes a stream object and returns its id. The data is either bytes, or length bytes copied
+        from the open file source in chunks (so large images never sit in memory whole).
+        """
+        object_id = self.allocate()
+        entries = dict(entries, **{'/Length': NumberObject(len(data) if data is not None else length)})
+        buffer = BytesIO()
+        DictionaryObject({NameObject(key): value for key, value in entries.items()}).write_to_stream(buffer)
+        self.offsets[object_id] = self.output.tell()
+        self.output.write(f"{object_id} 0 obj\n".encode('ascii'))
+        self.output.write(buffer.getvalue())
+        self.output.write(b"\nstream\n")
+        if data is not None:
+            self.output.write(data)
+        else:
+            remaining = length
+            while remaining > 0:
+                chunk = source.read(min(STREAM_COPY_CHUNK, remaining))
+                if not chunk:
+                    raise ValueError("The input ended before the expected stream length.")
+                self.output.write(chunk)
+                remaining -= len(chunk)
+        self.output.write(b"\nendstream\nendobj\n")
+        return object_id
+
+    def add_page(self, entries):
+        """Writes a page dictionary (its /Type and /Parent are filled in) and appends it to the page tree."""
+        page_id = self.allocate()
+        self.write_dictionary(page_id, dict(entries, **{'/Type': NameObject('/Page'), '/Parent': self.reference(self.pages_root_id)}))
+        self.page_ids.append(page_id)
+        return page_id
+
+    def catalog_entries(self):
+        """Extra catalog entries, written before the catalog itself. Subclasses add bookmarks and the like."""
+        return {}
+
+    def finish(self):
+        """Writes the page tree, catalog, cross-reference table and trailer."""
+        self.write_dictionary(self.pages_root_id, {
+            '/Type': NameObject('/Pages'),
+            '/Kids': ArrayObject(self.reference(page_id) for page_id in self.page_ids),
+            '/Count': NumberObject(len(self.page_ids)),
+        })
+        catalog = {'/Type': NameObject('/Catalog'), '/Pages': self.reference(self.pages_root_id)}
+        catalog.update(self.catalog_entries())
+        self.write_dictionary(self.catalog_id, catalog)
+
+        xref_offset = self.output.tell()
+        size = self.next_id
+        lines = [b"xref\n", f"0 {size}\n".encode('ascii'), b"0000000000 65535 f \n"]
+        for object_id in range(1, size):
+            offset = self.offsets.get(object_id)
+            lines.append(f"{offset:010d} 00000 n \n".encode('ascii') if offset is not None else b"0000000000 65535 f \n")
+        self.output.write(b"".join(lines))
+        self.output.write(f"trailer\n<< /Size {size} /Root {self.catalog_id} 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode('ascii'))
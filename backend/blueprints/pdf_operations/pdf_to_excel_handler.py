@@ -2,13 +2,15 @@
 import os
 import uuid
 import shutil
-import pandas as pd
-import tabula # tabula-py
 from flask import current_app
 from werkzeug.utils import secure_filename
-from .utils import check_allowed_file, create_temp_folder, save_uploaded_file
+from .utils import check_allowed_file, create_temp_folder, save_uploaded_file, parse_page_ranges, load_pdf
+from .output_store import output_path
+from .metrics import stage_timer, STAGE_OUTPUT_WRITE, STAGE_SUBPROCESS_WAIT
+from .table_engine import TABLE_OUTPUT_FORMATS, TABLE_OUTPUT_EXTENSIONS, TableOutputWriter, iter_page_tables
 
 ALLOWED_EXTENSIONS_PDF = {'pdf'}
+OUTPUT_FORMAT_LABELS = {'xlsx': 'Excel', 'csv': 'CSV', 'parquet': 'Parquet'}
 
 def handle_pdf_to_excel(request_files, request_form):
     if 'files' not in request_files:
@@ -22,62 +24,69 @@ def handle_pdf_to_excel(request_files, request_form):
     if not check_allowed_file(original_filename, ALLOWED_EXTENSIONS_PDF):
         raise ValueError(f"Invalid file type: {original_filename}. Only PDF files are allowed.")
 
+    output_format = request_form.get('outputFormat', 'xlsx').lower()
+    if output_format not in TABLE_OUTPUT_FORMATS:
+        raise ValueError(f"Invalid output format: {output_format}. Choose one of {', '.join(TABLE_OUTPUT_FORMATS)}.")
+
     original_filename_secure = secure_filename(original_filename)
     request_temp_folder = create_temp_folder("pdf2excel_temp")
     
     try:
         temp_input_filepath = save_uploaded_file(file_stream, request_temp_folder)
-        
-        # Extract tables from PDF.
-        # tabula.read_pdf returns a list of pandas DataFrames, one for each table found.
-        # The 'pages' argument can be 'all', a page number, or a list of page numbers.
-        # 'lattice=True' or 'stream=True' can be used depending on table structure.
-        # This might need more advanced options or trying both lattice and stream if results are poor.
-        try:
-            dfs = tabula.read_pdf(temp_input_filepath, pages='all', multiple_tables=True, lattice=True)
-            if not dfs: # If lattice didn't find tables, try stream mode
-                 current_app.logger.info(f"Lattice mode found no tables in {original_filename_secure}, trying stream mode.")
-                 dfs = tabula.read_pdf(temp_input_filepath, pages='all', multiple_tables=True, stream=True)
-
-        except Exception as tabula_error:
-            # tabula-py can raise various errors, including if Java is not found
-            if "java.io.IOException" in str(tabula_error) or "JavaNotFoundError" in str(tabula_error):
-                 raise FileNotFoundError("Java runtime not found or tabula setup issue. Please ensure Java is installed and accessible.") from tabula_error
-            current_app.logger.error(f"Tabula PDF parsing error for {original_filename_secure}: {tabula_error}")
-            raise Exception(f"Could not extract tables from PDF. The PDF might not contain detectable tables or is corrupted. Error: {str(tabula_error)}")
-
-
-        if not dfs: # If still no DataFrames
-            raise ValueError("No tables found in the PDF or tables are not in a detectable format.")
+        num_total_pages = len(load_pdf(temp_input_filepath).pages)
+        pages_str = request_form.get('pages', '').strip()
+        if pages_str and pages_str.lower() != 'all':
+            page_numbers = [i + 1 for i in parse_page_ranges(pages_str, num_total_pages)]
+        else:
+            page_numbers = list(range(1, num_total_pages + 1))
 
         output_filename_base = os.path.splitext(original_filename_secure)[0]
-        output_excel_filename = f"{output_filename_base}_{uuid.uuid4().hex[:6]}.xlsx"
-        output_excel_filepath = os.path.join(current_app.config['CONVERTED_FILES_FOLDER'], output_excel_filename)
-        
-        # Save all found tables into different sheets of the same Excel file
-        with pd.ExcelWriter(output_excel_filepath, engine='openpyxl') as writer:
-            for i, df in enumerate(dfs):
-                if not df.empty:
-                    df.to_excel(writer, sheet_name=f'Table_{i+1}', index=False)
-                else:
-                    current_app.logger.info(f"Skipping empty DataFrame (table {i+1}) from {original_filename_secure}")
-        
-        if not os.path.exists(output_excel_filepath) or os.path.getsize(output_excel_filepath) == 0:
-             # Check if any sheets were actually written
-            from openpyxl import load_workbook
+        output_table_filename = f"{output_filename_base}_{uuid.uuid4().hex[:6]}.{TABLE_OUTPUT_EXTENSIONS[output_format]}"
+        output_table_filepath = output_path(output_table_filename)
+
+        # One pass over the selected pages: each page is tried in lattice mode, and in stream mode only if
+        # lattice finds nothing there. Long selections are split into chunks extracted in parallel. Tables
+        # are written as each page arrives, so only one page's tables are held in memory.
+        table_writer = TableOutputWriter(output_table_filepath, output_format)
+        methods_used = {'lattice': 0, 'stream': 0}
+        try:
             try:
-                wb = load_workbook(output_excel_filepath)
-                if not wb.sheetnames: # No sheets means no data was written
-                    raise Exception("PDF to Excel conversion resulted in an empty Excel file. No valid tables might have been extracted.")
-            except: # If file is truly empty or corrupt, load_workbook might fail
-                raise Exception("PDF to Excel conversion failed to produce a valid Excel file.")
+                extracted_pages = iter_page_tables(temp_input_filepath, page_numbers, current_app.config['TABULA_JAVA_OPTIONS'])
+                while True:
+                    with stage_timer(STAGE_SUBPROCESS_WAIT): # tabula runs tabula-java
+                        extracted = next(extracted_pages, None)
+                    if extracted is None:
+                        break
+                    page_number, method, page_tables = extracted
+                    methods_used[method] += len(page_tables)
+                    with stage_timer(STAGE_OUTPUT_WRITE):
+                        for df in page_tables:
+                            table_writer.write_table(page_number, df)
+            except FileNotFoundError:
+                raise
+            except Exception as tabula_error:
+                current_app.logger.error(f"Tabula PDF parsing error for {original_filename_secure}: {tabula_error}")
+                raise Exception(f"Could not extract tables from PDF. The PDF might not contain detectable tables or is corrupted. Error: {str(tabula_error)}")
+            with stage_timer(STAGE_OUTPUT_WRITE):
+                wrote_tables = table_writer.close()
+        except Exception:
+            table_writer.abort()
+            if os.path.exists(output_table_filepath):
+                os.remove(output_table_filepath)
+            raise
+        current_app.logger.info(f"Found {methods_used['lattice']} lattice and {methods_used['stream']} stream table(s) in {original_filename_secure}")
 
+        if not wrote_tables: # Empty tables are dropped during extraction, so no file was started
+            raise ValueError("No tables found in the PDF or tables are not in a detectable format.")
 
         response_data = {
             'success': True, 
-            'message': f"Successfully extracted tables from '{original_filename_secure}' to Excel.",
-            'download_url': f'/api/download/{output_excel_filename}', 
-            'filename': output_excel_filename
+            'message': f"Successfully extracted tables from '{original_filename_secure}' to {OUTPUT_FORMAT_LABELS[output_format]}.",
+            'download_url': f'/api/download/{output_table_filename}', 
+            'filename': output_table_filename,
+            'tableCount': table_writer.table_count,
+            'outputFormat': output_format,
+            'totalPages': num_total_pages
         }
         return response_data, 200
     finally:
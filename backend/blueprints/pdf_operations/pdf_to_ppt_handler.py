@@ -1,11 +1,12 @@
 # backend/blueprints/pdf_operations/pdf_to_ppt_handler.py
 import os
 import uuid
-import subprocess
 import shutil
 from flask import current_app
 from werkzeug.utils import secure_filename
 from .utils import check_allowed_file, create_temp_folder, save_uploaded_file
+from .output_store import output_path
+from .soffice_pool import convert_with_soffice, SofficeConversionError
 
 ALLOWED_EXTENSIONS_PDF = {'pdf'}
 
@@ -28,33 +29,18 @@ def handle_pdf_to_ppt(request_files, request_form):
         temp_input_filepath = save_uploaded_file(file_stream, request_temp_folder)
         
         output_filename_base = os.path.splitext(original_filename_secure)[0]
-        # LibreOffice will create a PPTX with the same base name in the --outdir
-        soffice_intermediate_pptx_name = f"{output_filename_base}.pptx" 
-        soffice_intermediate_pptx_path = os.path.join(request_temp_folder, soffice_intermediate_pptx_name)
-
         final_output_pptx_filename = f"{output_filename_base}_{uuid.uuid4().hex[:6]}.pptx"
-        final_output_pptx_filepath = os.path.join(current_app.config['CONVERTED_FILES_FOLDER'], final_output_pptx_filename)
-        
-        cmd = [
-            'soffice', 
-            '--headless',
-            '--infilter=impress_pdf_import', # Specific filter for PDF import to Impress
-            '--convert-to', 'pptx', # Convert to pptx format
-            '--outdir', request_temp_folder,
-            temp_input_filepath
-        ]
-        
-        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        stdout, stderr = process.communicate(timeout=120) # Timeout for potentially complex PDFs
-
-        if process.returncode != 0:
-            error_detail = stderr.decode('utf-8', errors='ignore').strip()
-            if "No such file or directory" in error_detail or "not found" in error_detail.lower() or process.returncode == 127:
-                raise FileNotFoundError("LibreOffice (soffice) command not found. Ensure it's installed and in system PATH.")
-            raise Exception(f"PDF to PPT conversion failed (LibreOffice error). Details: {error_detail or 'Unknown error'}")
+        final_output_pptx_filepath = output_path(final_output_pptx_filename)
         
-        if not os.path.exists(soffice_intermediate_pptx_path):
-            raise Exception(f"LibreOffice conversion product (PPTX) not found: {soffice_intermediate_pptx_path}. The PDF might be unsuitable for PPT conversion or an issue occurred.")
+        # LibreOffice will create a PPTX with the same base name in request_temp_folder
+        try:
+            soffice_intermediate_pptx_path = convert_with_soffice(
+                temp_input_filepath, request_temp_folder, 'pptx', 'impress',
+                import_filter='impress_pdf_import', # Specific filter for PDF import to Impress
+                timeout=120 # Timeout for potentially complex PDFs
+            )
+        except SofficeConversionError as soffice_error:
+            raise Exception(f"PDF to PPT conversion failed (LibreOffice error). Details: {soffice_error}. The PDF might be unsuitable for PPT conversion.")
         
         shutil.move(soffice_intermediate_pptx_path, final_output_pptx_filepath)
         
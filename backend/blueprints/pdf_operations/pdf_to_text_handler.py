@@ -4,78 +4,134 @@ import uuid
 import shutil
 from flask import current_app
 from werkzeug.utils import secure_filename
-from pypdf import PdfReader # Using pypdf
-from .utils import check_allowed_file, create_temp_folder, save_uploaded_file
+from .utils import check_allowed_file, open_uploaded_file, load_pdf, create_temp_folder, save_uploaded_file
+from .output_store import output_path
+from .metrics import stage_timer, STAGE_OUTPUT_WRITE
+from .text_engine import OUTPUT_FORMATS, TextOutputWriter, is_image_only, iter_page_texts, use_parallel_extraction
+from .ocr_engine import ocr_available, parse_ocr_options, iter_ocr_pages, add_text_layers, trim_ocr_cache
+from .document_store import DocumentStream
+from .search_index import SegmentBuilder, get_search_index
 
 ALLOWED_EXTENSIONS_PDF = {'pdf'}
+OCR_MODES = ('off', 'auto', 'force') # auto: OCR only documents without a text layer
+SEARCHABLE_PDF_FORMAT = 'pdf' # Output of OCR only: the original pages with an invisible text layer
 
 def handle_pdf_to_text(request_files, request_form):
     if 'files' not in request_files:
         return {'success': False, 'error': 'No file part in the request'}, 400
-    
+
     file_stream = request_files.getlist('files')[0]
     if not file_stream or not file_stream.filename:
         raise ValueError('No file selected for PDF to Text extraction.')
-    
+
     original_filename = file_stream.filename
     if not check_allowed_file(original_filename, ALLOWED_EXTENSIONS_PDF):
         raise ValueError(f"Invalid file type: {original_filename}. Only PDF files are allowed.")
 
+    output_format = request_form.get('outputFormat', 'txt').lower()
+    if output_format not in OUTPUT_FORMATS + (SEARCHABLE_PDF_FORMAT,):
+        raise ValueError(f"Invalid output format: {output_format}. Choose one of {', '.join(OUTPUT_FORMATS + (SEARCHABLE_PDF_FORMAT,))}.")
+    ocr_mode = request_form.get('ocr', 'auto').lower()
+    if ocr_mode not in OCR_MODES:
+        raise ValueError(f"Invalid OCR mode: {ocr_mode}. Choose one of {', '.join(OCR_MODES)}.")
+
     original_filename_secure = secure_filename(original_filename)
-    request_temp_folder = create_temp_folder("pdf2text_temp")
-    
+
+    reader = load_pdf(open_uploaded_file(file_stream))
+    num_total_pages = len(reader.pages)
+    if num_total_pages == 0:
+        raise ValueError("The PDF file appears to be empty or corrupted.")
+
+    # Checked from the page resources before extracting anything: scanned documents go straight to OCR
+    image_only = ocr_mode != 'force' and is_image_only(reader)
+    use_ocr = ocr_mode == 'force' or (image_only and ocr_mode == 'auto' and ocr_available())
+    if image_only and not use_ocr:
+        raise ValueError("No text layer found in the PDF. It might be an image-based PDF. OCR is required to extract text from images.")
+    if output_format == SEARCHABLE_PDF_FORMAT and not use_ocr:
+        raise ValueError("A searchable PDF is produced by OCR only. Use ocr=force, or send a scanned document.")
+    if use_ocr:
+        ocr_language, ocr_dpi = parse_ocr_options(request_form)
+
+    output_filename_base = os.path.splitext(original_filename_secure)[0]
+    output_text_filename = f"{output_filename_base}_{uuid.uuid4().hex[:6]}.{output_format}"
+    output_text_filepath = output_path(output_text_filename)
+
+    # Text extracted from a stored document also goes into the search index, at no extra extraction cost
+    search_index = get_search_index() if isinstance(file_stream.stream, DocumentStream) else None
+    if search_index is not None:
+        index_builder = SegmentBuilder()
+        index_document = index_builder.add_document(file_stream.stream.document_id, original_filename)
+
+    pages_with_text = 0
+    def record_page(page_index, text, error_message):
+        nonlocal pages_with_text
+        if error_message is not None:
+            current_app.logger.warning(f"Could not extract text from page {page_index + 1} of {original_filename_secure}: {error_message}")
+            return
+        if text.strip():
+            pages_with_text += 1
+        if search_index is not None:
+            index_builder.add_page(index_document, page_index + 1, text)
+
+    request_temp_folder = None
     try:
-        temp_input_filepath = save_uploaded_file(file_stream, request_temp_folder)
-        
-        reader = PdfReader(temp_input_filepath)
-        num_total_pages = len(reader.pages)
-        if num_total_pages == 0:
-            raise ValueError("The PDF file appears to be empty or corrupted.")
-
-        extracted_text = ""
-        for page_num in range(num_total_pages):
-            page = reader.pages[page_num]
-            try:
-                extracted_text += page.extract_text() + "\n\n--- Page Break ---\n\n"
-            except Exception as text_extract_error:
-                current_app.logger.warning(f"Could not extract text from page {page_num + 1} of {original_filename_secure}: {text_extract_error}")
-                extracted_text += f"[Error extracting text from page {page_num + 1}]\n\n--- Page Break ---\n\n"
-
-
-        if not extracted_text.strip():
-            # Check if it's an image-based PDF without OCR text layer
-            is_image_based = True
-            for page in reader.pages:
-                if page.extract_text(extraction_mode="layout").strip(): # Try layout mode for text
-                    is_image_based = False
-                    break
-                if page.images: # Check if there are images
-                    continue 
-            if is_image_based and any(page.images for page in reader.pages):
-                 raise ValueError("No text layer found in the PDF. It might be an image-based PDF. OCR is required to extract text from images.")
-            # Else, if no text and no images, it might truly be empty or have non-extractable vector text
-            current_app.logger.info(f"No text could be extracted from {original_filename_secure}.")
-            # Decide if an empty TXT for an empty PDF is desired.
-            # For now, proceed, will create an empty text file.
-
-        output_filename_base = os.path.splitext(original_filename_secure)[0]
-        output_text_filename = f"{output_filename_base}_{uuid.uuid4().hex[:6]}.txt"
-        output_text_filepath = os.path.join(current_app.config['CONVERTED_FILES_FOLDER'], output_text_filename)
-        
-        with open(output_text_filepath, "w", encoding="utf-8") as f_out:
-            f_out.write(extracted_text)
-
-        response_data = {
-            'success': True, 
-            'message': f"Successfully extracted text from '{original_filename_secure}'.",
-            'download_url': f'/api/download/{output_text_filename}', 
-            'filename': output_text_filename,
-            'totalPages': num_total_pages
-        }
-        return response_data, 200
+        temp_input_filepath = None
+        if use_ocr or use_parallel_extraction(num_total_pages):
+            # Workers open the input by path, so it is written to disk once and shared by all pages
+            request_temp_folder = create_temp_folder("pdf2text_temp")
+            temp_input_filepath = save_uploaded_file(file_stream, request_temp_folder)
+
+        if use_ocr:
+            # Text layers are pinned in the request's folder, so they outlive any trim of the OCR cache
+            pages = iter_ocr_pages(reader, temp_input_filepath, num_total_pages, ocr_language, ocr_dpi,
+                                   layer_folder=request_temp_folder if output_format == SEARCHABLE_PDF_FORMAT else None)
+        else:
+            pages = ((page_index, text, error_message, None) for page_index, text, error_message
+                     in iter_page_texts(reader, num_total_pages, temp_input_filepath))
+
+        if output_format == SEARCHABLE_PDF_FORMAT:
+            layer_paths = []
+            for page_index, text, error_message, layer_path in pages:
+                record_page(page_index, text, error_message)
+                layer_paths.append(layer_path)
+            writer = add_text_layers(reader, layer_paths)
+            with stage_timer(STAGE_OUTPUT_WRITE), open(output_text_filepath, "wb") as f_out:
+                writer.write(f_out)
+        else:
+            # Each page is written as soon as it is extracted, in page order, so the text is never held in full
+            with stage_timer(STAGE_OUTPUT_WRITE), open(output_text_filepath, "w", encoding="utf-8") as f_out:
+                text_writer = TextOutputWriter(f_out, output_format, original_filename, num_total_pages)
+                for page_index, text, error_message, _ in pages:
+                    record_page(page_index, text, error_message)
+                    text_writer.write_page(page_index, text, error_message)
+                text_writer.close()
+    except Exception:
+        if os.path.exists(output_text_filepath):
+            os.remove(output_text_filepath)
+        raise
     finally:
         if request_temp_folder and os.path.exists(request_temp_folder):
-            try:
-                shutil.rmtree(request_temp_folder)
-            except OSError as e_clean:
-                current_app.logger.error(f"Error cleaning temp folder {request_temp_folder} for pdf_to_text: {e_clean}")
\ No newline at end of file
+            shutil.rmtree(request_temp_folder, ignore_errors=True)
+    if use_ocr:
+        trim_ocr_cache() # Only now that the output is written
+
+    if search_index is not None:
+        try:
+            search_index.commit(index_builder)
+        except Exception as index_error: # The extracted text is still delivered
+            current_app.logger.error(f"Could not index {original_filename_secure}: {index_error}", exc_info=True)
+
+    if not pages_with_text:
+        # No text and no images: truly empty pages or vector text that cannot be extracted
+        current_app.logger.info(f"No text could be extracted from {original_filename_secure}.")
+
+    response_data = {
+        'success': True,
+        'message': f"Successfully extracted text from '{original_filename_secure}'" + (" with OCR." if use_ocr else "."),
+        'download_url': f'/api/download/{output_text_filename}',
+        'filename': output_text_filename,
+        'totalPages': num_total_pages,
+        'outputFormat': output_format,
+        'ocr': use_ocr
+    }
+    return response_data, 200
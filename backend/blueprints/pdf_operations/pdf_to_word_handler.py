@@ -4,8 +4,9 @@ import uuid
 import shutil
 from flask import current_app
 from werkzeug.utils import secure_filename
-from pdf2docx import Converter as ConvertDocx # Using the alias from your original code
-from .utils import check_allowed_file, create_temp_folder, save_uploaded_file
+from .utils import check_allowed_file, create_temp_folder, save_uploaded_file, parse_page_ranges, load_pdf
+from .output_store import output_path
+from .word_engine import convert_pdf_to_docx
 
 ALLOWED_EXTENSIONS_PDF = {'pdf'}
 
@@ -24,22 +25,31 @@ def handle_pdf_to_word(request_files, request_form):
 
     try:
         temp_input_filepath = save_uploaded_file(file_stream, request_temp_folder)
-        
+        num_total_pages = len(load_pdf(temp_input_filepath).pages)
+        pages_str = (request_form.get('pages') or request_form.get('pageRanges') or '').strip()
+        if pages_str and pages_str.lower() != 'all':
+            page_indices = parse_page_ranges(pages_str, num_total_pages)
+        else:
+            page_indices = list(range(num_total_pages))
+
         output_docx_filename_base = os.path.splitext(original_filename_secure)[0]
         output_docx_filename = f"{output_docx_filename_base}_{uuid.uuid4().hex[:6]}.docx"
-        output_docx_filepath = os.path.join(current_app.config['CONVERTED_FILES_FOLDER'], output_docx_filename)
+        output_docx_filepath = output_path(output_docx_filename)
 
-        cv = ConvertDocx(temp_input_filepath)
-        cv.convert(output_docx_filepath)
-        cv.close()
+        # Long documents are parsed in parallel page chunks; async jobs report per-page progress
+        convert_pdf_to_docx(temp_input_filepath, output_docx_filepath, page_indices)
         
         response_data = {
             'success': True, 
             'message': f"Successfully converted '{original_filename_secure}' to Word (DOCX).",
             'download_url': f'/api/download/{output_docx_filename}', 
-            'filename': output_docx_filename
+            'filename': output_docx_filename,
+            'pagesConverted': len(page_indices),
+            'totalPages': num_total_pages
         }
         return response_data, 200
+    except ValueError:
+        raise # Invalid page selection
     except Exception as e:
         # pdf2docx can have specific errors, try to pass them on
         error_message = f'An error occurred during PDF to Word conversion: {str(e)}.'
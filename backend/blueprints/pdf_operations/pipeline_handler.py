@@ -0,0 +1,165 @@
+# backend/blueprints/pdf_operations/pipeline_handler.py
+import os
+import json
+import uuid
+from flask import current_app
+from werkzeug.utils import secure_filename
+from pypdf import PdfWriter
+from .utils import check_allowed_file, open_uploaded_file, load_pdf
+from .output_store import output_path
+from .metrics import stage_timer, STAGE_OUTPUT_WRITE
+from .unlock_pdf_handler import decrypt_pdf
+from .delete_pages_handler import select_pages_to_delete
+from .rotate_handler import parse_rotation_angle, select_pages_to_rotate
+from .add_page_numbers_handler import parse_page_number_options, add_page_numbers_to_writer
+from .compress_handler import parse_compression_level
+from .compress_engine import recompress_images, compress_writer_streams
+
+ALLOWED_EXTENSIONS_PDF = {'pdf'}
+
+# Steps a pipeline can chain, named like their single operations and taking the same form fields
+PIPELINE_OPERATIONS = ('unlock_pdf', 'delete_pages', 'rotate', 'add_page_numbers', 'compress')
+MAX_PIPELINE_STEPS = 20
+
+
+def parse_pipeline_steps(steps_str):
+    """
+    Parses the 'steps' field: a JSON list such as
+    [{"operation": "delete_pages", "pagesToDelete": "2"}, {"operation": "rotate", "angle": 90}].
+    Options that do not depend on the document are validated here, before the upload is parsed.
+    Returns [(operation, options), ...].
+    """
+    try:
+        raw_steps = json.loads(steps_str or '')
+    except json.JSONDecodeError:
+        raise ValueError("Invalid pipeline steps. Send a JSON list of {\"operation\": ..., options...} objects.")
+    if not isinstance(raw_steps, list) or not raw_steps:
+        raise ValueError("The pipeline needs at least one step.")
+    if len(raw_steps) > MAX_PIPELINE_STEPS:
+        raise ValueError(f"Too many pipeline steps ({len(raw_steps)}). The maximum is {MAX_PIPELINE_STEPS}.")
+
+    steps = []
+    for position, raw_step in enumerate(raw_steps, start=1):
+        if not isinstance(raw_step, dict) or raw_step.get('operation') not in PIPELINE_OPERATIONS:
+            raise ValueError(f"Step {position}: operation must be one of {', '.join(PIPELINE_OPERATIONS)}.")
+        operation = raw_step['operation']
+        # Same string values the single operations receive from their forms
+        options = {key: str(value) for key, value in raw_step.items() if key != 'operation' and value is not None}
+        if operation == 'unlock_pdf' and position != 1:
+            raise ValueError("unlock_pdf can only be the first step of a pipeline.")
+        elif operation == 'rotate':
+            options['angle'] = parse_rotation_angle(options.get('angle', '90'))
+        elif operation == 'add_page_numbers':
+            options = parse_page_number_options(options)
+        elif operation == 'compress':
+            options['compressionLevel'] = parse_compression_level(options)
+        steps.append((operation, options))
+    return steps
+
+def _build_writer(pages, rotations):
+    writer = PdfWriter()
+    for page, rotation in zip(pages, rotations):
+        added_page = writer.add_page(page)
+        if rotation % 360:
+            added_page.rotate(rotation) # The writer's copy, so the (possibly cached) reader is left untouched
+    return writer
+
+def run_pipeline(reader, steps):
+    """
+    Applies the steps to one parsed document. Until a step needs a writer (page numbers, compression),
+    page deletion and rotation are only recorded against the reader's pages; the writer is built once,
+    then or at the end. The reader itself is never modified. Returns (writer, images_recompressed).
+    """
+    pages = list(reader.pages)
+    rotations = [0] * len(pages)
+    writer = None
+    pages_removed_from_writer = False
+    compressed = False
+    images_recompressed = 0
+    for operation, options in steps:
+        num_pages = len(pages) if writer is None else len(writer.pages)
+        if operation == 'unlock_pdf':
+            continue # Applied to the reader before the pages were collected
+        elif operation == 'delete_pages':
+            pages_to_delete_indices = select_pages_to_delete(options.get('pagesToDelete', ''), num_pages)
+            if writer is None:
+                pages = [page for i, page in enumerate(pages) if i not in pages_to_delete_indices]
+                rotations = [rotation for i, rotation in enumerate(rotations) if i not in pages_to_delete_indices]
+            else:
+                for i in sorted(pages_to_delete_indices, reverse=True):
+                    writer.remove_page(i)
+                pages_removed_from_writer = True
+        elif operation == 'rotate':
+            rotate_indices = select_pages_to_rotate(
+                options.get('pageSelectionMode', 'all'), options.get('pagesToRotate', ''), num_pages)
+            if writer is None:
+                for i in rotate_indices:
+                    rotations[i] += options['angle']
+            else:
+                writer_pages = list(writer.pages)
+                for i in rotate_indices:
+                    writer_pages[i].rotate(options['angle'])
+        elif operation == 'add_page_numbers':
+            writer = writer or _build_writer(pages, rotations)
+            add_page_numbers_to_writer(writer, **options)
+        elif operation == 'compress':
+            writer = writer or _build_writer(pages, rotations)
+            # The writer exists only in memory, so the images are re-encoded in this process
+            images_recompressed += recompress_images(writer, None, options['compressionLevel'])
+            compressed = True
+
+    writer = writer or _build_writer(pages, rotations)
+    if compressed:
+        compress_writer_streams(writer) # Lossless, so running it once after the last step is enough
+    elif pages_removed_from_writer:
+        writer.compress_identical_objects(remove_identicals=False, remove_orphans=True) # Drop the deleted pages' objects
+    return writer, images_recompressed
+
+def handle_pipeline(request_files, request_form):
+    if 'files' not in request_files:
+        return {'success': False, 'error': 'No file part in the request'}, 400
+
+    file_stream = request_files.getlist('files')[0]
+    if not file_stream or not file_stream.filename:
+        raise ValueError('No file selected for the pipeline.')
+
+    original_filename = file_stream.filename
+    if not check_allowed_file(original_filename, ALLOWED_EXTENSIONS_PDF):
+        raise ValueError(f"Invalid file type: {original_filename}. Only PDF files are allowed.")
+
+    steps = parse_pipeline_steps(request_form.get('steps', ''))
+    original_filename_secure = secure_filename(original_filename)
+
+    # One parse, every step applied to the same objects, one write
+    reader = load_pdf(open_uploaded_file(file_stream))
+    if steps[0][0] == 'unlock_pdf':
+        decrypt_pdf(reader, steps[0][1].get('password', ''))
+    elif reader.is_encrypted:
+        raise ValueError("The PDF is password protected. Start the pipeline with an unlock_pdf step.")
+    num_total_pages = len(reader.pages)
+    if num_total_pages == 0:
+        raise ValueError("The PDF file appears to be empty or corrupted.")
+
+    writer, images_recompressed = run_pipeline(reader, steps)
+
+    output_filename_base = os.path.splitext(original_filename_secure)[0]
+    output_pdf_filename = f"{output_filename_base}_pipeline_{uuid.uuid4().hex[:6]}.pdf"
+    output_pdf_filepath = output_path(output_pdf_filename)
+
+    with stage_timer(STAGE_OUTPUT_WRITE), open(output_pdf_filepath, "wb") as f_out:
+        writer.write(f_out)
+
+    operations = [operation for operation, _ in steps]
+    current_app.logger.info(f"Pipeline {' -> '.join(operations)} applied to '{original_filename_secure}'")
+    response_data = {
+        'success': True,
+        'message': f"Successfully applied {len(steps)} step(s): {', '.join(op.replace('_', ' ') for op in operations)}.",
+        'download_url': f'/api/download/{output_pdf_filename}',
+        'filename': output_pdf_filename,
+        'steps': operations,
+        'totalPages': num_total_pages, # Original total pages
+        'newTotalPages': len(writer.pages)
+    }
+    if 'compress' in operations:
+        response_data['images_recompressed'] = images_recompressed
+    return response_data, 200
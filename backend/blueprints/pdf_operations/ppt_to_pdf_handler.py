@@ -1,11 +1,12 @@
 # backend/blueprints/pdf_operations/ppt_to_pdf_handler.py
 import os
 import uuid
-import subprocess
 import shutil
 from flask import current_app
 from werkzeug.utils import secure_filename
 from .utils import check_allowed_file, create_temp_folder, save_uploaded_file
+from .output_store import output_path
+from .soffice_pool import convert_with_soffice, SofficeConversionError
 
 ALLOWED_EXTENSIONS_PPT = {'ppt', 'pptx'}
 
@@ -28,23 +29,13 @@ def handle_ppt_to_pdf(request_files, request_form):
         temp_input_filepath = save_uploaded_file(file_stream, request_temp_folder)
         
         output_filename_base = os.path.splitext(original_filename_secure)[0]
-        soffice_intermediate_pdf_name = f"{output_filename_base}.pdf" 
-        soffice_intermediate_pdf_path = os.path.join(request_temp_folder, soffice_intermediate_pdf_name)
         final_output_pdf_filename = f"{output_filename_base}_{uuid.uuid4().hex[:6]}.pdf"
-        final_output_pdf_filepath = os.path.join(current_app.config['CONVERTED_FILES_FOLDER'], final_output_pdf_filename)
+        final_output_pdf_filepath = output_path(final_output_pdf_filename)
         
-        cmd = ['soffice', '--headless', '--convert-to', 'pdf', '--outdir', request_temp_folder, temp_input_filepath]
-        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        stdout, stderr = process.communicate(timeout=120) # Longer timeout for PPTs
-
-        if process.returncode != 0:
-            error_detail = stderr.decode('utf-8', errors='ignore').strip()
-            if "No such file or directory" in error_detail or "not found" in error_detail.lower() or process.returncode == 127 :
-                raise FileNotFoundError("LibreOffice (soffice) command not found for PPT conversion. Ensure it's installed and in system PATH.")
-            raise Exception(f"PPT to PDF conversion failed (LibreOffice error). Details: {error_detail or 'Unknown error'}")
-        
-        if not os.path.exists(soffice_intermediate_pdf_path):
-            raise Exception(f"LibreOffice PPT conversion product not found: {soffice_intermediate_pdf_path}")
+        try:
+            soffice_intermediate_pdf_path = convert_with_soffice(temp_input_filepath, request_temp_folder, 'pdf', 'impress', timeout=120) # Longer timeout for PPTs
+        except SofficeConversionError as soffice_error:
+            raise Exception(f"PPT to PDF conversion failed (LibreOffice error). Details: {soffice_error}")
         
         shutil.move(soffice_intermediate_pdf_path, final_output_pdf_filepath)
         
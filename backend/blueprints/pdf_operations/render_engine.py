@@ -0,0 +1,76 @@
+# backend/blueprints/pdf_operations/render_engine.py
+import os
+import glob
+from concurrent.futures import ThreadPoolExecutor
+from pdf2image import convert_from_path, exceptions as pdf2image_exceptions
+from .metrics import stage_timer, STAGE_SUBPROCESS_WAIT
+
+MAX_PAGES_PER_BATCH = 16 # Upper bound of pages handed to one pdftoppm call
+
+
+def group_page_runs(page_numbers, max_run_length=MAX_PAGES_PER_BATCH):
+    """
+    Groups sorted 1-based page numbers into contiguous (first_page, last_page) batches,
+    e.g. [1, 2, 3, 7, 9, 10] -> [(1, 3), (7, 7), (9, 10)]. Long runs are cut at max_run_length
+    so the batches can be spread over several workers.
+    """
+    runs = []
+    for page_number in sorted(set(page_numbers)):
+        if runs and page_number == runs[-1][1] + 1 and runs[-1][1] - runs[-1][0] + 1 < max_run_length:
+            runs[-1][1] = page_number
+        else:
+            runs.append([page_number, page_number])
+    return [tuple(run) for run in runs]
+
+def render_page_run(pdf_path, output_folder, first_page, last_page, dpi, image_format):
+    """Renders one batch with pdftoppm straight to files; no PIL images are kept in memory."""
+    run_prefix = f"run_{first_page:06d}"
+    try:
+        convert_from_path(
+            pdf_path,
+            dpi=dpi,
+            fmt=image_format,
+            first_page=first_page,
+            last_page=last_page,
+            output_folder=output_folder,
+            output_file=run_prefix,
+            paths_only=True
+        )
+    except pdf2image_exceptions.PDFInfoNotInstalledError:
+        raise FileNotFoundError("Poppler 'pdfinfo' utility not found. Please install Poppler and add it to PATH.")
+    except pdf2image_exceptions.PDFPageCountError:
+        raise ValueError("Could not determine page count of the PDF. It might be corrupted.")
+    except pdf2image_exceptions.PDFSyntaxError:
+        raise ValueError("PDF syntax error. The PDF file is likely corrupted or malformed.")
+    except Exception as e: # Catch other pdf2image errors
+        raise Exception(f"PDF to Image conversion failed: {str(e)}")
+
+    # pdf2image appends a 4-digit counter to the prefix, and pdftoppm names files
+    # <prefix>-<zero padded page number>.<ext>, so sorting keeps page order
+    rendered_paths = sorted(glob.glob(os.path.join(output_folder, f"{run_prefix}[0-9][0-9][0-9][0-9]-*")))
+    expected_count = last_page - first_page + 1
+    if len(rendered_paths) != expected_count:
+        raise Exception(f"PDF to Image conversion produced {len(rendered_paths)} image(s) for pages {first_page}-{last_page}, expected {expected_count}.")
+    return [(first_page + offset, path) for offset, path in enumerate(rendered_paths)]
+
+def render_pages(pdf_path, page_numbers, output_folder, dpi, image_format, max_workers=1):
+    """
+    Renders only the given 1-based pages into output_folder and yields (page_number, image_path)
+    in page order. Batches run concurrently; each is a separate pdftoppm process, so threads are
+    enough to keep several cores busy. Peak memory stays at a few pages regardless of document size.
+    """
+    runs = group_page_runs(page_numbers)
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        futures = [
+            executor.submit(render_page_run, pdf_path, output_folder, first_page, last_page, dpi, image_format)
+            for first_page, last_page in runs
+        ]
+        try:
+            for future in futures:
+                with stage_timer(STAGE_SUBPROCESS_WAIT): # Only the wait in the request thread is counted
+                    rendered = future.result()
+                for page_number, image_path in rendered:
+                    yield page_number, image_path
+        finally:
+            for future in futures:
+                future.cancel()
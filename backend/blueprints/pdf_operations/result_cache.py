@@ -0,0 +1,157 @@
+# backend/blueprints/pdf_operations/result_cache.py
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from contextlib import contextmanager
+from flask import current_app
+from .upload_ingest import get_upload_sha256
+from .output_store import locate_output
+
+# Form fields that control how a request is run, not what it produces
+NON_OPTION_FORM_FIELDS = {'operation', 'async', 'documentId'} # Stored documents are keyed by their bytes like uploads
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def compute_cache_key(operation, request_files, request_form):
+    """
+    SHA-256 over the uploaded bytes and filenames (in upload order), the operation name and the
+    form options exactly as sent. Output names, messages and headers are built from the filename,
+    so the same bytes under another name must not share a result.
+    """
+    digest = hashlib.sha256()
+    digest.update(operation.encode('utf-8'))
+    for field_name, file_stream in request_files.items(multi=True):
+        digest.update(b'\x00file\x00' + field_name.encode('utf-8') + b'\x00')
+        if not file_stream:
+            continue
+        digest.update(get_upload_sha256(file_stream).encode('ascii')) # Usually computed while the upload was received
+        digest.update(b'\x00' + (file_stream.filename or '').encode('utf-8', errors='surrogatepass'))
+    # Raw values: handlers read them as sent, and ' secret' is another password than 'secret'
+    options = sorted(
+        (key, value) for key, value in request_form.items(multi=True)
+        if key not in NON_OPTION_FORM_FIELDS
+    )
+    digest.update(b'\x00options\x00' + json.dumps(options).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    Maps a cache key to the response of a previous successful run, i.e. a pointer to a file
+    already sitting in CONVERTED_FILES_FOLDER. Backed by SQLite so every Flask and job worker
+    process shares the same entries and hit/miss counters. Entries are evicted least recently
+    used first once max_entries or max_bytes (sum of the referenced outputs) is exceeded.
+    """
+
+    def __init__(self, db_path, output_folder, max_entries, max_bytes):
+        self.db_path = db_path
+        self.output_folder = output_folder
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                " cache_key TEXT PRIMARY KEY, operation TEXT, filename TEXT, size_bytes INTEGER,"
+                " response_json TEXT, created_at REAL, last_access REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_results_last_access ON results(last_access)")
+            conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            conn.execute("INSERT OR IGNORE INTO counters (name, value) VALUES ('hits', 0), ('misses', 0)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None) # Autocommit; every statement stands alone
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def _count(self, conn, name):
+        conn.execute("UPDATE counters SET value = value + 1 WHERE name = ?", (name,))
+
+    def get(self, cache_key):
+        try:
+            with self._connect() as conn:
+                row = conn.execute("SELECT filename, response_json FROM results WHERE cache_key = ?", (cache_key,)).fetchone()
+                if row is not None and locate_output(row[0], self.output_folder) is None:
+                    # The output was removed behind our back, so the pointer is stale
+                    conn.execute("DELETE FROM results WHERE cache_key = ?", (cache_key,))
+                    row = None
+                if row is None:
+                    self._count(conn, 'misses')
+                    return None
+                conn.execute("UPDATE results SET last_access = ? WHERE cache_key = ?", (time.time(), cache_key))
+                self._count(conn, 'hits')
+                return json.loads(row[1])
+        except sqlite3.Error as db_error:
+            # A cache problem must never fail the conversion itself
+            current_app.logger.warning(f"Result cache lookup failed: {db_error}")
+            return None
+
+    def put(self, cache_key, operation, response_data):
+        filename = response_data.get('filename')
+        output_path = locate_output(filename, self.output_folder)
+        if output_path is None:
+            return
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO results (cache_key, operation, filename, size_bytes, response_json, created_at, last_access)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (cache_key, operation, filename, os.path.getsize(output_path), json.dumps(response_data), now, now)
+                )
+                self._evict(conn)
+        except sqlite3.Error as db_error:
+            current_app.logger.warning(f"Result cache store failed: {db_error}")
+
+    def _evict(self, conn):
+        entry_count, total_bytes = conn.execute("SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM results").fetchone()
+        if entry_count <= self.max_entries and total_bytes <= self.max_bytes:
+            return
+        to_delete = []
+        for cache_key, size_bytes in conn.execute("SELECT cache_key, size_bytes FROM results ORDER BY last_access"):
+            if entry_count <= self.max_entries and total_bytes <= self.max_bytes:
+                break
+            to_delete.append((cache_key,))
+            entry_count -= 1
+            total_bytes -= size_bytes
+        conn.executemany("DELETE FROM results WHERE cache_key = ?", to_delete)
+
+    def stats(self):
+        with self._connect() as conn:
+            counters = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+            entry_count, total_bytes = conn.execute("SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM results").fetchone()
+        lookups = counters.get('hits', 0) + counters.get('misses', 0)
+        return {
+            'hits': counters.get('hits', 0),
+            'misses': counters.get('misses', 0),
+            'hit_ratio': round(counters.get('hits', 0) / lookups, 4) if lookups else 0,
+            'entries': entry_count,
+            'total_bytes': total_bytes,
+            'max_entries': self.max_entries,
+            'max_bytes': self.max_bytes
+        }
+
+
+def get_result_cache():
+    """Returns the cache for the current app, or None when caching is disabled."""
+    config = current_app.config
+    if not config.get('RESULT_CACHE_ENABLED'):
+        return None
+    db_path = config['RESULT_CACHE_DB']
+    with _caches_lock:
+        if db_path not in _caches:
+            _caches[db_path] = ResultCache(
+                db_path,
+                config['CONVERTED_FILES_FOLDER'],
+                max_entries=config['RESULT_CACHE_MAX_ENTRIES'],
+                max_bytes=config['RESULT_CACHE_MAX_BYTES']
+            )
+        return _caches[db_path]
@@ -0,0 +1,278 @@
+# backend/blueprints/pdf_operations/resumable_upload.py
+import os
+import re
+import time
+import uuid
+import base64
+import hashlib
+import sqlite3
+import binascii
+import threading
+from contextlib import contextmanager
+from flask import current_app
+from werkzeug.exceptions import ClientDisconnected
+from .upload_ingest import check_magic_bytes, SNIFF_BYTES, HASH_CHUNK_SIZE
+
+# tus 1.0 (https://tus.io/protocols/resumable-upload) with the creation, termination, checksum and expiration extensions
+TUS_VERSION = '1.0.0'
+TUS_EXTENSIONS = 'creation,termination,checksum,expiration'
+TUS_CHECKSUM_ALGORITHMS = ('sha256', 'sha1', 'md5')
+CHUNK_CONTENT_TYPE = 'application/offset+octet-stream'
+CHUNK_READ_SIZE = 1024 * 1024 # Bytes read from the request body at a time
+UPLOAD_CLAIM_STALE_SECONDS = 5 * 60 # A chunk claim older than this belonged to a request that died
+UPLOAD_SWEEP_INTERVAL = 60 # Seconds between opportunistic sweeps of abandoned uploads, per process
+UPLOAD_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+class ChecksumMismatch(Exception):
+    """The chunk did not match its Upload-Checksum; nothing of it was kept (tus status 460)."""
+
+
+class UploadBusy(Exception):
+    """Another request is appending to the same upload (status 423)."""
+
+
+class OffsetMismatch(Exception):
+    """Upload-Offset is not where the staged data ends (status 409)."""
+
+    def __init__(self, offset):
+        super().__init__(f"Upload-Offset does not match the current offset ({offset}). Query the offset with HEAD and resume from there.")
+        self.offset = offset
+
+
+def parse_upload_metadata(header):
+    """Upload-Metadata: comma-separated 'key base64value' pairs. Raises ValueError when malformed."""
+    metadata = {}
+    for pair in filter(None, (item.strip() for item in (header or '').split(','))):
+        key, _, encoded = pair.partition(' ')
+        try:
+            metadata[key] = base64.b64decode(encoded, validate=True).decode('utf-8') if encoded else ''
+        except (binascii.Error, UnicodeDecodeError):
+            raise ValueError(f"Invalid Upload-Metadata value for '{key}'.")
+    return metadata
+
+def parse_upload_checksum(header):
+    """Upload-Checksum: 'algorithm base64digest' -> (algorithm, digest bytes), or None when absent."""
+    if not header:
+        return None
+    algorithm, _, encoded = header.strip().partition(' ')
+    algorithm = algorithm.lower()
+    if algorithm not in TUS_CHECKSUM_ALGORITHMS:
+        raise ValueError(f"Unsupported checksum algorithm: {algorithm}. Supported: {', '.join(TUS_CHECKSUM_ALGORITHMS)}.")
+    try:
+        return algorithm, base64.b64decode(encoded, validate=True)
+    except binascii.Error:
+        raise ValueError("Invalid Upload-Checksum value. Expected '<algorithm> <base64 digest>'.")
+
+
+class ResumableUploadStore:
+    """
+    Uploads received in chunks (tus protocol). Each upload is a staging file in uploads_folder that
+    chunks are appended to; its offset lives in a SQLite index shared by all Flask processes, so a
+    client can resume against any of them. A completed upload is moved into the document store and
+    can then be used by any operation through documentId. Uploads idle for ttl_seconds are deleted.
+    """
+
+    def __init__(self, db_path, uploads_folder, ttl_seconds, max_size):
+        self.db_path = db_path
+        self.uploads_folder = uploads_folder
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._last_sweep = 0
+        os.makedirs(uploads_folder, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS uploads ("
+                " upload_id TEXT PRIMARY KEY, filename TEXT, content_type TEXT, length INTEGER, upload_offset INTEGER,"
+                " created_at REAL, last_access REAL, busy_since REAL, document_id TEXT)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_uploads_last_access ON uploads(last_access)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def _path(self, upload_id):
+        return os.path.join(self.uploads_folder, upload_id)
+
+    def create(self, length, metadata):
+        """Starts an upload of length bytes and returns its row. metadata may carry filename and filetype."""
+        if length <= 0:
+            raise ValueError("Upload-Length must be a positive number of bytes.")
+        if length > self.max_size:
+            raise ValueError(f"The upload is too large ({length} bytes). The maximum is {self.max_size} bytes.")
+        filename = metadata.get('filename') or metadata.get('name') or ''
+        if not filename:
+            raise ValueError("Upload-Metadata must include the filename, so operations can check the file type.")
+        self.sweep()
+        upload_id = uuid.uuid4().hex
+        open(self._path(upload_id), 'wb').close()
+        now = time.time()
+        upload = {
+            'upload_id': upload_id,
+            'filename': filename,
+            'content_type': metadata.get('filetype') or metadata.get('type') or 'application/octet-stream',
+            'length': length,
+            'upload_offset': 0,
+            'created_at': now,
+            'last_access': now,
+            'busy_since': None,
+            'document_id': None
+        }
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO uploads (upload_id, filename, content_type, length, upload_offset, created_at, last_access, busy_since, document_id)"
+                " VALUES (:upload_id, :filename, :content_type, :length, :upload_offset, :created_at, :last_access, :busy_since, :document_id)", upload)
+        return upload
+
+    def get(self, upload_id):
+        """The upload's row, or None for unknown, expired or malformed ids."""
+        if not UPLOAD_ID_PATTERN.match(upload_id or ''):
+            return None
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM uploads WHERE upload_id = ?", (upload_id,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def expires_at(self, upload):
+        return upload['last_access'] + self.ttl_seconds
+
+    def append(self, upload_id, offset, body, content_length, document_store, checksum=None):
+        """
+        Appends a chunk read from the file-like body at offset. With a checksum the chunk is kept only
+        if it arrived whole and matches; without one, whatever arrived before a dropped connection is
+        kept, so the client resumes from there. The chunk that completes the upload moves it into
+        document_store (the row then carries 'document'). Returns the updated row. Memory use is one
+        read buffer whatever the chunk size.
+        """
+        upload = self.get(upload_id)
+        if upload is None:
+            raise LookupError("Upload not found or expired.")
+        if upload['document_id'] is not None or offset != upload['upload_offset']:
+            raise OffsetMismatch(upload['upload_offset'])
+        if content_length is not None and offset + content_length > upload['length']:
+            raise ValueError("The chunk would extend the upload past its Upload-Length.")
+        self._claim(upload_id)
+        try:
+            upload = self.get(upload_id) # Another chunk may have landed between the checks and the claim
+            if upload['document_id'] is not None or offset != upload['upload_offset']:
+                raise OffsetMismatch(upload['upload_offset'])
+            written, complete_chunk = self._write_chunk(upload, offset, body, content_length, checksum)
+            upload['upload_offset'] = offset + written
+            with self._connect() as conn:
+                conn.execute("UPDATE uploads SET upload_offset = ?, last_access = ? WHERE upload_id = ?",
+                             (upload['upload_offset'], time.time(), upload_id))
+
+            if offset < SNIFF_BYTES and (upload['upload_offset'] >= SNIFF_BYTES or upload['upload_offset'] == upload['length']):
+                # Content is checked against the extension as soon as enough has arrived, not after gigabytes
+                with open(self._path(upload_id), 'rb') as f:
+                    reason = check_magic_bytes(f.read(SNIFF_BYTES), upload['filename'])
+                if reason:
+                    self.delete(upload_id)
+                    raise ValueError(reason)
+            if upload['upload_offset'] == upload['length']:
+                upload['document'] = self._finish(upload, document_store) # Still claimed, so only one request finishes
+        finally:
+            with self._connect() as conn:
+                conn.execute("UPDATE uploads SET busy_since = NULL WHERE upload_id = ?", (upload_id,))
+        if not complete_chunk and checksum is not None:
+            raise ChecksumMismatch("The chunk did not arrive in full, so its checksum could not be verified.")
+        return upload
+
+    def _claim(self, upload_id):
+        now = time.time()
+        with self._connect() as conn:
+            claimed = conn.execute(
+                "UPDATE uploads SET busy_since = ? WHERE upload_id = ? AND (busy_since IS NULL OR busy_since < ?)",
+                (now, upload_id, now - UPLOAD_CLAIM_STALE_SECONDS)).rowcount
+        if not claimed:
+            raise UploadBusy("Another request is writing to this upload. Retry once it has finished.")
+
+    def _write_chunk(self, upload, offset, body, content_length, checksum):
+        """Returns (bytes kept, whether the whole chunk arrived). Raises ChecksumMismatch."""
+        remaining_allowed = upload['length'] - offset
+        digest = hashlib.new(checksum[0]) if checksum is not None else None
+        written, complete = 0, True
+        with open(self._path(upload['upload_id']), 'r+b') as f:
+            f.seek(offset)
+            try:
+                while True:
+                    data = body.read(CHUNK_READ_SIZE)
+                    if not data:
+                        break
+                    if written + len(data) > remaining_allowed:
+                        f.truncate(offset)
+                        raise ValueError("The chunk would extend the upload past its Upload-Length.")
+                    f.write(data)
+                    written += len(data)
+                    if digest is not None:
+                        digest.update(data)
+            except ClientDisconnected:
+                complete = False
+            if content_length is not None and written < content_length:
+                complete = False
+            if digest is not None and (not complete or digest.digest() != checksum[1]):
+                f.truncate(offset)
+                if complete:
+                    raise ChecksumMismatch(f"The chunk does not match its {checksum[0]} checksum. It was discarded; resend it.")
+                return 0, False
+            f.truncate(offset + written)
+            f.flush()
+            os.fsync(f.fileno()) # The offset recorded next must never point past data on disk
+        return written, complete
+
+    def _finish(self, upload, document_store):
+        path = self._path(upload['upload_id'])
+        digest = hashlib.sha256() # One more pass over the file, for the result cache's content key
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+        document = document_store.add_file(path, upload['filename'], upload['content_type'], upload['length'], digest.hexdigest())
+        with self._connect() as conn:
+            conn.execute("UPDATE uploads SET document_id = ?, last_access = ? WHERE upload_id = ?",
+                         (document['document_id'], time.time(), upload['upload_id']))
+        upload['document_id'] = document['document_id']
+        return document
+
+    def delete(self, upload_id):
+        if not UPLOAD_ID_PATTERN.match(upload_id or ''):
+            return False
+        with self._connect() as conn:
+            deleted = conn.execute("DELETE FROM uploads WHERE upload_id = ?", (upload_id,)).rowcount
+        try:
+            os.remove(self._path(upload_id))
+        except FileNotFoundError:
+            pass # Already moved into the document store
+        return deleted == 1
+
+    def sweep(self):
+        """Deletes uploads idle for longer than ttl_seconds. Runs at most every UPLOAD_SWEEP_INTERVAL."""
+        now = time.time()
+        if now - self._last_sweep < UPLOAD_SWEEP_INTERVAL:
+            return 0
+        self._last_sweep = now
+        with self._connect() as conn:
+            expired = [row[0] for row in conn.execute(
+                "SELECT upload_id FROM uploads WHERE last_access < ? AND (busy_since IS NULL OR busy_since < ?)",
+                (now - self.ttl_seconds, now - UPLOAD_CLAIM_STALE_SECONDS))]
+        for upload_id in expired:
+            self.delete(upload_id)
+        return len(expired)
+
+
+def get_resumable_upload_store():
+    config = current_app.config
+    db_path = config['RESUMABLE_UPLOAD_DB']
+    with _stores_lock:
+        if db_path not in _stores:
+            _stores[db_path] = ResumableUploadStore(
+                db_path, config['RESUMABLE_UPLOADS_FOLDER'], config['RESUMABLE_UPLOAD_TTL_SECONDS'], config['RESUMABLE_UPLOAD_MAX_SIZE'])
+        return _stores[db_path]
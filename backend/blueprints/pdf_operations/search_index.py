@@ -0,0 +1,417 @@
+# backend/blueprints/pdf_operations/search_index.py
+import os
+import re
+import json
+import math
+import mmap
+import time
+import uuid
+import zlib
+import heapq
+import struct
+import sqlite3
+import threading
+from array import array
+from bisect import bisect_left
+from contextlib import contextmanager
+from flask import current_app
+
+# Segment files (immutable, memory-mapped; integers in native byte order, written and read on the same machine):
+#   header | documents (JSON list of document ids) | page table | term table | blob (compressed page texts,
+#   term strings, and per term its sorted page slots followed by the matching term frequencies, as uint32 arrays)
+SEGMENT_MAGIC = b'PDFIDX01'
+SEGMENT_HEADER = struct.Struct('<8sIIIQQQQ') # magic, documents, pages, terms, documents offset/length, page table, term table
+PAGE_ENTRY = struct.Struct('<IIQI') # document index, page number, text offset, compressed text length
+TERM_ENTRY = struct.Struct('<QIQI') # term offset, term length, postings offset, postings count
+TEXT_COMPRESSION_LEVEL = 6
+
+TOKEN_PATTERN = re.compile(r'\w+')
+MAX_TERM_LENGTH = 64 # Longer "words" (base64 blobs, hashes) are not indexed
+MAX_QUERY_TERMS = 16
+SNIPPET_CONTEXT_CHARS = 80 # Characters kept on each side of the first match
+MERGE_CLAIM_SECONDS = 60 * 60 # A merge claim older than this is assumed to belong to a dead process
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def tokenize(text):
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if len(token) <= MAX_TERM_LENGTH]
+
+
+class SegmentBuilder:
+    """
+    Collects documents page by page: each page is tokenized and its text compressed as soon as it is
+    added, so only postings and compressed text are held until write().
+    """
+
+    def __init__(self):
+        self.documents = [] # (document_id, filename)
+        self.pages = [] # (document index, page number, compressed text)
+        self.postings = {} # term -> ([page slots], [term frequencies])
+
+    def add_document(self, document_id, filename):
+        self.documents.append((document_id, filename))
+        return len(self.documents) - 1
+
+    def add_page(self, document_index, page_number, text):
+        slot = len(self.pages)
+        self.pages.append((document_index, page_number, zlib.compress(text.encode('utf-8'), TEXT_COMPRESSION_LEVEL)))
+        frequencies = {}
+        for token in tokenize(text):
+            frequencies[token] = frequencies.get(token, 0) + 1
+        for term, frequency in frequencies.items():
+            slots, counts = self.postings.setdefault(term, ([], []))
+            slots.append(slot) # Pages are added in order, so every list stays sorted
+            counts.append(frequency)
+
+    def write(self, path):
+        documents_json = json.dumps([document_id for document_id, _ in self.documents]).encode('utf-8')
+        terms = sorted((term.encode('utf-8'), term) for term in self.postings)
+        documents_offset = SEGMENT_HEADER.size
+        pages_offset = documents_offset + len(documents_json)
+        terms_offset = pages_offset + PAGE_ENTRY.size * len(self.pages)
+        blob_offset = terms_offset + TERM_ENTRY.size * len(terms)
+
+        page_table, term_table, blob = bytearray(), bytearray(), bytearray()
+        for document_index, page_number, compressed in self.pages:
+            page_table += PAGE_ENTRY.pack(document_index, page_number, blob_offset + len(blob), len(compressed))
+            blob += compressed
+        for term_bytes, term in terms:
+            term_position = blob_offset + len(blob)
+            blob += term_bytes
+            blob += b'\x00' * (-(blob_offset + len(blob)) % 4) # uint32 arrays start aligned
+            slots, counts = self.postings[term]
+            term_table += TERM_ENTRY.pack(term_position, len(term_bytes), blob_offset + len(blob), len(slots))
+            blob += array('I', slots).tobytes()
+            blob += array('I', counts).tobytes()
+
+        header = SEGMENT_HEADER.pack(SEGMENT_MAGIC, len(self.documents), len(self.pages), len(terms),
+                                     documents_offset, len(documents_json), pages_offset, terms_offset)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'wb') as f_out:
+            for part in (header, documents_json, page_table, term_table, blob):
+                f_out.write(part)
+        os.replace(temp_path, path)
+
+
+class Segment:
+    """Read-only view of a segment file. Lookups binary-search the term table inside the mapping."""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f_in:
+            self.map = mmap.mmap(f_in.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.map)
+        (magic, self.document_count, self.page_count, self.term_count,
+         documents_offset, documents_length, self.pages_offset, self.terms_offset) = SEGMENT_HEADER.unpack_from(self.map, 0)
+        if magic != SEGMENT_MAGIC:
+            raise ValueError(f"{path} is not a search index segment.")
+        self.document_ids = json.loads(bytes(self.view[documents_offset:documents_offset + documents_length]))
+
+    def _term_at(self, position):
+        term_offset, term_length, _, _ = TERM_ENTRY.unpack_from(self.map, self.terms_offset + position * TERM_ENTRY.size)
+        return self.view[term_offset:term_offset + term_length].tobytes()
+
+    def lookup(self, term):
+        """(sorted page slots, term frequencies) as uint32 views into the mapping, or None."""
+        term_bytes = term.encode('utf-8')
+        low, high = 0, self.term_count
+        while low < high:
+            middle = (low + high) // 2
+            if self._term_at(middle) < term_bytes:
+                low = middle + 1
+            else:
+                high = middle
+        if low == self.term_count or self._term_at(low) != term_bytes:
+            return None
+        _, _, postings_offset, count = TERM_ENTRY.unpack_from(self.map, self.terms_offset + low * TERM_ENTRY.size)
+        slots = self.view[postings_offset:postings_offset + 4 * count].cast('I')
+        counts = self.view[postings_offset + 4 * count:postings_offset + 8 * count].cast('I')
+        return slots, counts
+
+    def page(self, slot):
+        """(document_id, page_number, text) of a page slot."""
+        document_index, page_number, text_offset, text_length = PAGE_ENTRY.unpack_from(self.map, self.pages_offset + slot * PAGE_ENTRY.size)
+        text = zlib.decompress(self.view[text_offset:text_offset + text_length]).decode('utf-8')
+        return self.document_ids[document_index], page_number, text
+
+    def pages(self):
+        for slot in range(self.page_count):
+            yield self.page(slot)
+
+    def close(self):
+        self.view.release()
+        self.map.close()
+
+
+def make_snippet(text, terms):
+    pattern = re.compile(r'\b(' + '|'.join(re.escape(term) for term in terms) + r')\b', re.IGNORECASE)
+    match = pattern.search(text)
+    start = max(0, match.start() - SNIPPET_CONTEXT_CHARS) if match else 0
+    end = min(len(text), (match.end() if match else 0) + SNIPPET_CONTEXT_CHARS)
+    snippet = ' '.join(text[start:end].split())
+    return ('...' if start > 0 else '') + snippet + ('...' if end < len(text) else '')
+
+
+class SearchIndex:
+    """
+    Inverted index of page texts: a term maps to the pages it appears on. Every indexed batch of
+    documents becomes a new immutable segment file; the SQLite catalog (shared by all processes)
+    records which segment holds the current copy of each document, so re-indexing or deleting a
+    document never rewrites a segment. Once there are more than max_segments, the smallest ones are
+    merged into one, dropping the copies that are no longer current.
+    """
+
+    def __init__(self, index_folder, max_segments):
+        self.index_folder = index_folder
+        self.max_segments = max_segments
+        self.db_path = os.path.join(index_folder, 'catalog.sqlite3')
+        self._lock = threading.Lock()
+        self._segments = {} # segment name -> open Segment, in this process
+        self._documents = {} # document_id -> (segment name, filename), as of self._generation
+        self._generation = None
+        os.makedirs(index_folder, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS segments ("
+                " name TEXT PRIMARY KEY, pages INTEGER, size_bytes INTEGER, created_at REAL, merging_since REAL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS indexed_documents ("
+                " document_id TEXT PRIMARY KEY, segment TEXT, filename TEXT, pages INTEGER, indexed_at REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_indexed_documents_segment ON indexed_documents(segment)")
+            conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            conn.execute("INSERT OR IGNORE INTO counters (name, value) VALUES ('generation', 0)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def _path(self, segment_name):
+        return os.path.join(self.index_folder, f"{segment_name}.seg")
+
+    def commit(self, builder):
+        """Writes the builder's documents as a new segment and makes them searchable."""
+        if not builder.documents:
+            return
+        segment_name = uuid.uuid4().hex
+        builder.write(self._path(segment_name))
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("INSERT INTO segments (name, pages, size_bytes, created_at) VALUES (?, ?, ?, ?)",
+                         (segment_name, len(builder.pages), os.path.getsize(self._path(segment_name)), now))
+            page_counts = {}
+            for document_index, _, _ in builder.pages:
+                page_counts[document_index] = page_counts.get(document_index, 0) + 1
+            conn.executemany(
+                "INSERT OR REPLACE INTO indexed_documents (document_id, segment, filename, pages, indexed_at) VALUES (?, ?, ?, ?, ?)",
+                [(document_id, segment_name, filename, page_counts.get(i, 0), now) for i, (document_id, filename) in enumerate(builder.documents)])
+            self._bump_generation(conn)
+            conn.execute("COMMIT")
+        self._remove_unused_segments()
+        self._merge_if_needed()
+
+    def add_document(self, document_id, filename, page_texts):
+        """Indexes one document from (page_number, text) pairs, replacing any earlier copy of it."""
+        builder = SegmentBuilder()
+        document_index = builder.add_document(document_id, filename)
+        for page_number, text in page_texts:
+            builder.add_page(document_index, page_number, text)
+        self.commit(builder)
+
+    def is_indexed(self, document_id):
+        with self._connect() as conn:
+            return conn.execute("SELECT 1 FROM indexed_documents WHERE document_id = ?", (document_id,)).fetchone() is not None
+
+    def remove_document(self, document_id):
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            removed = conn.execute("DELETE FROM indexed_documents WHERE document_id = ?", (document_id,)).rowcount
+            if removed:
+                self._bump_generation(conn)
+            conn.execute("COMMIT")
+        if removed:
+            self._remove_unused_segments()
+        return removed == 1
+
+    def _bump_generation(self, conn):
+        conn.execute("UPDATE counters SET value = value + 1 WHERE name = 'generation'")
+
+    def _remove_unused_segments(self):
+        """Deletes segments that hold no current document and are not being merged."""
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            unused = [row[0] for row in conn.execute(
+                "SELECT name FROM segments WHERE merging_since IS NULL"
+                " AND name NOT IN (SELECT DISTINCT segment FROM indexed_documents)")]
+            conn.executemany("DELETE FROM segments WHERE name = ?", [(name,) for name in unused])
+            conn.execute("COMMIT")
+        for name in unused:
+            try:
+                os.remove(self._path(name)) # Processes that still map it keep reading the unlinked file
+            except FileNotFoundError:
+                pass
+
+    def _merge_if_needed(self):
+        """Merges the smallest segments into one until at most half of max_segments are left."""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            segments = [row[0] for row in conn.execute(
+                "SELECT name FROM segments WHERE merging_since IS NULL OR merging_since < ? ORDER BY pages",
+                (now - MERGE_CLAIM_SECONDS,))]
+            if len(segments) <= self.max_segments:
+                conn.execute("COMMIT")
+                return
+            claimed = segments[:len(segments) - self.max_segments // 2 + 1]
+            conn.executemany("UPDATE segments SET merging_since = ? WHERE name = ?", [(now, name) for name in claimed])
+            conn.execute("COMMIT")
+
+        try:
+            with self._connect() as conn:
+                placeholders = ','.join('?' * len(claimed))
+                current = {row[0]: (row[1], row[2]) for row in conn.execute(
+                    f"SELECT document_id, segment, filename FROM indexed_documents WHERE segment IN ({placeholders})", claimed)}
+            builder, document_indexes = SegmentBuilder(), {}
+            for name in claimed:
+                segment = Segment(self._path(name))
+                try:
+                    for document_id, page_number, text in segment.pages():
+                        if current.get(document_id, (None,))[0] != name:
+                            continue # Deleted, or indexed again since
+                        if document_id not in document_indexes:
+                            document_indexes[document_id] = builder.add_document(document_id, current[document_id][1])
+                        builder.add_page(document_indexes[document_id], page_number, text)
+                finally:
+                    segment.close()
+            merged_name = uuid.uuid4().hex
+            if builder.documents:
+                builder.write(self._path(merged_name))
+            with self._connect() as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                if builder.documents:
+                    conn.execute("INSERT INTO segments (name, pages, size_bytes, created_at) VALUES (?, ?, ?, ?)",
+                                 (merged_name, len(builder.pages), os.path.getsize(self._path(merged_name)), time.time()))
+                for document_id, (segment_name, _) in current.items():
+                    # Only documents still pointing at the segment that was read; the rest changed meanwhile
+                    conn.execute("UPDATE indexed_documents SET segment = ? WHERE document_id = ? AND segment = ?",
+                                 (merged_name, document_id, segment_name))
+                conn.executemany("UPDATE segments SET merging_since = NULL WHERE name = ?", [(name,) for name in claimed])
+                self._bump_generation(conn)
+                conn.execute("COMMIT")
+        except Exception:
+            with self._connect() as conn:
+                conn.executemany("UPDATE segments SET merging_since = NULL WHERE name = ?", [(name,) for name in claimed])
+            raise
+        self._remove_unused_segments()
+        current_app.logger.info(f"Search index: merged {len(claimed)} segments ({len(builder.pages)} pages kept)")
+
+    def _refresh(self):
+        """Reloads the catalog when another request or process changed it since the last search."""
+        with self._connect() as conn:
+            generation = conn.execute("SELECT value FROM counters WHERE name = 'generation'").fetchone()[0]
+            if generation == self._generation:
+                return
+            documents = {row[0]: (row[1], row[2]) for row in conn.execute(
+                "SELECT document_id, segment, filename FROM indexed_documents")}
+        live_segments = {segment_name for segment_name, _ in documents.values()}
+        for name in list(self._segments):
+            if name not in live_segments:
+                self._segments.pop(name).close()
+        for name in live_segments - set(self._segments):
+            try:
+                self._segments[name] = Segment(self._path(name))
+            except FileNotFoundError:
+                pass # Merged away after the catalog was read; the merge bumped the generation, so the next search reloads
+        self._documents, self._generation = documents, generation
+
+    def search(self, query, document_ids, limit=20, offset=0):
+        """
+        Pages of the given documents containing every term of query, best first (term frequency weighted
+        by rarity). Only the caller's own documents are searched: a documentId is all it takes to use a
+        stored document, so hits from others must never be handed out.
+        Returns (total_hits, [hit, ...]) with document id, filename, page number, score and snippet.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+        if not terms:
+            raise ValueError("The search query has no searchable words.")
+        if not document_ids:
+            raise ValueError("Give the documentId of each document to search.")
+        with self._lock:
+            self._refresh()
+            wanted_segments = {self._documents[document_id][0] for document_id in document_ids if document_id in self._documents}
+            postings_by_segment = []
+            document_frequency = dict.fromkeys(terms, 0)
+            total_pages = 0
+            for name, segment in self._segments.items():
+                total_pages += segment.page_count
+                postings = [segment.lookup(term) for term in terms]
+                for term, term_postings in zip(terms, postings):
+                    if term_postings is not None:
+                        document_frequency[term] += len(term_postings[0])
+                if name in wanted_segments and all(term_postings is not None for term_postings in postings):
+                    postings_by_segment.append((name, segment, postings))
+            weights = [math.log(1 + total_pages / max(1, document_frequency[term])) for term in terms]
+
+            scored = []
+            for name, segment, postings in postings_by_segment:
+                order = sorted(range(len(terms)), key=lambda i: len(postings[i][0]))
+                shortest_slots, shortest_counts = postings[order[0]]
+                for position, slot in enumerate(shortest_slots):
+                    score = shortest_counts[position] * weights[order[0]]
+                    for i in order[1:]:
+                        slots, counts = postings[i]
+                        found = bisect_left(slots, slot)
+                        if found == len(slots) or slots[found] != slot:
+                            break
+                        score += counts[found] * weights[i]
+                    else:
+                        scored.append((score, name, slot))
+
+            hits = []
+            for score, name, slot in scored:
+                segment = self._segments[name]
+                document_id = segment.document_ids[PAGE_ENTRY.unpack_from(segment.map, segment.pages_offset + slot * PAGE_ENTRY.size)[0]]
+                current = self._documents.get(document_id)
+                if current is None or current[0] != name:
+                    continue # Deleted or indexed again: an older copy
+                if document_id not in document_ids:
+                    continue
+                hits.append((score, name, slot))
+            total_hits = len(hits)
+            results = []
+            for score, name, slot in heapq.nlargest(offset + limit, hits)[offset:]:
+                document_id, page_number, text = self._segments[name].page(slot)
+                results.append({
+                    'documentId': document_id,
+                    'filename': self._documents[document_id][1],
+                    'page': page_number,
+                    'score': round(score, 4),
+                    'snippet': make_snippet(text, terms)
+                })
+        return total_hits, results
+
+    def stats(self):
+        with self._connect() as conn:
+            documents, pages = conn.execute("SELECT COUNT(*), COALESCE(SUM(pages), 0) FROM indexed_documents").fetchone()
+            segments, size_bytes = conn.execute("SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM segments").fetchone()
+        return {'documents': documents, 'pages': pages, 'segments': segments, 'size_bytes': size_bytes}
+
+
+def get_search_index():
+    """The process-wide SearchIndex, or None when SEARCH_INDEX_ENABLED is off."""
+    config = current_app.config
+    if not config.get('SEARCH_INDEX_ENABLED'):
+        return None
+    index_folder = config['SEARCH_INDEX_FOLDER']
+    with _indexes_lock:
+        if index_folder not in _indexes:
+            _indexes[index_folder] = SearchIndex(index_folder, config['SEARCH_INDEX_MAX_SEGMENTS'])
+        return _indexes[index_folder]
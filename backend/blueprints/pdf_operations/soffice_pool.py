@@ -0,0 +1,281 @@
+# backend/blueprints/pdf_operations/soffice_pool.py
+import os
+import time
+import queue
+import atexit
+import shutil
+import pathlib
+import threading
+import subprocess
+from flask import current_app
+from .metrics import stage_timer, STAGE_SUBPROCESS_WAIT
+
+SOFFICE_BINARY = 'soffice'
+SOFFICE_NOT_FOUND_MESSAGE = "LibreOffice (soffice) command not found. Ensure it's installed and in system PATH."
+
+# Export filter names used when talking to a running instance over UNO
+EXPORT_FILTERS = {
+    ('calc', 'pdf'): 'calc_pdf_Export',
+    ('impress', 'pdf'): 'impress_pdf_Export',
+    ('impress', 'pptx'): 'Impress MS PowerPoint 2007 XML',
+}
+
+SOFFICE_MODE_UNO = 'uno' # Warm instances driven over UNO
+SOFFICE_MODE_CLI = 'cli' # A cold `soffice --convert-to` per conversion
+CLI_FALLBACK_WARNING = ("LibreOffice UNO bindings (the 'uno' module) are not importable: every conversion will start a cold "
+                        "soffice process. Run the app with LibreOffice's Python, or install python3-uno, to use warm instances.")
+
+_pool = None
+_pool_lock = threading.Lock()
+_mode_logged = False
+
+
+class SofficeConversionError(Exception):
+    """LibreOffice ran but did not produce the requested document."""
+
+
+def _uno_available():
+    try:
+        import uno # noqa: F401 -- shipped with LibreOffice's Python bindings, not on PyPI
+        return True
+    except ImportError:
+        return False
+
+def soffice_mode():
+    return SOFFICE_MODE_UNO if _uno_available() else SOFFICE_MODE_CLI
+
+def log_soffice_mode(logger):
+    """Logs which conversion mode this process uses (once), as a warning when it is the slow per-job fallback."""
+    global _mode_logged
+    if _mode_logged:
+        return
+    _mode_logged = True
+    if soffice_mode() == SOFFICE_MODE_UNO:
+        logger.info("LibreOffice conversions use warm instances over UNO.")
+    else:
+        logger.warning(CLI_FALLBACK_WARNING)
+
+def _make_property(name, value):
+    import uno
+    prop = uno.createUnoStruct("com.sun.star.beans.PropertyValue")
+    prop.Name = name
+    prop.Value = value
+    return prop
+
+
+class SofficeInstance:
+    """One long-lived headless LibreOffice process with its own user profile, reachable over a local pipe."""
+
+    def __init__(self, index, profiles_folder):
+        self.index = index
+        self.profile_dir = os.path.join(profiles_folder, f"profile_{os.getpid()}_{index}")
+        self.pipe_name = f"pdfmaestro_{os.getpid()}_{index}"
+        self.process = None
+        self.desktop = None
+        self.jobs_done = 0
+
+    @property
+    def profile_arg(self):
+        return f"-env:UserInstallation={pathlib.Path(self.profile_dir).as_uri()}"
+
+    def is_alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def start(self, connect_timeout=60):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        cmd = [
+            SOFFICE_BINARY, '--headless', '--invisible', '--nologo', '--nodefault',
+            '--norestore', '--nolockcheck', self.profile_arg,
+            f'--accept=pipe,name={self.pipe_name};urp;StarOffice.ComponentContext'
+        ]
+        try:
+            self.process = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        except FileNotFoundError:
+            raise FileNotFoundError(SOFFICE_NOT_FOUND_MESSAGE)
+        self.jobs_done = 0
+        self.desktop = self._connect(connect_timeout)
+
+    def _connect(self, connect_timeout):
+        import uno
+        local_context = uno.getComponentContext()
+        resolver = local_context.ServiceManager.createInstanceWithContext("com.sun.star.bridge.UnoUrlResolver", local_context)
+        deadline = time.monotonic() + connect_timeout
+        while True:
+            try:
+                context = resolver.resolve(f"uno:pipe,name={self.pipe_name};urp;StarOffice.ComponentContext")
+                return context.ServiceManager.createInstanceWithContext("com.sun.star.frame.Desktop", context)
+            except Exception:
+                # NoConnectException until the instance has finished starting up
+                if not self.is_alive():
+                    raise SofficeConversionError("LibreOffice instance exited during startup.")
+                if time.monotonic() > deadline:
+                    self.stop()
+                    raise subprocess.TimeoutExpired('soffice', connect_timeout)
+                time.sleep(0.25)
+
+    def stop(self):
+        if self.desktop is not None:
+            try:
+                self.desktop.terminate()
+            except Exception:
+                pass # The bridge is often already gone when we get here
+            self.desktop = None
+        if self.process is not None:
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+            self.process = None
+
+    def restart(self):
+        self.stop()
+        self.start()
+
+    def convert(self, input_path, output_path, export_filter, import_filter=None):
+        import uno
+        load_props = [_make_property('Hidden', True)]
+        if import_filter:
+            load_props.append(_make_property('FilterName', import_filter))
+        document = self.desktop.loadComponentFromURL(uno.systemPathToFileUrl(input_path), "_blank", 0, tuple(load_props))
+        if document is None:
+            raise SofficeConversionError("LibreOffice could not open the document.")
+        try:
+            document.storeToURL(uno.systemPathToFileUrl(output_path), (_make_property('FilterName', export_filter),))
+        finally:
+            document.close(True)
+        self.jobs_done += 1
+
+
+class SofficePool:
+    """
+    Up to size warm LibreOffice instances. Each conversion borrows one instance, which is started on
+    first use and restarted after max_jobs_per_instance conversions or when it has crashed. The most
+    recently returned instance is lent first, so a process converting one document at a time keeps a
+    single instance running; more start only when conversions overlap. Without the UNO bindings the
+    pool still serialises work per profile and falls back to one `soffice --convert-to` call per job.
+    """
+
+    def __init__(self, size, profiles_folder, max_jobs_per_instance):
+        self.max_jobs_per_instance = max_jobs_per_instance
+        self.mode = soffice_mode()
+        self.size = size
+        self.instances = [SofficeInstance(i, profiles_folder) for i in range(size)]
+        self._idle = queue.LifoQueue()
+        for instance in reversed(self.instances):
+            self._idle.put(instance)
+
+    def convert(self, input_path, output_dir, convert_to, export_filter, import_filter=None, timeout=120):
+        """Converts input_path into output_dir and returns the produced file's path (same naming as soffice --convert-to)."""
+        output_path = os.path.join(output_dir, f"{os.path.splitext(os.path.basename(input_path))[0]}.{convert_to}")
+        try:
+            instance = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise subprocess.TimeoutExpired('soffice', timeout)
+
+        try:
+            if self.mode == SOFFICE_MODE_UNO:
+                self._convert_with_instance(instance, input_path, output_path, export_filter, import_filter, timeout)
+            else:
+                self._convert_with_cli(instance, input_path, output_dir, convert_to, import_filter, timeout)
+        finally:
+            self._idle.put(instance)
+
+        if not os.path.exists(output_path):
+            raise SofficeConversionError(f"LibreOffice conversion product not found: {output_path}")
+        return output_path
+
+    def _convert_with_instance(self, instance, input_path, output_path, export_filter, import_filter, timeout):
+        if not instance.is_alive() or instance.jobs_done >= self.max_jobs_per_instance:
+            instance.restart()
+
+        outcome = {}
+        def run():
+            try:
+                instance.convert(input_path, output_path, export_filter, import_filter)
+            except Exception as e:
+                outcome['error'] = e
+
+        # UNO calls cannot be given a timeout, so run them on a helper thread and kill the instance if it hangs
+        worker = threading.Thread(target=run, daemon=True)
+        worker.start()
+        worker.join(timeout)
+        if worker.is_alive():
+            instance.process.kill()
+            instance.stop()
+            raise subprocess.TimeoutExpired('soffice', timeout)
+
+        error = outcome.get('error')
+        if error is not None:
+            if not instance.is_alive() or type(error).__name__ in ('DisposedException', 'RuntimeException'):
+                instance.stop() # Crashed or bridge lost, restart on next use
+            if isinstance(error, SofficeConversionError):
+                raise error
+            raise SofficeConversionError(str(error) or type(error).__name__) from error
+
+    def _convert_with_cli(self, instance, input_path, output_dir, convert_to, import_filter, timeout):
+        os.makedirs(instance.profile_dir, exist_ok=True)
+        cmd = [SOFFICE_BINARY, '--headless', instance.profile_arg]
+        if import_filter:
+            cmd.append(f'--infilter={import_filter}')
+        cmd += ['--convert-to', convert_to, '--outdir', output_dir, input_path]
+        try:
+            process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        except FileNotFoundError:
+            raise FileNotFoundError(SOFFICE_NOT_FOUND_MESSAGE)
+        try:
+            stdout, stderr = process.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.communicate()
+            raise
+
+        if process.returncode != 0:
+            error_detail = stderr.decode('utf-8', errors='ignore').strip()
+            if "No such file or directory" in error_detail or "not found" in error_detail.lower() or process.returncode == 127:
+                raise FileNotFoundError(SOFFICE_NOT_FOUND_MESSAGE)
+            raise SofficeConversionError(error_detail or 'Unknown error')
+
+    def stats(self):
+        return {
+            'mode': self.mode,
+            'instances': self.size,
+            'idle': self._idle.qsize(),
+            'running': sum(1 for instance in self.instances if instance.is_alive())
+        }
+
+    def shutdown(self):
+        for instance in self.instances:
+            instance.stop()
+            shutil.rmtree(instance.profile_dir, ignore_errors=True)
+
+
+def get_soffice_pool():
+    """Returns this process's pool, creating it from the app config on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            config = current_app.config
+            _pool = SofficePool(
+                size=config['SOFFICE_POOL_SIZE'],
+                profiles_folder=config['SOFFICE_PROFILES_FOLDER'],
+                max_jobs_per_instance=config['SOFFICE_MAX_JOBS_PER_INSTANCE']
+            )
+            atexit.register(_pool.shutdown)
+            log_soffice_mode(current_app.logger) # Job workers never ran create_app
+        return _pool
+
+def soffice_stats():
+    """Stats of this process's pool. Asking does not create one, so processes that never convert start no LibreOffice."""
+    with _pool_lock:
+        pool = _pool
+    if pool is not None:
+        return pool.stats()
+    size = current_app.config['SOFFICE_POOL_SIZE']
+    return {'mode': soffice_mode(), 'instances': size, 'idle': size, 'running': 0}
+
+def convert_with_soffice(input_path, output_dir, convert_to, document_type, import_filter=None, timeout=120):
+    """Convenience wrapper used by the handlers. document_type is 'calc' or 'impress'."""
+    export_filter = EXPORT_FILTERS[(document_type, convert_to)]
+    with stage_timer(STAGE_SUBPROCESS_WAIT):
+        return get_soffice_pool().convert(input_path, output_dir, convert_to, export_filter, import_filter=import_filter, timeout=timeout)
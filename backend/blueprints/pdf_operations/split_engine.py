@@ -0,0 +1,37 @@
+# backend/blueprints/pdf_operations/split_engine.py
+import zipfile
+from io import BytesIO
+from pypdf import PdfWriter
+from .cpu_pool import run_sharded, shard_ranges, get_worker_reader
+
+SPLIT_SHARD_PAGES = 50 # Pages written per worker task
+SPLIT_PARALLEL_MIN_PAGES = 100 # Below this, process startup costs more than it saves
+ZIP_ENTRY_DATE = (1980, 1, 1, 0, 0, 0) # Fixed timestamps keep the archive deterministic
+
+def _write_page_shard(input_path, start, stop, arcname_template):
+    """Worker task: returns [(arcname, single_page_pdf_bytes), ...] for pages start..stop-1."""
+    reader = get_worker_reader(input_path)
+    pages = []
+    for page_index in range(start, stop):
+        writer = PdfWriter()
+        writer.add_page(reader.pages[page_index])
+        buffer = BytesIO()
+        writer.write(buffer)
+        pages.append((arcname_template.format(page=page_index + 1), buffer.getvalue()))
+    return pages
+
+def split_all_to_zip(input_path, zip_filepath, num_total_pages, output_filename_base):
+    """
+    Writes every page of input_path as its own PDF straight into zip_filepath, in page order.
+    Pages are serialised in shards across the CPU pool; nothing is staged on disk.
+    """
+    arcname_template = "page_{page}_of_" + output_filename_base.replace('{', '{{').replace('}', '}}') + ".pdf"
+    shards = [(input_path, start, stop, arcname_template) for start, stop in shard_ranges(num_total_pages, SPLIT_SHARD_PAGES)]
+    parallel = num_total_pages >= SPLIT_PARALLEL_MIN_PAGES
+
+    with zipfile.ZipFile(zip_filepath, 'w', zipfile.ZIP_DEFLATED) as zipf:
+        for pages in run_sharded(_write_page_shard, shards, parallel=parallel):
+            for arcname, pdf_bytes in pages:
+                zip_info = zipfile.ZipInfo(arcname, date_time=ZIP_ENTRY_DATE)
+                zip_info.compress_type = zipfile.ZIP_DEFLATED
+                zipf.writestr(zip_info, pdf_bytes)
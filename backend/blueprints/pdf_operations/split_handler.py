@@ -2,11 +2,13 @@
 import os
 import uuid
 import shutil
-import zipfile
 from flask import current_app
 from werkzeug.utils import secure_filename
-from pypdf import PdfReader, PdfWriter
-from .utils import check_allowed_file, parse_page_ranges, create_temp_folder, save_uploaded_file
+from pypdf import PdfWriter
+from .utils import check_allowed_file, parse_page_ranges, create_temp_folder, open_uploaded_file, save_uploaded_file, load_pdf
+from .output_store import output_path
+from .metrics import stage_timer, STAGE_OUTPUT_WRITE
+from .split_engine import split_all_to_zip
 
 ALLOWED_EXTENSIONS_PDF = {'pdf'}
 
@@ -24,8 +26,7 @@ def handle_split(request_files, request_form):
     request_temp_folder = create_temp_folder("split_temp")
 
     try:
-        temp_input_filepath = save_uploaded_file(file_stream, request_temp_folder)
-        reader = PdfReader(temp_input_filepath)
+        reader = load_pdf(open_uploaded_file(file_stream))
         num_total_pages = len(reader.pages)
         if num_total_pages == 0:
             raise ValueError("The uploaded PDF for split appears to be empty or corrupted.")
@@ -47,8 +48,8 @@ def handle_split(request_files, request_form):
             for page_index in selected_page_indices:
                 writer.add_page(reader.pages[page_index])
             output_filename = f"extracted_{output_filename_base}_{uuid.uuid4().hex[:6]}.pdf"
-            output_filepath = os.path.join(current_app.config['CONVERTED_FILES_FOLDER'], output_filename)
-            with open(output_filepath, "wb") as f_out:
+            output_filepath = output_path(output_filename)
+            with stage_timer(STAGE_OUTPUT_WRITE), open(output_filepath, "wb") as f_out:
                 writer.write(f_out)
             message_text = f"Successfully extracted {len(selected_page_indices)} page(s)."
 
@@ -57,27 +58,16 @@ def handle_split(request_files, request_form):
                 writer = PdfWriter()
                 writer.add_page(reader.pages[0])
                 output_filename = f"page_1_of_{output_filename_base}_{uuid.uuid4().hex[:6]}.pdf"
-                output_filepath = os.path.join(current_app.config['CONVERTED_FILES_FOLDER'], output_filename)
-                with open(output_filepath, "wb") as f_out:
+                output_filepath = output_path(output_filename)
+                with stage_timer(STAGE_OUTPUT_WRITE), open(output_filepath, "wb") as f_out:
                     writer.write(f_out)
                 message_text = "PDF has 1 page. Single page PDF created."
             else:
                 zip_filename = f"split_all_{output_filename_base}_{uuid.uuid4().hex[:6]}.zip"
-                zip_filepath = os.path.join(current_app.config['CONVERTED_FILES_FOLDER'], zip_filename)
-                individual_pdfs_temp_dir = os.path.join(request_temp_folder, "individual_pages")
-                os.makedirs(individual_pdfs_temp_dir, exist_ok=True)
-                
-                for i in range(num_total_pages):
-                    writer = PdfWriter()
-                    writer.add_page(reader.pages[i])
-                    page_pdf_filename = f"page_{i+1}_of_{output_filename_base}.pdf"
-                    page_pdf_filepath = os.path.join(individual_pdfs_temp_dir, page_pdf_filename)
-                    with open(page_pdf_filepath, "wb") as f_page:
-                        writer.write(f_page)
-                
-                with zipfile.ZipFile(zip_filepath, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                    for item in os.listdir(individual_pdfs_temp_dir):
-                        zipf.write(os.path.join(individual_pdfs_temp_dir, item), arcname=item)
+                zip_filepath = output_path(zip_filename)
+                # Workers open the input by path, so it is written to disk once and shared by all shards
+                temp_input_filepath = save_uploaded_file(file_stream, request_temp_folder)
+                split_all_to_zip(temp_input_filepath, zip_filepath, num_total_pages, output_filename_base)
                 output_filename = zip_filename
                 message_text = f"Successfully split into {num_total_pages} pages and zipped."
         else:
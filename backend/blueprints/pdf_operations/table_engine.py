@@ -0,0 +1,116 @@
+# backend/blueprints/pdf_operations/table_engine.py
+import io
+import zipfile
+import tabula # tabula-py
+from tabula.errors import JavaNotFoundError
+from openpyxl import Workbook
+from .cpu_pool import run_sharded, shard_ranges, cpu_pool_size
+
+TABLE_SHARD_PAGES = 10 # Pages per worker task
+TABLE_PARALLEL_MIN_PAGES = 8 # Below this, one JVM scanning the pages is faster than several starting
+JAVA_NOT_FOUND_MESSAGE = "Java runtime not found or tabula setup issue. Please ensure Java is installed and accessible."
+TABLE_OUTPUT_FORMATS = ('xlsx', 'csv', 'parquet')
+TABLE_OUTPUT_EXTENSIONS = {'xlsx': 'xlsx', 'csv': 'zip', 'parquet': 'zip'} # CSV and Parquet get one archive entry per table
+ZIP_ENTRY_DATE = (1980, 1, 1, 0, 0, 0)
+
+
+def _read_page_tables(input_path, page_number, lattice, java_options):
+    # With JPype1 installed, tabula-py runs tabula-java inside this process's JVM, started on the first
+    # call and reused by every later one; without it, each call is a separate java subprocess.
+    return tabula.read_pdf(
+        input_path, pages=page_number, multiple_tables=True, lattice=lattice, stream=not lattice,
+        java_options=java_options, silent=True
+    )
+
+def is_empty_table(df):
+    """True for tables with no cells, or whose every cell is blank (tabula returns those for ruling lines)."""
+    return df.empty or df.dropna(how='all').empty
+
+def extract_page_tables(input_path, page_number, java_options=None):
+    """
+    Tables on one page: lattice mode (ruled tables) first, stream mode (whitespace-aligned columns)
+    only when lattice finds nothing on this page. Returns (method, [non-empty DataFrames]);
+    empty tables are dropped here, before anything is written.
+    """
+    try:
+        tables = [df for df in _read_page_tables(input_path, page_number, True, java_options) if not is_empty_table(df)]
+        if tables:
+            return 'lattice', tables
+        return 'stream', [df for df in _read_page_tables(input_path, page_number, False, java_options) if not is_empty_table(df)]
+    except JavaNotFoundError:
+        raise FileNotFoundError(JAVA_NOT_FOUND_MESSAGE)
+
+def _extract_tables_shard(input_path, page_numbers, java_options):
+    """Worker task: [(page_number, method, tables), ...] for a run of pages, on the worker's warm JVM."""
+    return [(page_number, *extract_page_tables(input_path, page_number, java_options)) for page_number in page_numbers]
+
+def iter_page_tables(input_path, page_numbers, java_options=None):
+    """
+    Yields (page_number, method, tables) for the given 1-based pages, in order. Long selections are
+    split into chunks extracted in parallel on the CPU pool; each pool process keeps its own JVM.
+    """
+    parallel = len(page_numbers) >= TABLE_PARALLEL_MIN_PAGES and cpu_pool_size() > 1
+    shards = [(input_path, page_numbers[start:stop], java_options)
+              for start, stop in shard_ranges(len(page_numbers), TABLE_SHARD_PAGES)]
+    for results in run_sharded(_extract_tables_shard, shards, parallel=parallel):
+        yield from results
+
+class TableOutputWriter:
+    """
+    Writes tables to output_filepath as they are extracted, so a workbook never sits in memory whole:
+    xlsx through openpyxl's write-only mode (rows go straight to the sheet's temporary file), csv and
+    parquet as one archive entry per table. Nothing is created until the first table arrives.
+    """
+
+    def __init__(self, output_filepath, output_format):
+        self.output_filepath = output_filepath
+        self.output_format = output_format
+        self.table_count = 0
+        self._target = None
+
+    def _open(self):
+        if self.output_format == 'xlsx':
+            self._target = Workbook(write_only=True)
+        else:
+            self._target = zipfile.ZipFile(self.output_filepath, 'w', zipfile.ZIP_DEFLATED)
+
+    def write_table(self, page_number, df):
+        if self._target is None:
+            self._open()
+        self.table_count += 1
+        name = f"Table_{self.table_count}"
+        if self.output_format == 'xlsx':
+            sheet = self._target.create_sheet(title=name)
+            sheet.append([str(column) for column in df.columns])
+            for row in df.astype(object).where(df.notna(), None).itertuples(index=False, name=None):
+                sheet.append(row)
+            return
+        zip_info = zipfile.ZipInfo(f"{name}_page_{page_number}.{self.output_format}", date_time=ZIP_ENTRY_DATE)
+        zip_info.compress_type = zipfile.ZIP_DEFLATED
+        if self.output_format == 'csv':
+            with self._target.open(zip_info, 'w') as entry, io.TextIOWrapper(entry, encoding='utf-8', newline='') as text_entry:
+                df.to_csv(text_entry, index=False)
+            return
+        # Parquet needs string column names, and mixed-type text columns are stored as strings. The writer
+        # seeks, which archive entries cannot, so each table is serialised in memory first.
+        frame = df.rename(columns=str)
+        frame = frame.astype({column: 'string' for column in frame.columns if frame[column].dtype == object})
+        buffer = io.BytesIO()
+        frame.to_parquet(buffer, index=False)
+        self._target.writestr(zip_info, buffer.getvalue())
+
+    def close(self):
+        """Finishes the file; returns False when no table was written (and so no file exists)."""
+        if self._target is None:
+            return False
+        if self.output_format == 'xlsx':
+            self._target.save(self.output_filepath)
+        else:
+            self._target.close()
+        return True
+
+    def abort(self):
+        """Releases an unfinished output; the caller removes the file."""
+        if self.output_format != 'xlsx' and self._target is not None:
+            self._target.close()
+        self._target = None
@@ -0,0 +1,118 @@
+# backend/blueprints/pdf_operations/text_engine.py
+import json
+from .cpu_pool import run_sharded, shard_ranges, cpu_pool_size, get_worker_reader
+
+TEXT_SHARD_PAGES = 25 # Pages extracted per worker task
+TEXT_PARALLEL_MIN_PAGES = 50 # Below this, process startup costs more than it saves
+MAX_FORM_DEPTH = 5 # Nesting of form XObjects followed when looking for fonts and images
+PAGE_SEPARATOR = "\n\n--- Page Break ---\n\n"
+
+OUTPUT_FORMATS = ('txt', 'json', 'ndjson')
+
+
+def _resource_kinds(resources, seen, depth=0):
+    """(has_fonts, has_images) for a resource dictionary, looking inside form XObjects."""
+    key = id(resources)
+    if key in seen:
+        return seen[key]
+    has_fonts, has_images = bool(resources.get('/Font')), False
+    xobjects = resources.get('/XObject')
+    if xobjects:
+        for reference in xobjects.get_object().values():
+            xobject = reference.get_object()
+            subtype = xobject.get('/Subtype')
+            if subtype == '/Image':
+                has_images = True
+            elif subtype == '/Form' and depth < MAX_FORM_DEPTH and '/Resources' in xobject:
+                form_fonts, form_images = _resource_kinds(xobject['/Resources'].get_object(), seen, depth + 1)
+                has_fonts, has_images = has_fonts or form_fonts, has_images or form_images
+            if has_fonts and has_images:
+                break
+    seen[key] = (has_fonts, has_images)
+    return seen[key]
+
+def is_image_only(reader):
+    """
+    Cheap pre-pass run before any extraction: True when no page uses a font (so there is no text
+    layer to extract) but some page shows an image. Only resource dictionaries are read; no content
+    stream is parsed. Resources shared between pages are looked at once.
+    """
+    seen, found_images = {}, False
+    for page in reader.pages:
+        resources = page.get('/Resources')
+        if not resources:
+            continue
+        has_fonts, has_images = _resource_kinds(resources.get_object(), seen)
+        if has_fonts:
+            return False
+        found_images = found_images or has_images
+    return found_images
+
+def _extract_pages(reader, start, stop):
+    """[(page_index, text, error_message), ...] for pages start..stop-1."""
+    results = []
+    for page_index in range(start, stop):
+        try:
+            results.append((page_index, reader.pages[page_index].extract_text(), None))
+        except Exception as text_extract_error:
+            results.append((page_index, f"[Error extracting text from page {page_index + 1}]", str(text_extract_error)))
+    return results
+
+def _extract_text_shard(input_path, start, stop):
+    """Worker task: _extract_pages on the worker's own parse of input_path."""
+    return _extract_pages(get_worker_reader(input_path), start, stop)
+
+def use_parallel_extraction(num_pages):
+    return num_pages >= TEXT_PARALLEL_MIN_PAGES and cpu_pool_size() > 1
+
+def iter_page_texts(reader, num_pages, input_path=None):
+    """
+    Yields (page_index, text, error_message) for every page, in page order. With input_path (the
+    document saved on disk) the pages are sharded across the CPU pool, and results stream back in
+    order while later shards are still being extracted. Without it, pages are extracted here.
+    """
+    if input_path is None:
+        for page_index in range(num_pages):
+            yield from _extract_pages(reader, page_index, page_index + 1)
+        return
+    shards = [(input_path, start, stop) for start, stop in shard_ranges(num_pages, TEXT_SHARD_PAGES)]
+    for results in run_sharded(_extract_text_shard, shards, parallel=True):
+        yield from results
+
+class TextOutputWriter:
+    """
+    Writes page texts to an open text file as they arrive: plain text with page breaks, a JSON
+    document or one JSON object per line (NDJSON). JSON entries carry the page's character offsets
+    in the plain-text layout, so clients can map search hits back to pages.
+    """
+
+    def __init__(self, f_out, output_format, source_filename, num_pages):
+        self.f_out = f_out
+        self.output_format = output_format
+        self.offset = 0
+        self._first_entry = True
+        if output_format == 'json':
+            header = json.dumps({'filename': source_filename, 'totalPages': num_pages}, ensure_ascii=False)
+            f_out.write(header[:-1] + ', "pages": [\n') # Pages are streamed into the still open object
+
+    def write_page(self, page_index, text, error_message):
+        start, end = self.offset, self.offset + len(text)
+        self.offset = end + len(PAGE_SEPARATOR)
+
+        if self.output_format == 'txt':
+            self.f_out.write(text)
+            self.f_out.write(PAGE_SEPARATOR)
+            return
+        entry = {'page': page_index + 1, 'start': start, 'end': end, 'text': text}
+        if error_message is not None:
+            entry['error'] = error_message
+        line = json.dumps(entry, ensure_ascii=False)
+        if self.output_format == 'json':
+            self.f_out.write(line if self._first_entry else ',\n' + line)
+        else:
+            self.f_out.write(line + '\n')
+        self._first_entry = False
+
+    def close(self):
+        if self.output_format == 'json':
+            self.f_out.write('\n]}\n')
@@ -0,0 +1,173 @@
+# backend/blueprints/pdf_operations/text_pdf_engine.py
+import re
+import zlib
+import codecs
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from pypdf.generic import ArrayObject, DictionaryObject, FloatObject, NameObject, NumberObject
+from .pdf_stream_writer import StreamingPdfWriter
+from .utils import PAGE_SIZES
+
+ENCODING_SNIFF_BYTES = 64 * 1024 # Prefix read to choose the encoding
+TEXT_READ_CHUNK = 1024 * 1024 # Characters read at a time while laying out pages
+MAX_LINE_CHARS = 1024 * 1024 # Longer lines (no newline in sight) are broken here to keep memory bounded
+TAB_SIZE = 8
+LAYOUTS = ('auto', 'proportional', 'monospace')
+LOG_EXTENSIONS = {'log'}
+LOG_LINE_PATTERN = re.compile(r'^\s*\[?(\d{4}-\d{2}-\d{2}|\d{2}:\d{2}:\d{2}|[A-Z][a-z]{2} [ \d]\d \d{2}:\d{2})') # ISO dates, times, syslog
+LOG_LINE_SHARE = 0.5 # Share of timestamped lines in the prefix that makes auto pick monospace
+
+# Layout parameters, in points. Proportional keeps the look of the former fpdf2 output (Helvetica 12
+# on 10 mm lines); monospace fits far more of a log file on a page and needs no per-word measuring.
+PAGE_MARGIN = 28.35 # 10 mm
+LAYOUT_FONTS = {
+    'proportional': {'font': 'Helvetica', 'size': 12, 'leading': 28.35},
+    'monospace': {'font': 'Courier', 'size': 9, 'leading': 10.8},
+}
+# The standard 14 PDF fonts are not embedded; text is written in their WinAnsi (cp1252) encoding
+PDF_TEXT_ENCODING = 'cp1252'
+CP1252_UNDEFINED = {0x81, 0x8D, 0x8F, 0x90, 0x9D}
+
+
+def sniff_text_encoding(path):
+    """
+    Picks the encoding from the first ENCODING_SNIFF_BYTES of the file, instead of decoding the whole
+    file once per candidate: a byte order mark, else UTF-8 if the prefix is valid UTF-8 (a sequence
+    cut by the prefix's end is allowed), else windows-1252, else latin-1 (which accepts any byte).
+    Returns (encoding, prefix_text).
+    """
+    with open(path, 'rb') as f:
+        prefix = f.read(ENCODING_SNIFF_BYTES)
+    for bom, encoding in ((codecs.BOM_UTF8, 'utf-8-sig'), (codecs.BOM_UTF16_LE, 'utf-16'), (codecs.BOM_UTF16_BE, 'utf-16')):
+        if prefix.startswith(bom):
+            return encoding, codecs.getincrementaldecoder(encoding)(errors='replace').decode(prefix)
+    try:
+        return 'utf-8', codecs.getincrementaldecoder('utf-8')().decode(prefix, final=False)
+    except UnicodeDecodeError:
+        pass
+    if not CP1252_UNDEFINED.intersection(prefix):
+        return 'windows-1252', prefix.decode('windows-1252')
+    return 'latin-1', prefix.decode('latin-1')
+
+def choose_layout(layout, extension, prefix_text):
+    """'monospace' or 'proportional'. auto picks monospace for .log files and text that reads like a log."""
+    if layout != 'auto':
+        return layout
+    if extension in LOG_EXTENSIONS:
+        return 'monospace'
+    lines = [line for line in prefix_text.splitlines()[:-1] if line.strip()] # The last line may be cut off
+    if lines and sum(1 for line in lines if LOG_LINE_PATTERN.match(line)) >= len(lines) * LOG_LINE_SHARE:
+        return 'monospace'
+    return 'proportional'
+
+def iter_text_lines(f_in):
+    """Lines of a text file opened with universal newlines (without the line breaks), read in bounded chunks."""
+    remainder = ''
+    while True:
+        chunk = f_in.read(TEXT_READ_CHUNK)
+        if not chunk:
+            break
+        lines = (remainder + chunk).split('\n')
+        remainder = lines.pop()
+        yield from lines
+        while len(remainder) > MAX_LINE_CHARS:
+            yield remainder[:MAX_LINE_CHARS]
+            remainder = remainder[MAX_LINE_CHARS:]
+    if remainder:
+        yield remainder
+
+def _wrap_monospace(line, max_chars):
+    # Hard wrap at the column limit; log lines keep their spacing
+    if not line:
+        yield ''
+        return
+    for start in range(0, len(line), max_chars):
+        yield line[start:start + max_chars]
+
+def _wrap_proportional(line, max_width, char_width):
+    # Greedy word wrap like fpdf2's multi_cell: break at spaces, split words wider than the line
+    line_width, current = 0.0, []
+    for word in line.split(' '):
+        word_width = sum(char_width(ch) for ch in word)
+        space_width = char_width(' ') if current else 0.0
+        if current and line_width + space_width + word_width > max_width:
+            yield ''.join(current)
+            line_width, current, space_width = 0.0, [], 0.0
+        if word_width > max_width:
+            for ch in word:
+                width = char_width(ch)
+                if current and line_width + width > max_width:
+                    yield ''.join(current)
+                    line_width, current = 0.0, []
+                current.append(ch)
+                line_width += width
+            continue
+        if space_width:
+            current.append(' ')
+        current.append(word)
+        line_width += space_width + word_width
+    yield ''.join(current)
+
+def _pdf_string(text):
+    # U+FFFD stands for input bytes that did not fit the sniffed encoding; anything else the fonts cannot show is an error
+    try:
+        data = text.replace('\ufffd', '?').encode(PDF_TEXT_ENCODING)
+    except UnicodeEncodeError as e:
+        character = e.object[e.start]
+        raise ValueError(f"The text contains characters the built-in PDF fonts cannot show, such as '{character}' (U+{ord(character):04X}). "
+                         f"Only Western European (Windows-1252) text is supported.") from e
+    return b'(' + data.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)').replace(b'\r', b'\\r') + b')'
+
+def write_text_pdf(f_in, f_out, layout):
+    """
+    Lays out the text from the open file f_in onto pages written to f_out one at a time, so memory
+    stays flat whatever the input size. Returns the page count.
+    """
+    font = LAYOUT_FONTS[layout]
+    page_width, page_height = PAGE_SIZES['A4']
+    max_width = page_width - 2 * PAGE_MARGIN
+    lines_per_page = max(1, int((page_height - 2 * PAGE_MARGIN) // font['leading']))
+    first_baseline = page_height - PAGE_MARGIN - font['leading'] + (font['leading'] - font['size']) / 2 + font['size'] * 0.2
+
+    widths = {}
+    def char_width(ch):
+        width = widths.get(ch)
+        if width is None:
+            glyph = ch.encode(PDF_TEXT_ENCODING, errors='replace').decode(PDF_TEXT_ENCODING)
+            width = widths[ch] = stringWidth(glyph, font['font'], font['size'])
+        return width
+    if layout == 'monospace':
+        max_chars = max(1, int(max_width // char_width(' ')))
+        wrap = lambda line: _wrap_monospace(line, max_chars)
+    else:
+        wrap = lambda line: _wrap_proportional(line, max_width, char_width)
+
+    writer = StreamingPdfWriter(f_out)
+    font_id = writer.allocate()
+    writer.write_dictionary(font_id, {
+        '/Type': NameObject('/Font'),
+        '/Subtype': NameObject('/Type1'),
+        '/BaseFont': NameObject('/' + font['font']),
+        '/Encoding': NameObject('/WinAnsiEncoding'),
+    })
+    page_entries = {
+        '/MediaBox': ArrayObject([NumberObject(0), NumberObject(0), FloatObject(page_width), FloatObject(page_height)]),
+        '/Resources': DictionaryObject({NameObject('/Font'): DictionaryObject({NameObject('/F1'): writer.reference(font_id)})}),
+    }
+    page_header = f"BT /F1 {font['size']} Tf {font['leading']:.2f} TL {PAGE_MARGIN:.2f} {first_baseline:.2f} Td\n".encode('ascii')
+
+    def write_page(page_lines):
+        content = page_header + b''.join(_pdf_string(line) + b" Tj T*\n" for line in page_lines) + b"ET"
+        content_id = writer.write_stream({'/Filter': NameObject('/FlateDecode')}, zlib.compress(content))
+        writer.add_page(dict(page_entries, **{'/Contents': writer.reference(content_id)}))
+
+    page_lines = []
+    for line in iter_text_lines(f_in):
+        for wrapped in wrap(line.expandtabs(TAB_SIZE)):
+            page_lines.append(wrapped)
+            if len(page_lines) == lines_per_page:
+                write_page(page_lines)
+                page_lines = []
+    if page_lines or not writer.page_ids: # An empty file still gives one (empty) page
+        write_page(page_lines)
+    writer.finish()
+    return len(writer.page_ids)
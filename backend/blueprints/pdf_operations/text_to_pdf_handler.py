@@ -4,10 +4,12 @@ import uuid
 import shutil
 from flask import current_app
 from werkzeug.utils import secure_filename
-from fpdf import FPDF # Using fpdf2
 from .utils import check_allowed_file, create_temp_folder, save_uploaded_file
+from .output_store import output_path
+from .metrics import stage_timer, STAGE_OUTPUT_WRITE
+from .text_pdf_engine import LAYOUTS, sniff_text_encoding, choose_layout, write_text_pdf
 
-ALLOWED_EXTENSIONS_TEXT = {'txt', 'text', 'md', 'rtf'} # Added md, rtf as common text formats
+ALLOWED_EXTENSIONS_TEXT = {'txt', 'text', 'md', 'rtf', 'log'} # Added md, rtf as common text formats, log for log exports
 
 def handle_text_to_pdf(request_files, request_form):
     if 'files' not in request_files:
@@ -20,6 +22,9 @@ def handle_text_to_pdf(request_files, request_form):
     original_filename = file_stream.filename
     if not check_allowed_file(original_filename, ALLOWED_EXTENSIONS_TEXT):
         raise ValueError(f"Invalid file type: {original_filename}. Supported: {', '.join(ALLOWED_EXTENSIONS_TEXT)}")
+    layout = request_form.get('layout', 'auto').lower()
+    if layout not in LAYOUTS:
+        raise ValueError(f"Invalid layout: {layout}. Choose one of {', '.join(LAYOUTS)}.")
 
     original_filename_secure = secure_filename(original_filename)
     request_temp_folder = create_temp_folder("text2pdf_temp")
@@ -27,53 +32,35 @@ def handle_text_to_pdf(request_files, request_form):
     try:
         temp_input_filepath = save_uploaded_file(file_stream, request_temp_folder)
         
-        # Read the text content
-        # Try common encodings; utf-8 is usually a good default
-        text_content = ""
-        encodings_to_try = ['utf-8', 'latin-1', 'windows-1252']
-        for encoding in encodings_to_try:
-            try:
-                with open(temp_input_filepath, "r", encoding=encoding) as f:
-                    text_content = f.read()
-                break # Successfully read
-            except UnicodeDecodeError:
-                current_app.logger.warning(f"Failed to decode {original_filename_secure} with {encoding}")
-                continue
-        
-        if not text_content and os.path.getsize(temp_input_filepath) > 0: # If content is empty but file wasn't, means all decodes failed
-             raise ValueError("Could not decode the text file. It might be in an unsupported encoding or not a plain text file.")
-        elif not text_content and os.path.getsize(temp_input_filepath) == 0:
-             current_app.logger.info(f"Input text file {original_filename_secure} is empty.")
-             # Decide if an empty PDF for an empty TXT is desired or an error
-             # For now, let's proceed and it will create a PDF with no text content.
-
-        pdf = FPDF()
-        pdf.add_page()
-        
-        # Add a Unicode font that supports a wide range of characters
-        # DejaVu is a good choice if available or bundled.
-        # fpdf2 comes with some core fonts. For broader Unicode, you might need to add a .ttf font file.
-        # Let's try 'Arial' which is a standard one, and then set a common size.
-        try:
-            pdf.set_font("Arial", size=12)
-        except RuntimeError: # Font not found, fallback or error
-            current_app.logger.warning("Arial font not found by FPDF, trying helvetica.")
-            pdf.set_font("Helvetica", size=12) # Helvetica is a core PDF font
-
-        # Add text to PDF. MultiCell handles line breaks.
-        pdf.multi_cell(0, 10, text_content) # width=0 (to page width), height of lines=10
+        # The encoding is chosen from a bounded prefix; the file is then read once, in chunks, while pages
+        # are written. Bytes that turn out not to fit the encoding further in are replaced, not retried.
+        encoding, prefix_text = sniff_text_encoding(temp_input_filepath)
+        if os.path.getsize(temp_input_filepath) == 0:
+            current_app.logger.info(f"Input text file {original_filename_secure} is empty.") # Gives a PDF with one empty page
+        used_layout = choose_layout(layout, original_filename.rsplit('.', 1)[1].lower(), prefix_text)
 
         output_filename_base = os.path.splitext(original_filename_secure)[0]
         output_pdf_filename = f"{output_filename_base}_{uuid.uuid4().hex[:6]}.pdf"
-        output_pdf_filepath = os.path.join(current_app.config['CONVERTED_FILES_FOLDER'], output_pdf_filename)
-        
-        pdf.output(output_pdf_filepath, "F")
+        output_pdf_filepath = output_path(output_pdf_filename)
+
+        try:
+            with stage_timer(STAGE_OUTPUT_WRITE), \
+                    open(temp_input_filepath, 'r', encoding=encoding, errors='replace') as f_in, \
+                    open(output_pdf_filepath, 'wb') as f_out:
+                page_count = write_text_pdf(f_in, f_out, used_layout)
+        except Exception:
+            if os.path.exists(output_pdf_filepath):
+                os.remove(output_pdf_filepath)
+            raise
 
         response_data = {
             'success': True, 
             'message': f"Successfully converted '{original_filename_secure}' to PDF.",
             'download_url': f'/api/download/{output_pdf_filename}', 
-            'filename': output_pdf_filename
+            'filename': output_pdf_filename,
+            'pageCount': page_count,
+            'encoding': encoding,
+            'layout': used_layout
         }
         return response_data, 200
     finally:
@@ -0,0 +1,171 @@
+# backend/blueprints/pdf_operations/upload_ingest.py
+import hashlib
+import tempfile
+from flask import Request, current_app
+
+SNIFF_BYTES = 1024 # '%PDF-' may legally appear anywhere in the first 1024 bytes
+HASH_CHUNK_SIZE = 1024 * 1024
+
+ZIP_SIGNATURE = b'PK\x03\x04' # docx / xlsx / pptx containers
+OLE_SIGNATURE = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1' # legacy doc / xls / ppt
+
+# Extension -> list of leading byte signatures. Extensions not listed here (txt, html, md...)
+# have no reliable signature and are accepted as-is.
+MAGIC_SIGNATURES = {
+    'docx': [ZIP_SIGNATURE], 'xlsx': [ZIP_SIGNATURE], 'pptx': [ZIP_SIGNATURE],
+    'doc': [OLE_SIGNATURE], 'xls': [OLE_SIGNATURE], 'ppt': [OLE_SIGNATURE],
+    'png': [b'\x89PNG\r\n\x1a\n'],
+    'jpg': [b'\xff\xd8\xff'], 'jpeg': [b'\xff\xd8\xff'],
+    'gif': [b'GIF87a', b'GIF89a'],
+    'bmp': [b'BM'],
+    'tiff': [b'II*\x00', b'MM\x00*'],
+    'rtf': [b'{\\rtf'],
+}
+
+
+def _extension_of(filename):
+    return filename.rsplit('.', 1)[1].lower() if filename and '.' in filename else ''
+
+def check_magic_bytes(head, filename):
+    """Returns an error message when the leading bytes do not match the file's extension, else None."""
+    extension = _extension_of(filename)
+    if extension == 'pdf':
+        matches = b'%PDF-' in head[:SNIFF_BYTES]
+    elif extension == 'webp':
+        matches = head[:4] == b'RIFF' and head[8:12] == b'WEBP'
+    elif extension in MAGIC_SIGNATURES:
+        matches = any(head.startswith(signature) for signature in MAGIC_SIGNATURES[extension])
+    else:
+        return None
+    if matches:
+        return None
+    if not head:
+        return f"The uploaded file '{filename}' is empty."
+    return f"The uploaded file '{filename}' is not a valid {extension.upper()} file (its content does not match the extension)."
+
+
+class IngestStream:
+    """
+    Upload container handed to Werkzeug's multipart parser. It hashes and counts bytes as they
+    arrive, sniffs the first SNIFF_BYTES against the filename's extension, and spools the body:
+    small uploads stay in memory, larger ones roll over to a temp file in UPLOAD_FOLDER.
+    Once an upload is rejected the remaining bytes are discarded instead of written anywhere.
+    """
+
+    def __init__(self, filename, spool_dir, spool_max_size):
+        self.filename = filename or ''
+        self.size = 0
+        self.rejected_reason = None
+        self._spool = tempfile.SpooledTemporaryFile(max_size=spool_max_size, dir=spool_dir)
+        self._digest = hashlib.sha256()
+        self._head = bytearray()
+        self._sniffed = False
+
+    def write(self, data):
+        self.size += len(data)
+        if self.rejected_reason is not None:
+            return len(data)
+        self._digest.update(data)
+        if self._sniffed:
+            return self._spool.write(data)
+        self._head += data
+        if len(self._head) >= SNIFF_BYTES:
+            self._finish_sniff()
+        return len(data)
+
+    def _finish_sniff(self):
+        if self._sniffed:
+            return
+        self._sniffed = True
+        head, self._head = bytes(self._head), bytearray()
+        self.rejected_reason = check_magic_bytes(head, self.filename)
+        if self.rejected_reason is None:
+            self._spool.write(head)
+
+    @property
+    def sha256(self):
+        return self._digest.hexdigest()
+
+    def read(self, size=-1):
+        self._finish_sniff()
+        return self._spool.read(size)
+
+    def readline(self, size=-1):
+        self._finish_sniff()
+        return self._spool.readline(size)
+
+    def seek(self, offset, whence=0):
+        self._finish_sniff() # Werkzeug seeks to 0 once the part is complete
+        return self._spool.seek(offset, whence)
+
+    def tell(self):
+        return self._spool.tell()
+
+    def flush(self):
+        return self._spool.flush()
+
+    def close(self):
+        return self._spool.close()
+
+    @property
+    def closed(self):
+        return self._spool.closed
+
+    def readable(self):
+        return True
+
+    def writable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def __iter__(self):
+        self._finish_sniff()
+        return iter(self._spool)
+
+
+class IngestRequest(Request):
+    """Request class that routes every uploaded file through an IngestStream."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        config = current_app.config
+        return IngestStream(filename, config['UPLOAD_FOLDER'], config['UPLOAD_SPOOL_MAX_SIZE'])
+
+
+def verify_upload(file_stream):
+    """
+    Raises ValueError if the upload's content does not match its extension.
+    Uploads that did not come through IngestRequest (e.g. rebuilt by a job worker) are sniffed here.
+    """
+    stream = file_stream.stream
+    if isinstance(stream, IngestStream):
+        reason = stream.rejected_reason
+    else:
+        stream.seek(0)
+        reason = check_magic_bytes(stream.read(SNIFF_BYTES), file_stream.filename)
+        stream.seek(0)
+    if reason:
+        raise ValueError(reason)
+
+def get_upload_sha256(file_stream):
+    """SHA-256 of the upload, reusing the digest computed while it was received when available."""
+    stream = file_stream.stream
+    if isinstance(stream, IngestStream) or getattr(stream, 'sha256', None): # Also stored documents
+        return stream.sha256
+    digest = hashlib.sha256()
+    stream.seek(0)
+    for chunk in iter(lambda: stream.read(HASH_CHUNK_SIZE), b''):
+        digest.update(chunk)
+    stream.seek(0)
+    return digest.hexdigest()
+
+def get_upload_size(file_stream):
+    stream = file_stream.stream
+    if isinstance(stream, IngestStream):
+        return stream.size
+    position = stream.tell()
+    stream.seek(0, 2)
+    size = stream.tell()
+    stream.seek(position)
+    return size
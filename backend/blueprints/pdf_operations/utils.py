@@ -2,8 +2,13 @@
 import os
 import re
 import uuid
+import shutil
 from werkzeug.utils import secure_filename
 from flask import current_app # Added to access config for temp folders if needed directly here
+from pypdf import PdfReader
+from .upload_ingest import verify_upload
+from .document_store import DocumentStream, checkout_reader
+from .metrics import stage_timer, record_pages, STAGE_UPLOAD_SAVE, STAGE_PARSE
 
 # Define allowed extensions sets here if they are truly general,
 # or keep them in the main blueprint/pass them to handlers.
@@ -69,8 +74,36 @@ def save_uploaded_file(file_stream, temp_dir):
     """Saves an uploaded file stream to a temporary directory with a secure name."""
     if not file_stream or not file_stream.filename:
         raise ValueError("Invalid file stream or filename.")
+    verify_upload(file_stream) # Reject content that does not match the extension before writing anything
     filename = secure_filename(file_stream.filename)
     filepath = os.path.join(temp_dir, filename)
-    file_stream.seek(0) # Ensure reading from the start
-    file_stream.save(filepath)
-    return filepath
\ No newline at end of file
+    with stage_timer(STAGE_UPLOAD_SAVE):
+        if isinstance(file_stream.stream, DocumentStream): # Stored document: let the kernel copy it
+            shutil.copyfile(file_stream.stream.name, filepath)
+        else:
+            file_stream.seek(0) # Ensure reading from the start
+            file_stream.save(filepath)
+    return filepath
+
+def open_uploaded_file(file_stream):
+    """
+    Returns the upload's own (already spooled) stream, positioned at the start, for readers
+    that accept file objects such as PdfReader. Avoids copying the upload to a temp folder.
+    """
+    if not file_stream or not file_stream.filename:
+        raise ValueError("Invalid file stream or filename.")
+    verify_upload(file_stream)
+    file_stream.stream.seek(0)
+    return file_stream.stream
+
+def load_pdf(source):
+    """
+    PdfReader for a path or file object, with the xref and page tree parsed up front so the
+    time shows up as the 'parse' stage. Encrypted files are left for the caller to decrypt.
+    Stored documents come from the per-process reader cache, already parsed by an earlier request.
+    """
+    with stage_timer(STAGE_PARSE):
+        reader = checkout_reader(source) if isinstance(source, DocumentStream) else PdfReader(source)
+        if not reader.is_encrypted:
+            record_pages(len(reader.pages))
+    return reader
\ No newline at end of file
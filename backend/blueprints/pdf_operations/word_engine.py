@@ -0,0 +1,75 @@
+# backend/blueprints/pdf_operations/word_engine.py
+import logging
+import threading
+from contextlib import contextmanager
+from pdf2docx import Converter as ConvertDocx # Using the alias from your original code
+from .cpu_pool import run_sharded, shard_ranges, cpu_pool_size
+from .job_manager import report_progress
+
+WORD_SHARD_PAGES = 25 # Pages parsed per worker task; each task also re-analyses the whole document once
+WORD_PARALLEL_MIN_PAGES = 50 # Below this, one process parsing every page is faster
+PDF2DOCX_PAGE_MESSAGE = '(%d/%d) Page %d' # Logged by pdf2docx for every page it parses or writes
+
+
+class _PageProgressHandler(logging.Handler):
+    """Turns pdf2docx's per-page log lines from the calling thread into report_progress calls."""
+
+    def __init__(self, stage):
+        super().__init__(logging.INFO)
+        self.stage = stage
+        self.thread_id = threading.get_ident() # Concurrent requests in the same process log to the same root logger
+
+    def emit(self, record):
+        if record.msg == PDF2DOCX_PAGE_MESSAGE and record.thread == self.thread_id:
+            report_progress(self.stage, record.args[0], record.args[1])
+
+@contextmanager
+def _page_progress(stage):
+    handler = _PageProgressHandler(stage)
+    root_logger = logging.getLogger()
+    root_logger.addHandler(handler)
+    try:
+        yield
+    finally:
+        root_logger.removeHandler(handler)
+
+def _parse_pages(input_path, page_indices):
+    """
+    Worker task: pdf2docx's analysis of the whole document plus the layout parsing of page_indices.
+    Returns the parsed pages in pdf2docx's own serialised form (Converter.store).
+    """
+    cv = ConvertDocx(input_path)
+    try:
+        settings = cv.default_settings
+        cv.load_pages(pages=page_indices).parse_document(**settings).parse_pages(**settings)
+        return cv.store()
+    finally:
+        cv.close()
+
+def convert_pdf_to_docx(input_path, output_filepath, page_indices):
+    """
+    Converts the given 0-based pages to a DOCX. Long selections are parsed in chunks across the CPU
+    pool and stitched back together with pdf2docx's store/restore before the document is written in
+    this process. This is what pdf2docx's own multi_processing option does, minus its JSON files in
+    the working directory and its restriction to one continuous page range.
+    """
+    total = len(page_indices)
+    parallel = total >= WORD_PARALLEL_MIN_PAGES and cpu_pool_size() > 1
+    cv = ConvertDocx(input_path)
+    try:
+        settings = cv.default_settings
+        if not parallel:
+            with _page_progress('parse'):
+                cv.load_pages(pages=page_indices).parse_document(**settings).parse_pages(**settings)
+        else:
+            cv.load_pages(pages=page_indices)
+            shards = [(input_path, page_indices[start:stop]) for start, stop in shard_ranges(total, WORD_SHARD_PAGES)]
+            done = 0
+            for parsed, (_, shard_pages) in zip(run_sharded(_parse_pages, shards), shards):
+                cv.restore(parsed)
+                done += len(shard_pages)
+                report_progress('parse', done, total)
+        with _page_progress('create'):
+            cv.make_docx(output_filepath, **settings)
+    finally:
+        cv.close()
@@ -6,6 +6,8 @@ from flask import current_app
 from werkzeug.utils import secure_filename
 from docx2pdf import convert as convert_docx_to_pdf
 from .utils import check_allowed_file, create_temp_folder, save_uploaded_file
+from .output_store import output_path
+from .metrics import stage_timer, STAGE_SUBPROCESS_WAIT
 
 ALLOWED_EXTENSIONS_WORD = {'doc', 'docx'}
 
@@ -29,9 +31,10 @@ def handle_word_to_pdf(request_files, request_form):
         
         output_filename_base = os.path.splitext(original_filename_secure)[0]
         output_pdf_filename = f"{output_filename_base}_{uuid.uuid4().hex[:6]}.pdf"
-        output_pdf_filepath = os.path.join(current_app.config['CONVERTED_FILES_FOLDER'], output_pdf_filename)
+        output_pdf_filepath = output_path(output_pdf_filename)
 
-        convert_docx_to_pdf(temp_input_filepath, output_pdf_filepath)
+        with stage_timer(STAGE_SUBPROCESS_WAIT): # docx2pdf drives Word/LibreOffice out of process
+            convert_docx_to_pdf(temp_input_filepath, output_pdf_filepath)
         
         if not os.path.exists(output_pdf_filepath):
             # This error might indicate docx2pdf failed, possibly due to LibreOffice/MS Office issues
@@ -1,8 +1,9 @@
 # backend/blueprints/pdf_tool_bp.py
 import os
-import subprocess # Keep for general subprocess exceptions if needed
-from flask import Blueprint, request, jsonify, current_app, send_from_directory
+import time
+from flask import Blueprint, request, jsonify, current_app
 from werkzeug.utils import secure_filename
+from werkzeug.http import http_date
 
 # Import handlers from the pdf_operations package
 from .pdf_operations.merge_handler import handle_merge
@@ -25,7 +26,23 @@ from .pdf_operations.add_page_numbers_handler import handle_add_page_numbers
 from .pdf_operations.extract_pages_handler import handle_extract_pages
 from .pdf_operations.protect_pdf_handler import handle_protect_pdf
 from .pdf_operations.unlock_pdf_handler import handle_unlock_pdf
+from .pdf_operations.pipeline_handler import handle_pipeline
 # Import other handlers as you create them
+from .pdf_operations.dispatch import dispatch_operation, get_filename_for_logging
+from .pdf_operations.result_cache import get_result_cache
+from .pdf_operations.output_store import get_output_store, locate_output
+from .pdf_operations.downloads import build_download_response
+from .pdf_operations.job_manager import submit_job, get_job, job_status_response, JOB_STATUS_DONE, JOB_STATUS_FAILED
+from .pdf_operations.batch_runner import run_batch
+from .pdf_operations.document_store import get_document_store, resolve_documents, close_documents
+from .pdf_operations.search_index import get_search_index
+from .pdf_operations.soffice_pool import soffice_stats
+from .pdf_operations.resumable_upload import (
+    get_resumable_upload_store, parse_upload_metadata, parse_upload_checksum, ChecksumMismatch, OffsetMismatch, UploadBusy,
+    TUS_VERSION, TUS_EXTENSIONS, TUS_CHECKSUM_ALGORITHMS, CHUNK_CONTENT_TYPE
+)
+from .pdf_operations.text_engine import iter_page_texts
+from .pdf_operations.utils import load_pdf
 
 pdf_tool_bp = Blueprint('pdf_tool_bp', __name__)
 
@@ -54,6 +71,7 @@ OPERATION_HANDLERS = {
     'extract_pages': handle_extract_pages,
     'protect_pdf': handle_protect_pdf,
     'unlock_pdf': handle_unlock_pdf,
+    'pipeline': handle_pipeline, # Chains unlock/delete/rotate/number/compress steps in memory
 
     # Add other operations here
 }
@@ -64,38 +82,281 @@ def process_pdf_route():
         return jsonify({'success': False, 'error': 'No operation specified'}), 400
 
     operation = request.form.get('operation')
-    
-    original_filename_for_logging = "unknown_file"
-    if 'files' in request.files:
-        files_list = request.files.getlist('files')
-        if files_list and files_list[0] and files_list[0].filename:
-            original_filename_for_logging = secure_filename(files_list[0].filename)
 
     if operation not in OPERATION_HANDLERS:
         return jsonify({'success': False, 'error': 'Invalid operation specified'}), 400
 
     handler = OPERATION_HANDLERS[operation]
 
+    # Files uploaded earlier to /api/documents can be named with documentId instead of being sent again
     try:
-        # Pass request.files and request.form to the handler
-        # The handler is responsible for its own temp file management and specific logic
-        response_data, status_code = handler(request.files, request.form)
+        request_files = resolve_documents(request.files, request.form)
+    except LookupError as le:
+        return jsonify({'success': False, 'error': str(le)}), 404
+    original_filename_for_logging = get_filename_for_logging(request_files)
+
+    try:
+        # Submit/poll mode: queue the work on the job pool and return a job id immediately
+        if request.form.get('async', '').lower() in ('1', 'true', 'yes'):
+            response_data, status_code = submit_job(operation, handler, request_files, request.form)
+            return jsonify(response_data), status_code
+
+        # Pass request_files and request.form to the handler
+        # Exceptions raised by the handler are mapped to error responses by dispatch_operation
+        response_data, status_code = dispatch_operation(operation, handler, request_files, request.form, original_filename_for_logging)
         return jsonify(response_data), status_code
-    
-    except ValueError as ve: # Catch validation errors raised by handlers
-        current_app.logger.warning(f"Validation Error during '{operation}' for file '{original_filename_for_logging}': {str(ve)}")
-        # Pass totalPages if the ValueError instance has it (set by parse_page_ranges for example)
-        return jsonify({'success': False, 'error': str(ve), 'totalPages': getattr(ve, 'totalPages', 0)}), 400
-    except FileNotFoundError as fnfe: # Catch if a required tool (like soffice) is not found
-        current_app.logger.error(f"Tool Not Found Error during '{operation}' for file '{original_filename_for_logging}': {str(fnfe)}")
-        return jsonify({'success': False, 'error': str(fnfe)}), 500 # Let handler's message be used
-    except subprocess.TimeoutExpired:
-        current_app.logger.error(f"Process timed out during '{operation}' for file '{original_filename_for_logging}'")
-        return jsonify({'success': False, 'error': f'{operation.replace("_", " ").title()} conversion timed out. File might be too large/complex.'}), 500
-    except Exception as e: # Catch all other unexpected errors from handlers
-        current_app.logger.error(f"Unexpected Error during '{operation}' for file '{original_filename_for_logging}': {str(e)}", exc_info=True)
-        # Consider if handlers should return totalPages for generic errors or if it's too broad
-        return jsonify({'success': False, 'error': f'An unexpected error occurred in {operation}: {str(e)}'}), 500
+    finally:
+        close_documents(request_files) # Hands parsed readers back to the cache
+
+@pdf_tool_bp.route('/process_batch', methods=['POST'])
+def process_batch_route():
+    # Same form fields as /process_pdf; every file in 'files' is processed on its own and the outputs are zipped
+    operation = request.form.get('operation')
+    if not operation:
+        return jsonify({'success': False, 'error': 'No operation specified'}), 400
+    if operation not in OPERATION_HANDLERS:
+        return jsonify({'success': False, 'error': 'Invalid operation specified'}), 400
+
+    try:
+        request_files = resolve_documents(request.files, request.form)
+    except LookupError as le:
+        return jsonify({'success': False, 'error': str(le)}), 404
+    try:
+        response_data, status_code = run_batch(operation, OPERATION_HANDLERS[operation], request_files, request.form)
+    except ValueError as ve:
+        return jsonify({'success': False, 'error': str(ve)}), 400
+    except Exception as e:
+        current_app.logger.error(f"Unexpected Error during batch '{operation}': {str(e)}", exc_info=True)
+        return jsonify({'success': False, 'error': f'An unexpected error occurred in batch {operation}: {str(e)}'}), 500
+    finally:
+        close_documents(request_files)
+    return jsonify(response_data), status_code
+
+def _document_response(document):
+    return {key: document[key] for key in ('document_id', 'filename', 'size_bytes', 'created_at')}
+
+@pdf_tool_bp.route('/documents', methods=['POST'])
+def upload_documents_route():
+    # Upload once, then pass documentId to /process_pdf or /process_batch instead of the file
+    files = [file_stream for file_stream in request.files.getlist('files') if file_stream and file_stream.filename]
+    if not files:
+        return jsonify({'success': False, 'error': 'No file part in the request'}), 400
+    document_store = get_document_store()
+    search_index = get_search_index() if request.form.get('index', '').lower() in ('1', 'true', 'yes') else None
+    documents = []
+    try:
+        for file_stream in files:
+            document = _document_response(document_store.add(file_stream))
+            if file_stream.filename.lower().endswith('.pdf'):
+                # Parsing now reports the page count and leaves the reader in the cache for the next call
+                document_file = document_store.open(document['document_id'], current_app.config['DOCUMENT_READER_CACHE_MAX_BYTES'])
+                try:
+                    reader = load_pdf(document_file.stream)
+                    document['totalPages'] = None if reader.is_encrypted else len(reader.pages)
+                    document['encrypted'] = reader.is_encrypted
+                    if search_index is not None and not reader.is_encrypted:
+                        # index=true: searchable right away, without a separate pdf_to_text call
+                        search_index.add_document(document['document_id'], document['filename'], (
+                            (page_index + 1, text) for page_index, text, error_message in iter_page_texts(reader, len(reader.pages))
+                            if error_message is None))
+                        document['indexed'] = True
+                finally:
+                    document_file.close()
+            documents.append(document)
+    except ValueError as ve:
+        return jsonify({'success': False, 'error': str(ve), 'documents': documents}), 400
+    except Exception as e:
+        current_app.logger.error(f"Error while storing uploaded documents: {str(e)}", exc_info=True)
+        return jsonify({'success': False, 'error': f'The file could not be stored or read: {str(e)}', 'documents': documents}), 400
+    return jsonify({'success': True, 'documents': documents}), 201
+
+@pdf_tool_bp.route('/documents/<document_id>', methods=['GET'])
+def document_route(document_id):
+    document = get_document_store().get(document_id)
+    if document is None:
+        return jsonify({'success': False, 'error': 'Document not found.'}), 404
+    return jsonify({'success': True, **_document_response(document)}), 200
+
+@pdf_tool_bp.route('/documents/<document_id>', methods=['DELETE'])
+def delete_document_route(document_id):
+    if not get_document_store().delete(document_id):
+        return jsonify({'success': False, 'error': 'Document not found.'}), 404
+    return jsonify({'success': True}), 200
+
+def _tus_response(body, status_code, upload=None, **headers):
+    response = jsonify(body) if body is not None else current_app.response_class(status=status_code)
+    response.status_code = status_code
+    response.headers['Tus-Resumable'] = TUS_VERSION
+    response.headers['Cache-Control'] = 'no-store'
+    if upload is not None:
+        store = get_resumable_upload_store()
+        response.headers['Upload-Offset'] = str(upload['upload_offset'])
+        response.headers['Upload-Length'] = str(upload['length'])
+        response.headers['Upload-Expires'] = http_date(store.expires_at(upload))
+    for name, value in headers.items():
+        response.headers[name.replace('_', '-')] = value
+    return response
+
+def _upload_response(upload):
+    response = {key: upload[key] for key in ('upload_id', 'filename', 'length')}
+    response['offset'] = upload['upload_offset']
+    response['upload_url'] = f"/api/uploads/{upload['upload_id']}"
+    if upload['document_id'] is not None:
+        response['document_id'] = upload['document_id'] # Pass as documentId to /process_pdf or /process_batch
+    return response
+
+@pdf_tool_bp.route('/uploads', methods=['OPTIONS'])
+def uploads_options_route():
+    # tus discovery
+    return _tus_response(None, 204, Tus_Version=TUS_VERSION, Tus_Extension=TUS_EXTENSIONS,
+                         Tus_Checksum_Algorithm=','.join(TUS_CHECKSUM_ALGORITHMS),
+                         Tus_Max_Size=str(current_app.config['RESUMABLE_UPLOAD_MAX_SIZE']))
+
+@pdf_tool_bp.route('/uploads', methods=['POST'])
+def create_upload_route():
+    # Resumable upload (tus): POST with Upload-Length and Upload-Metadata (filename), then PATCH the bytes
+    # in chunks of up to MAX_CONTENT_LENGTH each. The finished file becomes a stored document.
+    try:
+        length = int(request.headers.get('Upload-Length', ''))
+    except ValueError:
+        return _tus_response({'success': False, 'error': 'Upload-Length must be given as a number of bytes.'}, 400)
+    if length > current_app.config['RESUMABLE_UPLOAD_MAX_SIZE']:
+        return _tus_response({'success': False, 'error': f"The upload is too large. The maximum is {current_app.config['RESUMABLE_UPLOAD_MAX_SIZE']} bytes."}, 413)
+    try:
+        upload = get_resumable_upload_store().create(length, parse_upload_metadata(request.headers.get('Upload-Metadata')))
+    except ValueError as ve:
+        return _tus_response({'success': False, 'error': str(ve)}, 400)
+    return _tus_response({'success': True, **_upload_response(upload)}, 201, upload, Location=f"/api/uploads/{upload['upload_id']}")
+
+@pdf_tool_bp.route('/uploads/<upload_id>', methods=['HEAD', 'GET'])
+def upload_status_route(upload_id):
+    # HEAD is tus's offset query; GET returns the same as JSON, plus the document_id once complete
+    upload = get_resumable_upload_store().get(upload_id)
+    if upload is None:
+        return _tus_response({'success': False, 'error': 'Upload not found or expired.'}, 404)
+    return _tus_response({'success': True, **_upload_response(upload)}, 200, upload)
+
+@pdf_tool_bp.route('/uploads/<upload_id>', methods=['PATCH'])
+def upload_chunk_route(upload_id):
+    if request.mimetype != CHUNK_CONTENT_TYPE:
+        return _tus_response({'success': False, 'error': f'Chunks must be sent as {CHUNK_CONTENT_TYPE}.'}, 415)
+    try:
+        offset = int(request.headers.get('Upload-Offset', ''))
+    except ValueError:
+        return _tus_response({'success': False, 'error': 'Upload-Offset must be given as a number of bytes.'}, 400)
+    try:
+        checksum = parse_upload_checksum(request.headers.get('Upload-Checksum'))
+    except ValueError as ve:
+        return _tus_response({'success': False, 'error': str(ve)}, 400)
+
+    store = get_resumable_upload_store()
+    try:
+        # Read straight from the request body in bounded pieces; Werkzeug never buffers the chunk
+        upload = store.append(upload_id, offset, request.stream, request.content_length, get_document_store(), checksum)
+    except LookupError as le:
+        return _tus_response({'success': False, 'error': str(le)}, 404)
+    except OffsetMismatch as om:
+        return _tus_response({'success': False, 'error': str(om)}, 409, Upload_Offset=str(om.offset))
+    except UploadBusy as ub:
+        return _tus_response({'success': False, 'error': str(ub)}, 423)
+    except ChecksumMismatch as cm:
+        return _tus_response({'success': False, 'error': str(cm)}, 460, store.get(upload_id))
+    except ValueError as ve:
+        return _tus_response({'success': False, 'error': str(ve)}, 400)
+    except Exception as e:
+        current_app.logger.error(f"Error while storing a chunk of upload {upload_id}: {str(e)}", exc_info=True)
+        return _tus_response({'success': False, 'error': f'The chunk could not be stored: {str(e)}'}, 500)
+
+    if 'document' in upload:
+        # The last chunk: the file is now a stored document
+        return _tus_response({'success': True, **_upload_response(upload), 'document': _document_response(upload['document'])}, 200, upload)
+    return _tus_response(None, 204, upload)
+
+@pdf_tool_bp.route('/uploads/<upload_id>', methods=['DELETE'])
+def delete_upload_route(upload_id):
+    # tus termination; a finished upload's document stays until it is deleted or expires
+    if not get_resumable_upload_store().delete(upload_id):
+        return _tus_response({'success': False, 'error': 'Upload not found or expired.'}, 404)
+    return _tus_response(None, 204)
+
+@pdf_tool_bp.route('/search', methods=['GET'])
+def search_route():
+    # Pages of the given stored documents (documentId, repeated or comma-separated), indexed by
+    # pdf_to_text or by uploading with index=true
+    search_index = get_search_index()
+    if search_index is None:
+        return jsonify({'success': False, 'error': 'Search is disabled.'}), 404
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'success': False, 'error': 'No search query (q) given.'}), 400
+    try:
+        limit = min(int(request.args.get('limit', 20)), current_app.config['SEARCH_MAX_RESULTS'])
+        offset = int(request.args.get('offset', 0))
+        if limit < 1 or offset < 0:
+            raise ValueError
+    except ValueError:
+        return jsonify({'success': False, 'error': 'limit and offset must be positive integers.'}), 400
+    document_ids = {document_id.strip() for value in request.args.getlist('documentId') for document_id in value.split(',') if document_id.strip()}
+    if not document_ids:
+        return jsonify({'success': False, 'error': 'No documentId given. Search covers only the documents you name.'}), 400
+    if len(document_ids) > current_app.config['BATCH_MAX_FILES']:
+        return jsonify({'success': False, 'error': f"Too many documents to search ({len(document_ids)}). The maximum is {current_app.config['BATCH_MAX_FILES']}."}), 400
+
+    started = time.perf_counter()
+    try:
+        total_hits, hits = search_index.search(query, document_ids, limit=limit, offset=offset)
+    except ValueError as ve:
+        return jsonify({'success': False, 'error': str(ve)}), 400
+    return jsonify({
+        'success': True,
+        'query': query,
+        'totalHits': total_hits,
+        'hits': hits,
+        'tookMs': round((time.perf_counter() - started) * 1000, 2)
+    }), 200
+
+@pdf_tool_bp.route('/search/stats', methods=['GET'])
+def search_stats_route():
+    search_index = get_search_index()
+    if search_index is None:
+        return jsonify({'success': False, 'error': 'Search is disabled.'}), 404
+    return jsonify({'success': True, **search_index.stats()}), 200
+
+@pdf_tool_bp.route('/jobs/<job_id>', methods=['GET'])
+def job_status_route(job_id):
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Job not found.'}), 404
+    return jsonify(job_status_response(job)), 200
+
+@pdf_tool_bp.route('/jobs/<job_id>/result', methods=['GET'])
+def job_result_route(job_id):
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Job not found.'}), 404
+    if job.get('status') not in (JOB_STATUS_DONE, JOB_STATUS_FAILED):
+        # Not finished yet: 202 tells the client to keep polling
+        return jsonify(job_status_response(job)), 202
+    return jsonify(job.get('result')), job.get('status_code', 500)
+
+@pdf_tool_bp.route('/cache/stats', methods=['GET'])
+def cache_stats_route():
+    result_cache = get_result_cache()
+    if result_cache is None:
+        return jsonify({'success': False, 'error': 'Result cache is disabled.'}), 404
+    return jsonify({'success': True, **result_cache.stats()}), 200
+
+@pdf_tool_bp.route('/outputs/stats', methods=['GET'])
+def output_stats_route():
+    output_store = get_output_store()
+    if output_store is None:
+        return jsonify({'success': False, 'error': 'Output retention is disabled.'}), 404
+    return jsonify({'success': True, **output_store.stats()}), 200
+
+@pdf_tool_bp.route('/soffice/stats', methods=['GET'])
+def soffice_stats_route():
+    # mode is 'uno' (warm instances) or 'cli' (a cold soffice per conversion, when the UNO bindings are missing)
+    return jsonify({'success': True, **soffice_stats()}), 200
 
 @pdf_tool_bp.route('/download/<filename>', methods=['GET'])
 def download_file(filename):
@@ -104,9 +365,16 @@ def download_file(filename):
         if ".." in safe_filename or safe_filename.startswith("/"):
             current_app.logger.warning(f"Attempt to download potentially unsafe file: {filename}")
             return jsonify({'success': False, 'error': 'Invalid filename'}), 400
-        return send_from_directory(
-            current_app.config['CONVERTED_FILES_FOLDER'], safe_filename, as_attachment=True
-        )
+        output_store = get_output_store()
+        file_path = locate_output(safe_filename)
+        if file_path is None:
+            if output_store is not None and output_store.is_expired(safe_filename):
+                return jsonify({'success': False, 'error': 'This file has expired and was deleted. Please run the conversion again.'}), 410
+            raise FileNotFoundError(safe_filename)
+        if output_store is not None:
+            output_store.touch(safe_filename)
+        # Range, ETag and conditional GET handling, or a hand-off to the front web server
+        return build_download_response(safe_filename, file_path, output_store)
     except FileNotFoundError:
         current_app.logger.info(f"Download failed: File not found - {filename}")
         return jsonify({'success': False, 'error': 'File not found.'}), 404